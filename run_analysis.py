@@ -1,21 +1,38 @@
 # %%
 import os
 import sys
+import io
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
 from pathlib import Path
 # Add src/ to Python's module search path
 sys.path.append(str(Path(__file__).resolve().parent / "src"))
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from src.descriptives import compute_descriptive_stats
-from src.curve_functions import MODEL_FUNCTIONS
+from src.data_loading import load_trials
+from src.streaming_descriptives import compute_descriptive_stats_streaming
+from src.chunked_pipeline import run_chunked_pipeline
+from src.curve_functions import MODEL_FUNCTIONS, POLYNOMIAL_DEGREES, SPLINE_MODELS, pspline_model
 from src.curve_fitting import fit_curve
+from src.batched_fitting import ROBUST_TUNING, fit_curve_robust
+from src.pspline import fit_pspline
 from src.curve_fit_goodness import compute_gof, plot_goodness_of_fit
 from src.anova_fitted_params import run_anova, plot_anova_results
 from src.curve_fit_visualization import plot_curve_fits
+from src.curve_store import build_curve_store, save_curve_store
+from src.results_store import anova_results_frame, write_results
+from src.param_store import build_param_store, model_names
+from src.output_writer import OutputWriter, atomic_write
+from src.model_kernels import compile_models
+from src.mixed_effects import fit_mixed_polynomial, mixed_model_name
 
 # %%
-# Load .env 
+# Load .env
 load_dotenv("analysis_config.env")
 load_dotenv("subj_to_keep.env") # remove after final github commit
 
@@ -28,7 +45,6 @@ v_r_file = data_dir_cleaned / "v_r_trials_cleaned_allsubj.csv"
 # %%
 # Results directory (see analysis_config.env to modify)
 results_dir = Path(os.getenv("RESULTS_DIR")).resolve()
-results_dir.mkdir(parents=True, exist_ok=True)
 
 # %%
 # Load other settings from .env
@@ -37,152 +53,395 @@ x_var = os.getenv("X_VAR").strip()
 group_vars = [var.strip() for var in os.getenv("GROUP_VARS").split(",")]
 dep_vars = [var.strip() for var in os.getenv("DEP_VARS").split(",")]
 curve_functions = [var.strip() for var in os.getenv("CURVE_FUNCTIONS").split(",")]
+curve_grid_points = int(os.getenv("CURVE_GRID_POINTS", "500"))
+results_format = os.getenv("RESULTS_FORMAT", "csv").strip().lower()
+chunksize = int(os.getenv("CHUNKSIZE", "100000"))
+pipeline_mode = os.getenv("PIPELINE_MODE", "in_memory").strip().lower()
+output_writer_threads = int(os.getenv("OUTPUT_WRITER_THREADS", "2"))
+multipage_figures = os.getenv("FIGURE_OUTPUT", "separate").strip().lower() == "multipage"
+fit_method = os.getenv("FIT_METHOD", "ols").strip().lower()
+compile_backend = os.getenv("COMPILE_MODELS", "none").strip().lower()
+mixed_effects = os.getenv("MIXED_EFFECTS", "False").strip().lower() == "true"
+n_workers = max(1, int(os.getenv("N_WORKERS", "1")))
 subj_to_keep = [var.strip() for var in os.getenv("SUBJ_TO_KEEP").split(",")]
 
-# %%
-# Debugging: Print loaded settings
-print("\nTESTING: Settings Loaded from .env:")
-print(f"  - Run data cleaning: {run_data_cleaning}")
-print(f"  - X Variable: {x_var}")
-print(f"  - Grouping Variables: {group_vars}")
-print(f"  - Dependent Variables: {dep_vars}")
-print(f"  - Curve Functions: {curve_functions}")
-print(f"  - Results Directory: {results_dir}")
-print(f"  - Ss: {subj_to_keep}")
-
-# %%
-# Run data cleaning only if enabled
-if run_data_cleaning:
-    print("\n- Running data cleaning step...")
-    os.system("python src/data_cleaning.py") # runs src/data_cleaning.py as subprocess
-    print("\nData cleaning complete.")
-
-
-# %%
-# Validate above directories and files
-# print("TESTING: Validating directories and files...") # for testing
-if not data_dir_cleaned.exists():
-    sys.exit(f"***ERROR*** Data directory not found: {data_dir_cleaned}")
-
-if not d_ml_file.exists():
-    sys.exit(f"***ERROR*** Missing dataset: {d_ml_file}")
-
-if not v_r_file.exists():
-    sys.exit(f"***ERROR*** Missing dataset: {v_r_file}")
-
 # Define which dataset each dependent variable (DV) belongs to
 v_r_vars = {"vertical_indicated_error", "tilt_indicated_error"}
 d_ml_vars = {
-    "turn_bed_displacement", "indicated_displacement", "indicated_displacement_error", 
+    "turn_bed_displacement", "indicated_displacement", "indicated_displacement_error",
     "turn_end_joystick_position", "midline_indicated_angle", "turn_rms_track_error"
 }
 
+# Single indexed results store (see analysis_config.env, RESULTS_FORMAT)
+results_db = results_dir / "results.sqlite"
+
+# Environment variables that set the thread count of NumPy's linear algebra (BLAS/OpenMP)
+BLAS_THREAD_VARS = [
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+]
+
+# Model functions used for fitting and evaluation; filled in by build_model_functions()
+model_functions = dict(MODEL_FUNCTIONS)
+mixed_models = []
+
+
 # %%
-# Run analysis for each DV
-for dep_var in dep_vars:
+def build_model_functions():
+    """
+    Sets up the model functions of this run (in the main process and in every worker).
 
-    # Determine which dataset to use
+    Optionally compiles the models and their Jacobians into vectorized kernels (src/model_kernels.py),
+    each checked against its Python definition over the x values observed in the data files of the DVs
+    (the values the models are fitted on). Mixed-effects fits (src/mixed_effects.py) are stored as
+    "<model>_mixed" and evaluated with the same function.
+    """
+    global mixed_models
+    if compile_backend != "none":
+        dataset_files = dict.fromkeys(dataset_for(dep_var) for dep_var in dep_vars if dataset_for(dep_var)) or [d_ml_file]
+        x_check = np.unique(np.concatenate([
+            pd.read_csv(dataset_file, usecols=[x_var])[x_var].dropna().unique() for dataset_file in dataset_files
+        ]))
+        model_functions.update(compile_models(MODEL_FUNCTIONS, curve_functions, compile_backend, x_check))
+
+    mixed_models = [name for name in curve_functions if name in POLYNOMIAL_DEGREES] if mixed_effects else []
+    for model_name in mixed_models:
+        model_functions[mixed_model_name(model_name)] = model_functions[model_name]
+
+
+def dataset_for(dep_var):
+    """Cleaned data file that contains a DV (None if the DV is not recognized)."""
     if dep_var in v_r_vars:
-        dataset_file = v_r_file
-    elif dep_var in d_ml_vars:
-        dataset_file = d_ml_file
-    else:
-        print(f"***WARNING*** Dependent variable {dep_var} not recognized. Skipping.")
-        continue
+        return v_r_file
+    if dep_var in d_ml_vars:
+        return d_ml_file
+    return None
 
-    # Validate dataset file existence before reading
-    if not dataset_file.exists():
-        print(f"***ERROR*** Expected dataset file missing: {dataset_file}")
-        continue
+
+def save_results(writer, df, table, csv_file, dep_var):
+    """Queues one results table to be saved as CSV and/or into the SQLite results store."""
+    if results_format in ("csv", "both"):
+        writer.write_table(df, csv_file, index=False)
+    if results_format in ("sqlite", "both"):
+        writer.submit(write_results, results_db, table, df, dep_var, serial=True)
+
+
+# %%
+def analyze_dep_var(dep_var, precomputed, writer):
+    """
+    Runs the analysis of one DV: curve fitting, goodness-of-fit, ANOVAs and figures.
+
+    Parameters:
+    - dep_var (str): Dependent variable
+    - precomputed (dict): Descriptives of this DV ("subj_stats", "grand_mean"); in chunked mode,
+      the DV's full output of run_chunked_pipeline()
+    - writer (OutputWriter): Background writer for tables and figures
+    """
+    dataset_file = dataset_for(dep_var)
 
     # Create a subfolder for this DV inside results_dir
     dep_var_res_dir = results_dir / dep_var
     dep_var_res_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load dataset
-    # print(f"TESTING: Loading data set: {dataset_file}") # for testing
-    df = pd.read_csv(dataset_file)
+    if pipeline_mode == "chunked":
+        # Everything up to goodness-of-fit was computed in the chunked pass
+        chunked = precomputed
+        df = None
+    else:
+        # Load dataset
+        # print(f"TESTING: Loading data set: {dataset_file}") # for testing
+        # Only the columns this DV needs, with categorical keys and compact numeric dtypes
+        df = load_trials(dataset_file, x_var, [dep_var], group_vars)
 
-    print(f"🛠 Columns in df before descriptives step: {df.columns.tolist()}")
-    print(f"🛠 Group Variables: {group_vars}")
-    print(f"🛠 Dependent Variable: {dep_var}")
-    print(f"🛠 Columns in df before descriptives step: {df.columns.tolist()}")
+        print(f"🛠 Columns in df before descriptives step: {df.columns.tolist()}")
+        print(f"🛠 Group Variables: {group_vars}")
+        print(f"🛠 Dependent Variable: {dep_var}")
 
-    # print(f"TESTING: Successfully loaded {df.shape[0]} rows and {df.shape[1]} columns.") # for testing
+        # print(f"TESTING: Successfully loaded {df.shape[0]} rows and {df.shape[1]} columns.") # for testing
 
-    # Compute descriptive statistics (src/descriptives.py)
-    print(f"- Computing descriptive statistics for {dep_var}...")
-    subj_stats, grand_mean = compute_descriptive_stats(df, [dep_var], group_vars, dep_var_res_dir)
-    subj_stats.to_csv(dep_var_res_dir / f"subj_stats_{dep_var}.csv", index=False)
-    grand_mean.to_csv(dep_var_res_dir / f"grand_means_{dep_var}.csv", index=False)
+    # Descriptive statistics for this DV (computed before the DVs are analyzed)
+    save_results(writer, precomputed["subj_stats"], "subj_stats", dep_var_res_dir / f"subj_stats_{dep_var}.csv", dep_var)
+    save_results(writer, precomputed["grand_mean"], "grand_means", dep_var_res_dir / f"grand_means_{dep_var}.csv", dep_var)
     # TO DO: check descriptives module for success message
 
     # Perform curve fitting (src/curve_fitting.py)
     print(f"- Performing curve fitting for {dep_var}...")
     fitted_params_list = []
-    for model_name in curve_functions:
-        if model_name in MODEL_FUNCTIONS:
-            #print(MODEL_FUNCTIONS[model_name]) # for testing
-            fitted_params_df = fit_curve(df, subj_to_keep, x_var, dep_var, model_name, MODEL_FUNCTIONS[model_name])
-            fitted_params_list.append(fitted_params_df)
-        else:
-            print(f"***WARNING*** {model_name} not found in src/curve_functions.py. Skipping.")
+    robust_weights_list = []
+    if df is None:
+        # Polynomial fits solved from the moment sums of the chunked pass
+        fitted_params_list = chunked["fitted_params"]
+    else:
+        for model_name in curve_functions:
+            if model_name not in MODEL_FUNCTIONS:
+                print(f"***WARNING*** {model_name} not found in src/curve_functions.py. Skipping.")
+            elif model_name in SPLINE_MODELS:
+                # Penalized spline with knots over this DV's x range, all groups at once (src/pspline.py);
+                # the fits store the knot range, so they are evaluated with the same basis later on
+                spline = pspline_model(df[x_var].min(), df[x_var].max(), MODEL_FUNCTIONS[model_name].n_segments)
+                fitted_params_list.append(fit_pspline(df, subj_to_keep, x_var, dep_var, model_name, spline))
+            elif fit_method != "ols" and model_name in POLYNOMIAL_DEGREES:
+                # Robust IRLS fit of all groups at once (src/batched_fitting.py)
+                fitted_params_df, robust_weights = fit_curve_robust(df, subj_to_keep, x_var, dep_var, model_name, loss=fit_method)
+                fitted_params_list.append(fitted_params_df)
+                robust_weights_list.append(robust_weights)
+            else:
+                #print(MODEL_FUNCTIONS[model_name]) # for testing
+                fitted_params_df = fit_curve(df, subj_to_keep, x_var, dep_var, model_name, model_functions[model_name])
+                fitted_params_list.append(fitted_params_df)
     # TO DO: check curve fitting module for success message
+
+    # Hierarchical fit across all subjects: population effects per condition and shrunken per-subject fits
+    if mixed_models:
+        print(f"- Fitting mixed-effects models for {dep_var}...")
+        mixed_results = chunked["mixed"] if df is None else [
+            fit_mixed_polynomial(df, subj_to_keep, x_var, dep_var, model_name) for model_name in mixed_models
+        ]
+        fitted_params_list = fitted_params_list + [fits for fits, _, _ in mixed_results]
+        mixed_effects_df = pd.concat([effects for _, effects, _ in mixed_results], ignore_index=True)
+        mixed_variance_df = pd.concat([variance for _, _, variance in mixed_results], ignore_index=True)
+        save_results(writer, mixed_effects_df, "mixed_effects", dep_var_res_dir / f"mixed_effects_{dep_var}.csv", dep_var)
+        save_results(writer, mixed_variance_df, "mixed_variance", dep_var_res_dir / f"mixed_variance_{dep_var}.csv", dep_var)
+
     # Save curve fitting results
-    all_fitted_params = pd.concat(fitted_params_list, ignore_index=True)
-    all_fitted_params.to_csv(dep_var_res_dir / f"fitted_parameters_{dep_var}.csv", index=False)
+    # Long-format parameter store: one row per fit and parameter, no NaN padding across models
+    all_fitted_params = build_param_store(fitted_params_list)
+    save_results(writer, all_fitted_params["params"], "fitted_parameters", dep_var_res_dir / f"fitted_parameters_{dep_var}.csv", dep_var)
+    save_results(writer, all_fitted_params["cov"], "parameter_covariance", dep_var_res_dir / f"parameter_covariance_{dep_var}.csv", dep_var)
+    if robust_weights_list:
+        # Final IRLS weight of every trial, for inspecting down-weighted outliers
+        robust_weights = pd.concat(robust_weights_list, ignore_index=True)
+        save_results(writer, robust_weights, "robust_weights", dep_var_res_dir / f"robust_weights_{dep_var}.csv", dep_var)
+
+    # Evaluate all fitted curves (and bands) on a shared grid once, for plotting and export
+    x_min, x_max = chunked["x_range"] if df is None else (df[x_var].min(), df[x_var].max())
+    x_grid = np.linspace(x_min, x_max, curve_grid_points)
+    curve_store_file = dep_var_res_dir / f"curves_{dep_var}.npz"
+    curve_store = build_curve_store(all_fitted_params, x_grid, model_functions=model_functions)
+    writer.submit(atomic_write, curve_store_file, partial(save_curve_store, curve_store))
     # TO DO: check curve fitting module for success message
 
     # Compute goodness-of-fit and generate figures
     print(f"- Computing goodness-of-fit for {dep_var}...")
-    gof_res = []
-    for model_name in curve_functions:
-        gof_df = compute_gof(df, x_var, dep_var, model_name, MODEL_FUNCTIONS[model_name], all_fitted_params)
-        gof_res.append(gof_df)
-    
-    all_gof = pd.concat(gof_res, ignore_index=True)
-    all_gof.to_csv(dep_var_res_dir / f"goodness_of_fit_{dep_var}.csv", index=False)
-    plot_goodness_of_fit(all_gof, dep_var, results_dir)
+    if df is None:
+        all_gof = chunked["gof"]
+    else:
+        gof_res = []
+        for model_name in curve_functions + [mixed_model_name(name) for name in mixed_models]:
+            gof_df = compute_gof(df, x_var, dep_var, model_name, model_functions[model_name], all_fitted_params)
+            gof_res.append(gof_df)
+        all_gof = pd.concat(gof_res, ignore_index=True)
+    save_results(writer, all_gof, "goodness_of_fit", dep_var_res_dir / f"goodness_of_fit_{dep_var}.csv", dep_var)
+    plot_goodness_of_fit(all_gof, dep_var, results_dir, writer)
     # TO DO: check gof module for success message
 
-    # Perform ANOVAs and generate figures showing group mean of each model parameter by condition, 
+    # Perform ANOVAs and generate figures showing group mean of each model parameter by condition,
     # corresponding to ANOVA results
     print(f"- Running ANOVAs and generating figures for each model's parameters, {dep_var}...")
+    fitted_models = model_names(all_fitted_params)
     for model in curve_functions:
-        anova_res = run_anova(all_fitted_params, model)
-        anova_df = pd.concat(anova_res, axis=0)  # Merge individual DataFrames into one
-        # Save to CSV
-        anova_df.to_csv(dep_var_res_dir / f"anova_results_{dep_var}_{model}.csv")
-        plot_anova_results(all_fitted_params, model, anova_res, dep_var_res_dir)
-
-        # Run visualization only if curve fitting was performed
-        dep_var_res_dir = results_dir / dep_var
-        fitted_params_file = dep_var_res_dir / f"fitted_parameters_{dep_var}.csv"
-        curve_plot_out_dir = dep_var_res_dir / "curve_fit_plots"
-
-        # Ensure fitted parameters file exists before proceeding
-        if not fitted_params_file.exists():
-            print(f"Skipping visualization for {dep_var}: fitted parameters file not found.")
+        if model not in fitted_models:
             continue
+        anova_res = run_anova(all_fitted_params, model)
+        if not anova_res:
+            # e.g. a spline with a failed fit in some subject/condition: no parameter can be tested
+            print(f"***WARNING*** No ANOVA results for the {model} model of {dep_var}. Plotting parameters only.")
+        elif results_format in ("csv", "both"):
+            anova_df = pd.concat(anova_res, axis=0)  # Merge individual DataFrames into one
+            writer.write_table(anova_df, dep_var_res_dir / f"anova_results_{dep_var}_{model}.csv")
+        if anova_res and results_format in ("sqlite", "both"):
+            writer.submit(write_results, results_db, "anova_results", anova_results_frame(anova_res, model), dep_var,
+                          serial=True)
+        plot_anova_results(all_fitted_params, model, anova_res, dep_var_res_dir, writer, multipage=multipage_figures)
 
-        # Load the fitted parameters
-        res_df = pd.read_csv(fitted_params_file)
+    # Plot fitted curves over raw data, reading curves from the precomputed store
+    if df is None:
+        print(f"Skipping per-subject curve plots in chunked mode (they need the raw trials). "
+              f"Fitted curves are saved in {curve_store_file}")
+    else:
+        plot_curve_fits(df, all_fitted_params, x_var, dep_var, dep_var_res_dir, plot_curves=True,
+                        curve_store=curve_store, writer=writer, multipage=multipage_figures)
 
-        # Determine which dataset to use
-        if dep_var in v_r_vars:
-            dataset_file = v_r_file
-        elif dep_var in d_ml_vars:
-            dataset_file = d_ml_file
+    print("\nVisualization complete. Figures saved in: ", dep_var_res_dir)
+
+
+# %%
+def _init_worker():
+    """Prepares a worker process: sets up the model functions (their messages were shown by the main process)."""
+    with redirect_stdout(io.StringIO()):
+        build_model_functions()
+
+
+def _analyze_dep_var_in_worker(dep_var, precomputed):
+    """
+    Analyzes one DV in a worker process, with its own output writer, capturing everything it prints.
+
+    Returns:
+    - tuple: (dep_var, captured output, True if the analysis succeeded)
+    """
+    log = io.StringIO()
+    succeeded = True
+    with redirect_stdout(log), redirect_stderr(log):
+        try:
+            writer = OutputWriter(output_writer_threads)
+            try:
+                analyze_dep_var(dep_var, precomputed, writer)
+            finally:
+                # Wait for this DV's tables and figures to be written
+                writer.close()
+        except Exception:
+            traceback.print_exc()
+            succeeded = False
+    return dep_var, log.getvalue(), succeeded
+
+
+def run_in_parallel(dv_inputs):
+    """
+    Analyzes the DVs in a pool of N_WORKERS processes. Each worker's BLAS/OpenMP thread count is limited
+    to its share of the CPU cores, so batched linear algebra in the workers does not oversubscribe them.
+    The output of every DV is printed in one piece when it completes, and saved to
+    <RESULTS_DIR>/<DV>/analysis_log_<DV>.txt.
+
+    Parameters:
+    - dv_inputs (dict): DV -> precomputed inputs of analyze_dep_var()
+
+    Returns:
+    - list: DVs whose analysis failed
+    """
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+    for var in BLAS_THREAD_VARS:
+        # Inherited by the workers, which load NumPy after they start; values set by the user are kept
+        os.environ.setdefault(var, str(threads_per_worker))
+    print(f"\n- Analyzing {len(dv_inputs)} DVs in {n_workers} worker processes "
+          f"({os.environ['OMP_NUM_THREADS']} BLAS thread(s) each)...")
+
+    failed = []
+    # "spawn" starts fresh interpreters, so the thread limits apply (forked workers would inherit the
+    # parent's BLAS thread pools) and the behavior is the same on every platform
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(n_workers, mp_context=context, initializer=_init_worker) as pool:
+        futures = [pool.submit(_analyze_dep_var_in_worker, dep_var, precomputed)
+                   for dep_var, precomputed in dv_inputs.items()]
+        for future in as_completed(futures):
+            dep_var, log, succeeded = future.result()
+            print(f"\n========== {dep_var} ==========\n{log}", end="")
+            (results_dir / dep_var).mkdir(parents=True, exist_ok=True)
+            atomic_write(results_dir / dep_var / f"analysis_log_{dep_var}.txt", lambda f: f.write(log),
+                         mode="w", encoding="utf-8")
+            if not succeeded:
+                print(f"***ERROR*** Analysis of {dep_var} failed (see the traceback above).")
+                failed.append(dep_var)
+    return failed
+
+
+# %%
+def main():
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    # Debugging: Print loaded settings
+    print("\nTESTING: Settings Loaded from .env:")
+    print(f"  - Run data cleaning: {run_data_cleaning}")
+    print(f"  - X Variable: {x_var}")
+    print(f"  - Grouping Variables: {group_vars}")
+    print(f"  - Dependent Variables: {dep_vars}")
+    print(f"  - Curve Functions: {curve_functions}")
+    print(f"  - Fit Method: {fit_method}")
+    print(f"  - Compile Models: {compile_backend}")
+    print(f"  - Mixed Effects: {mixed_effects}")
+    print(f"  - Pipeline Mode: {pipeline_mode}")
+    print(f"  - Workers: {n_workers}")
+    print(f"  - Results Directory: {results_dir}")
+    print(f"  - Results Format: {results_format}")
+    print(f"  - Ss: {subj_to_keep}")
+
+    # Validate settings before any data are processed
+    if fit_method not in ["ols"] + list(ROBUST_TUNING):
+        sys.exit(f"***ERROR*** Invalid FIT_METHOD: {fit_method}. Expected one of {['ols'] + list(ROBUST_TUNING)}.")
+    spline_models = [name for name in curve_functions if name in SPLINE_MODELS]
+    if pipeline_mode == "chunked" and spline_models:
+        sys.exit(f"***ERROR*** {', '.join(spline_models)} cannot be fitted with PIPELINE_MODE=chunked. "
+                 f"Remove it from CURVE_FUNCTIONS or use PIPELINE_MODE=in_memory.")
+
+    # Run data cleaning only if enabled
+    if run_data_cleaning:
+        print("\n- Running data cleaning step...")
+        os.system("python src/data_cleaning.py") # runs src/data_cleaning.py as subprocess
+        print("\nData cleaning complete.")
+
+    # Validate above directories and files
+    # print("TESTING: Validating directories and files...") # for testing
+    if not data_dir_cleaned.exists():
+        sys.exit(f"***ERROR*** Data directory not found: {data_dir_cleaned}")
+
+    if not d_ml_file.exists():
+        sys.exit(f"***ERROR*** Missing dataset: {d_ml_file}")
+
+    if not v_r_file.exists():
+        sys.exit(f"***ERROR*** Missing dataset: {v_r_file}")
+
+    build_model_functions()
+
+    # Compute descriptive statistics (src/streaming_descriptives.py) for all DVs of each
+    # dataset in one chunked pass; each DV's analysis picks out its own columns.
+    # In chunked mode (src/chunked_pipeline.py), the same pass also accumulates everything
+    # needed for the polynomial fits and goodness-of-fit, so the data are never fully loaded.
+    descriptives = {}
+    chunked_results = {}
+    if pipeline_mode == "chunked" and fit_method != "ols":
+        print(f"***WARNING*** FIT_METHOD={fit_method} is not available in chunked mode. Using ols.")
+    for dataset_file, dataset_vars in [(d_ml_file, d_ml_vars), (v_r_file, v_r_vars)]:
+        vars_in_file = [dep_var for dep_var in dep_vars if dep_var in dataset_vars]
+        if not vars_in_file:
+            continue
+        if pipeline_mode == "chunked":
+            print(f"- Chunked pass (descriptives, curve fitting, goodness-of-fit) for {', '.join(vars_in_file)}...")
+            chunked_results.update(run_chunked_pipeline(
+                dataset_file, x_var, vars_in_file, group_vars, curve_functions, subj_to_keep, chunksize,
+                mixed_effects=mixed_effects,
+            ))
         else:
-            print(f"Skipping visualization: Dependent variable {dep_var} not recognized.")
+            print(f"- Computing descriptive statistics for {', '.join(vars_in_file)}...")
+            descriptives[dataset_file] = compute_descriptive_stats_streaming(dataset_file, vars_in_file, group_vars, chunksize)
+
+    # Inputs of every DV's analysis
+    dv_inputs = {}
+    for dep_var in dep_vars:
+        # Determine which dataset to use
+        dataset_file = dataset_for(dep_var)
+        if dataset_file is None:
+            print(f"***WARNING*** Dependent variable {dep_var} not recognized. Skipping.")
+            continue
+
+        # Validate dataset file existence before reading
+        if not dataset_file.exists():
+            print(f"***ERROR*** Expected dataset file missing: {dataset_file}")
             continue
 
-        # Load raw dataset
-        df = pd.read_csv(dataset_file)
+        if pipeline_mode == "chunked":
+            dv_inputs[dep_var] = chunked_results[dep_var]
+        else:
+            subj_stats_all, grand_mean_all = descriptives[dataset_file]
+            dv_inputs[dep_var] = {
+                "subj_stats": subj_stats_all[group_vars + ["subj_idx"] + [f"{dep_var}_{stat}" for stat in ("count", "mean", "std")]],
+                "grand_mean": grand_mean_all[group_vars + [f"{dep_var}_mean", f"{dep_var}_std"]],
+            }
+
+    # Run analysis for each DV, in worker processes if requested (see analysis_config.env, N_WORKERS)
+    if n_workers > 1 and len(dv_inputs) > 1:
+        failed = run_in_parallel(dv_inputs)
+        if failed:
+            sys.exit(f"***ERROR*** Analysis failed for: {', '.join(failed)}")
+    else:
+        # Tables and figures are written in the background while the next DV/model is computed
+        # (see analysis_config.env, OUTPUT_WRITER_THREADS)
+        writer = OutputWriter(output_writer_threads)
+        for dep_var, precomputed in dv_inputs.items():
+            analyze_dep_var(dep_var, precomputed, writer)
+        # Wait for all queued tables and figures to be written
+        writer.close()
 
-        # Call the visualization function
-        plot_curve_fits(df, res_df, x_var, dep_var, dep_var_res_dir, plot_curves=True)
+    print("\nAnalysis complete. Results saved in: ", results_dir)
 
-    print("\nVisualization complete. Figures saved in: ", dep_var_res_dir)
 
-print("\nAnalysis complete. Results saved in: ", results_dir)
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
+import io
+import numpy as np
 import pandas as pd
 from statsmodels.stats.anova import AnovaRM
 from pathlib import Path
+from param_store import load_param_store, model_names, model_params
 
 def run_anova(df, model_name):
     """
@@ -8,27 +11,25 @@ def run_anova(df, model_name):
     for all parameters in a given model.
 
     Parameters:
-    - df (pd.Dataframe): Data containing fitted parameters
+    - df (dict or pd.Dataframe): Parameter store (see param_store.py) or data containing fitted parameters
     - model_name (str): The model name to filter data for analysis
 
     Returns:
     - dict: Dictionary with ANOVA results for each parameter
     """
 
-    # Filter the data for the selected model
-    df_model = df[df["model"] == model_name]
-
-    # Get all parameter columns
-    param_cols = [col for col in df.columns if col.startswith("param_")]
+    # Fits of the selected model, with exactly its parameter columns
+    df_model = model_params(df, model_name)
+    param_cols = [col for col in df_model.columns if col.startswith("param_")]
 
     print(f"\n\nRunning repeated measures ANOVA for {model_name} model...")
 
     anova_results = {}
 
     for param in param_cols:
-        # Skip ANOVA if column contains NaN values
+        # AnovaRM needs a value for every subject in every condition
         if df_model[param].isna().any():
-            print(f"Skipping {param} since it is not in the {model_name} model.")
+            print(f"Skipping {param}: curve fitting failed for at least one subject/condition.")
             continue
 
         print(f"\nANOVA for {param}:")
@@ -42,27 +43,67 @@ def run_anova(df, model_name):
 
     return anova_results
 
-def plot_anova_results(df, model_name, anova_results, output_dir):
+def summarize_parameters(df_model, param_cols):
+    """
+    Computes the mean and SD of every parameter in every condition in one grouped pass.
+
+    Parameters:
+    - df_model (pd.DataFrame): Fits of one model (output of model_params())
+    - param_cols (list): Parameter columns to summarize
+
+    Returns:
+    - pd.DataFrame: Columns mean, std; indexed by param, g_level_corrected (as str) and bed_chair
+    """
+    long = df_model.melt(id_vars=["g_level_corrected", "bed_chair"], value_vars=param_cols, var_name="param")
+    long["g_level_corrected"] = long["g_level_corrected"].astype(str)
+    long["bed_chair"] = long["bed_chair"].astype(str)
+    return long.groupby(["param", "g_level_corrected", "bed_chair"], sort=True)["value"].agg(["mean", "std"])
+
+def _posture_cells(summary, param, bed_chair, category_order, dodge_offset):
+    """Dodged x positions, means and SDs of one parameter for one posture, from summarize_parameters()."""
+    cells = summary.loc[param]
+    cells = cells[cells.index.get_level_values("bed_chair") == bed_chair]
+    g_levels = cells.index.get_level_values("g_level_corrected")
+    x = np.array([category_order.index(g) for g in g_levels], dtype=float)
+    x += dodge_offset if bed_chair == "V" else -dodge_offset
+    return x, cells["mean"].to_numpy(), cells["std"].to_numpy()
+
+def _significant_effects(anova_results, param):
+    """Names of the effects with p < .05 in the ANOVA of one parameter."""
+    if param not in anova_results:
+        return []
+    p_values = anova_results[param]["Pr > F"]
+    significant_effects = []
+    if p_values["g_level_corrected"] < 0.05:
+        significant_effects.append("G-Level Effect")
+    if p_values["bed_chair"] < 0.05:
+        significant_effects.append("Posture Effect")
+    if p_values["g_level_corrected:bed_chair"] < 0.05:
+        significant_effects.append("Interaction Effect")
+    return significant_effects
+
+def plot_anova_results(df, model_name, anova_results, output_dir, writer=None, multipage=False):
     """
     Generates dot plots for each parameter, showing group means by condition, +/- 1SD.
     Adds annotations for significant effects (p < .05).
 
     Parameters:
-    - df (pd.DataFrame): Data containing fitted parameters
+    - df (dict or pd.DataFrame): Parameter store (see param_store.py) or data containing fitted parameters
     - model_name (str): Model name for filtering data
     - anova_results (dict): Dictionary containing ANOVA results and p-values
     - output_dir (Path): Directory where plots will be saved
+    - writer (OutputWriter): Background writer for the figures (see output_writer.py); None writes them directly
+    - multipage (bool): If True, write all parameters of the model as pages of one PDF, reusing a single figure
     """
     import matplotlib.pyplot as plt
+    from output_writer import save_figure
 
     plt.rcParams.update(plt.rcParamsDefault)  # ✅ Resets all settings
     plt.style.use("default")  # ✅ Ensures consistent style
     output_dir.mkdir(exist_ok=True) # Ensure output directory exists
 
-    # Filter dataset for the selected model
-    df_model = df[df["model"] == model_name]
-
-    # Get all parameter columns
+    # Fits of the selected model, with exactly its parameter columns
+    df_model = model_params(df, model_name)
     param_cols = [col for col in df_model.columns if col.startswith("param_")]
 
     # Capitalize model name for title
@@ -72,61 +113,36 @@ def plot_anova_results(df, model_name, anova_results, output_dir):
     color_mapping = {"V": "orange", "R": "blue"}
     label_mapping = {"V": "Bed", "R": "Chair"}  # Renaming for legend
 
-    for param in param_cols:
-        if df_model[param].isna().any():
-            continue # Skip parameters with missing values
+    # Group means and standard deviations of every parameter in every condition, computed once
+    summary = summarize_parameters(df_model, param_cols)
+    category_order = sorted(summary.index.get_level_values("g_level_corrected").unique())  # Ensure correct x-axis order
+    dodge_offset = 0.1  # Adjust separation between bed_chair conditions
 
-        # Compute group means and standard deviations
-        summary = df_model.groupby(["g_level_corrected", "bed_chair"])[param].agg(["mean","std"]).reset_index()
-        
-        # Convert g_level_corrected to categorical for proper ordering
-        summary["g_level_corrected"] = summary["g_level_corrected"].astype(str)
+    if multipage:
+        _plot_anova_results_multipage(summary, param_cols, category_order, dodge_offset, model_name,
+                                      anova_results, output_dir, color_mapping, label_mapping, writer)
+        return
 
+    for param in param_cols:
         # Initialize plot
         plt.figure(figsize=(8, 6))
 
-        # Create scatter plot for means with dodge effect
-        dodge_offset = 0.1  # Adjust separation between bed_chair conditions
-        category_order = sorted(summary["g_level_corrected"].unique())  # Ensure correct x-axis order
-
-        x_positions = []
-        legend_handles = [] 
-
-        for i, g_level in enumerate(category_order):
-            for bed_chair in ["V", "R"]:  # Ensure consistent order
-                subset = summary[(summary["g_level_corrected"] == g_level) & (summary["bed_chair"] == bed_chair)]
-                if not subset.empty:
-                    x_actual = i + (dodge_offset if bed_chair == "V" else -dodge_offset)
-                    x_positions.append((x_actual, subset["mean"].values[0], subset["std"].values[0], bed_chair))
-                    # Create scatter points and store legend handles
-                    scatter = plt.scatter(x_actual, subset["mean"], label=label_mapping[bed_chair],
-                                        s=100, edgecolor="black", color=color_mapping[bed_chair])
-                    if label_mapping[bed_chair] not in [h.get_label() for h in legend_handles]:
-                        legend_handles.append(scatter)
-
-        # Add error bars
-        for x_actual, mean_val, std_val, bed_chair in x_positions:
-            plt.errorbar(
-                x=x_actual, y=mean_val, yerr=std_val, fmt="none",
-                color="black", capsize=5, elinewidth=1
-            )
+        # Scatter plot of the means with dodge effect, and error bars, one call per posture
+        legend_handles = []
+        for bed_chair in ["V", "R"]:  # Ensure consistent order
+            x, mean, std = _posture_cells(summary, param, bed_chair, category_order, dodge_offset)
+            if not len(x):
+                continue
+            legend_handles.append(plt.scatter(x, mean, label=label_mapping[bed_chair],
+                                              s=100, edgecolor="black", color=color_mapping[bed_chair]))
+            plt.errorbar(x=x, y=mean, yerr=std, fmt="none", color="black", capsize=5, elinewidth=1)
 
         # Add annotation if there is a significant effect
-        if param in anova_results:
-            p_values = anova_results[param]["Pr > F"]
-            significant_effects = []
-
-            if p_values["g_level_corrected"] < 0.05:
-                significant_effects.append("G-Level Effect")
-            if p_values["bed_chair"] < 0.05:
-                significant_effects.append("Posture Effect")
-            if p_values["g_level_corrected:bed_chair"] < 0.05:
-                significant_effects.append("Interaction Effect")
-
-            if significant_effects:
-                sig_text = "Significant: " + ", ".join(significant_effects)
-                plt.annotate(sig_text, xy=(0.05, 0.95), xycoords="axes fraction", fontsize=10, color="red",
-                            bbox=dict(facecolor="white", edgecolor="red", boxstyle="round,pad=0.3"))
+        significant_effects = _significant_effects(anova_results, param)
+        if significant_effects:
+            sig_text = "Significant: " + ", ".join(significant_effects)
+            plt.annotate(sig_text, xy=(0.05, 0.95), xycoords="axes fraction", fontsize=10, color="red",
+                        bbox=dict(facecolor="white", edgecolor="red", boxstyle="round,pad=0.3"))
                 
         # Set x-axis labels
         plt.xticks(ticks=range(len(category_order)), labels=category_order)
@@ -145,11 +161,70 @@ def plot_anova_results(df, model_name, anova_results, output_dir):
         # Construct the full file path for the plot
         plot_name = plot_dir / f"{model_name}_{param}_anova_plot.pdf"
         # Save the plot
-        plt.savefig(str(plot_name), format="pdf", bbox_inches="tight")  # Ensure this is a string path
-        plt.close()
+        save_figure(plt.gcf(), str(plot_name), writer, format="pdf", bbox_inches="tight")  # Ensure this is a string path
 
         print(f"Saved ANOVA plot for {param}: {plot_name}")
 
+def _plot_anova_results_multipage(summary, param_cols, category_order, dodge_offset, model_name, anova_results,
+                                  output_dir, color_mapping, label_mapping, writer=None):
+    """
+    Writes the ANOVA dot plots of all parameters of one model as pages of a single PDF,
+    drawing the figure once and only updating its data for each parameter.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.collections import LineCollection
+    from output_writer import save_buffer
+
+    # Figure template: one set of points, error bars and caps per posture, updated for each parameter
+    fig, ax = plt.subplots(figsize=(8, 6))
+    artists = {}
+    for bed_chair in ["V", "R"]:
+        artists[bed_chair] = {
+            "bars": ax.add_collection(LineCollection([], colors="black", linewidths=1)),
+            "caps": ax.plot([], [], linestyle="none", marker="_", markersize=10, color="black")[0],
+            "means": ax.scatter([], [], label=label_mapping[bed_chair], s=100, edgecolor="black",
+                                color=color_mapping[bed_chair], zorder=3),
+        }
+    sig_annotation = ax.annotate("", xy=(0.05, 0.95), xycoords="axes fraction", fontsize=10, color="red",
+                                 bbox=dict(facecolor="white", edgecolor="red", boxstyle="round,pad=0.3"))
+    ax.set_xticks(range(len(category_order)), labels=category_order)
+    ax.set_xlim(-0.5, len(category_order) - 0.5)
+    ax.set_xlabel("G-level")
+    ax.legend(handles=[artists[bed_chair]["means"] for bed_chair in ["V", "R"]], title="Posture", loc="upper right")
+
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for param in param_cols:
+            y_limits = []
+            for bed_chair in ["V", "R"]:
+                x, mean, std = _posture_cells(summary, param, bed_chair, category_order, dodge_offset)
+                artists[bed_chair]["means"].set_offsets(np.column_stack([x, mean]))
+                artists[bed_chair]["bars"].set_segments(
+                    [[(xi, mi - si), (xi, mi + si)] for xi, mi, si in zip(x, mean, std)])
+                artists[bed_chair]["caps"].set_data(np.concatenate([x, x]), np.concatenate([mean - std, mean + std]))
+                y_limits.extend([np.nanmin(mean - std, initial=np.inf), np.nanmax(mean + std, initial=-np.inf),
+                                 np.nanmin(mean, initial=np.inf), np.nanmax(mean, initial=-np.inf)])
+
+            significant_effects = _significant_effects(anova_results, param)
+            sig_annotation.set_text("Significant: " + ", ".join(significant_effects))
+            sig_annotation.set_visible(bool(significant_effects))
+
+            y_min, y_max = min(y_limits), max(y_limits)
+            if np.isfinite(y_min) and np.isfinite(y_max):
+                y_pad = 0.1 * (y_max - y_min) or 1.0
+                ax.set_ylim(y_min - y_pad, y_max + y_pad)
+            ax.set_ylabel(f"Group mean {param} +/- 1SD")
+            ax.set_title(f"{model_name.capitalize()} - {param} by Condition")
+            pdf.savefig(fig, bbox_inches="tight")
+    plt.close(fig)
+
+    plot_dir = output_dir / f"anova_plots_{model_name}_model"
+    plot_dir.mkdir(parents=True, exist_ok=True)
+    plot_name = plot_dir / f"{model_name}_anova_plots.pdf"
+    save_buffer(buffer, plot_name, writer)
+    print(f"Saved ANOVA plots for all {model_name} parameters: {plot_name}")
+
 if __name__ == "__main__":
     # Define paths
     params_path = Path(__file__).resolve().parent.parent / "data" / "curve_fitting_output" / "fitted_parameters_all_models.csv"
@@ -164,9 +239,12 @@ if __name__ == "__main__":
 
     # Filter DataFrame to only analyze data from subjects with complete data
     df = df[df["subj_idx"].isin(VALID_SUBJECTS)]
+    if "param_idx" in df.columns:
+        # Long-format parameter store written by run_analysis.py (fitted_parameters_<DV>.csv)
+        df = load_param_store(df)
 
     # Ask user for models to analyze
-    available_models = df["model"].unique()
+    available_models = model_names(df)
     print("\nAvailable models:", available_models)
 
     user_input = input("Enter models to analyze (comma-separated, for example: linear, quadratic): ").strip()
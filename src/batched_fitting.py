@@ -0,0 +1,333 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import stats
+from curve_functions import MODEL_FUNCTIONS, POLYNOMIAL_DEGREES, model_n_params
+from curve_fitting import fit_covariance, uncertainty_columns
+from param_store import GROUP_COLS, model_function, model_params
+
+# Default tuning constants (95% efficiency under normal errors)
+ROBUST_TUNING = {"huber": 1.345, "bisquare": 4.685}
+
+
+def pad_groups(df, x_col, y_col, group_cols=GROUP_COLS):
+    """
+    Packs trial rows into padded (groups x trials) arrays so that all groups can be fitted at once.
+
+    Parameters:
+    - df (pd.DataFrame): Trial-level data
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - group_cols (list): Columns identifying one fitted curve
+
+    Returns:
+    - keys (pd.DataFrame): One row per group, in sorted group order
+    - x, y (np.ndarray): Arrays of shape (n_groups, max_trials), zero-padded
+    - mask (np.ndarray): Boolean array, True where a real (finite) trial is stored
+    - rows (np.ndarray): Index label of the trial stored in each slot (padding is -1)
+    """
+    df = df[np.isfinite(df[x_col].to_numpy(float)) & np.isfinite(df[y_col].to_numpy(float))]
+    grouped = df.groupby(group_cols, sort=True, observed=True)
+    group_id = grouped.ngroup().to_numpy()
+    slot = grouped.cumcount().to_numpy()
+    keys = grouped.size().reset_index()[group_cols]
+    # Plain values for the keys, also when the grouping columns are categorical
+    keys = pd.DataFrame({col: np.asarray(keys[col]) for col in group_cols})
+
+    # Rows with a missing grouping value are not part of any group
+    valid = group_id >= 0
+    group_id, slot = group_id[valid], slot[valid]
+
+    n_groups = len(keys)
+    n_max = slot.max() + 1 if slot.size else 0
+    x = np.zeros((n_groups, n_max))
+    y = np.zeros((n_groups, n_max))
+    mask = np.zeros((n_groups, n_max), dtype=bool)
+    rows = np.full((n_groups, n_max), -1, dtype=np.int64)
+
+    x[group_id, slot] = df[x_col].to_numpy(float)[valid]
+    y[group_id, slot] = df[y_col].to_numpy(float)[valid]
+    mask[group_id, slot] = True
+    rows[group_id, slot] = np.arange(len(df))[valid]
+    rows[mask] = df.index.to_numpy()[rows[mask]]
+
+    return keys, x, y, mask, rows
+
+
+def polynomial_design(x, degree, scale=1.0):
+    """
+    Builds the polynomial design matrix [1, x, x^2, ...] for any array of x values.
+
+    Parameters:
+    - x (np.ndarray): x values, any shape
+    - degree (int): Polynomial degree
+    - scale (float or np.ndarray): x is divided by this before raising to powers
+      (broadcast against x) to keep the normal equations well conditioned
+
+    Returns:
+    - np.ndarray: Array of shape x.shape + (degree + 1,)
+    """
+    return (np.asarray(x) / scale)[..., None] ** np.arange(degree + 1)
+
+
+def batched_wls(X, y, w):
+    """
+    Solves one weighted least squares problem per group in a single batched call.
+
+    Parameters:
+    - X (np.ndarray): Design matrices, shape (n_groups, n_trials, n_params)
+    - y (np.ndarray): Responses, shape (n_groups, n_trials)
+    - w (np.ndarray): Weights, shape (n_groups, n_trials); padding must have weight 0
+
+    Returns:
+    - beta (np.ndarray): Coefficients, shape (n_groups, n_params)
+    - xtwx (np.ndarray): Weighted normal matrices, shape (n_groups, n_params, n_params)
+    """
+    Xw = X * w[..., None]
+    xtwx = np.einsum("gnp,gnq->gpq", Xw, X)
+    xtwy = np.einsum("gnp,gn->gp", Xw, y)
+    try:
+        beta = np.linalg.solve(xtwx, xtwy[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # Some groups are rank deficient: only those fall back to the pseudo-inverse
+        singular = np.linalg.matrix_rank(xtwx) < xtwx.shape[-1]
+        beta = np.empty(xtwy.shape)
+        beta[~singular] = np.linalg.solve(xtwx[~singular], xtwy[~singular][..., None])[..., 0]
+        beta[singular] = np.einsum("gpq,gq->gp", np.linalg.pinv(xtwx[singular]), xtwy[singular])
+    return beta, xtwx
+
+
+def _masked_median(a, mask):
+    """Median along the last axis, ignoring padded slots."""
+    return np.nanmedian(np.where(mask, a, np.nan), axis=-1)
+
+
+def _robust_weights(u, loss, c):
+    """IRLS weights for standardized residuals u under the given loss."""
+    abs_u = np.abs(u)
+    if loss == "huber":
+        return np.minimum(1.0, c / np.maximum(abs_u, 1e-12))
+    return np.where(abs_u < c, (1 - (u / c) ** 2) ** 2, 0.0)
+
+
+def fit_curve_robust(data, subj_to_keep, x_col, y_col, model_name, loss="huber",
+                     tuning=None, max_iter=100, tol=1e-6, scale_iter=10):
+    """
+    Fits a polynomial model to every subject x condition group with robust IRLS
+    (Huber or bisquare loss). Each iteration solves the weighted least squares
+    problems of all groups at once.
+
+    Parameters:
+    - data (Path, str, or pd.DataFrame): Path to the CSV file with x and y values, or the DataFrame itself
+    - subj_to_keep (list): List of subject IDs to include in the analysis
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - model_name (str): Name of the polynomial model to fit (see POLYNOMIAL_DEGREES)
+    - loss (str): "huber" or "bisquare"
+    - tuning (float): Tuning constant; defaults to ROBUST_TUNING[loss]
+    - max_iter (int): Maximum number of IRLS iterations
+    - tol (float): A group has converged when no fitted value changes by more than tol times its robust scale
+    - scale_iter (int): Number of iterations after which the robust scale is held fixed; re-estimating the
+      (piecewise constant) MAD at every step makes the coefficients settle very slowly
+
+    Returns:
+    - pd.DataFrame: Fitted parameters and their uncertainty (sandwich covariance; resid_var is the robust
+      scale squared), same layout as fit_curve()
+    - pd.DataFrame: Final IRLS weight of every trial used in the fit
+    """
+    if model_name not in POLYNOMIAL_DEGREES:
+        raise ValueError(f"Robust fitting is only available for polynomial models, not '{model_name}'.")
+    if loss not in ROBUST_TUNING:
+        raise ValueError(f"Invalid loss: {loss}. Expected one of {list(ROBUST_TUNING)}.")
+    c = ROBUST_TUNING[loss] if tuning is None else tuning
+
+    # Load relevant pd.DataFrame or CSV file
+    if isinstance(data, pd.DataFrame):
+        df = data
+    elif isinstance(data, (str, Path)):
+        df = pd.read_csv(data)
+    else:
+        raise ValueError(
+            f"Invalid data input type: {type(data)}. Expected a DataFrame or file path."
+        )
+
+    if subj_to_keep is not None:
+        df = df[df["subj_idx"].isin(subj_to_keep)]
+    else:
+        print("⚠️ Warning: subj_to_keep is None. No filtering will be applied.")
+
+    degree = POLYNOMIAL_DEGREES[model_name]
+    n_params = degree + 1
+    keys, x, y, mask, rows = pad_groups(df, x_col, y_col)
+
+    # Scale x per group so high powers stay well conditioned
+    x_scale = np.max(np.abs(np.where(mask, x, 0.0)), axis=1, keepdims=True)
+    x_scale[x_scale == 0] = 1.0
+    X = polynomial_design(x, degree, x_scale)
+
+    # Start from ordinary least squares
+    w = mask.astype(float)
+    beta, xtwx = batched_wls(X, y, w)
+
+    n_obs = mask.sum(axis=1)
+    for n_iter in range(1, max_iter + 1):
+        resid = y - np.einsum("gnp,gp->gn", X, beta)
+        if n_iter <= scale_iter:
+            # Robust scale estimate per group (normalized median absolute deviation)
+            med = _masked_median(resid, mask)
+            mad = _masked_median(np.abs(resid - med[:, None]), mask) / 0.6745
+            mad = np.where(np.isfinite(mad) & (mad > 0), mad, 1.0)
+
+        w = _robust_weights(resid / mad[:, None], loss, c) * mask
+        beta_new, xtwx = batched_wls(X, y, w)
+
+        # Change of the fitted curve on the trials, relative to the noise level (scale-free, and not
+        # held up by coefficients that are close to zero)
+        step = np.max(np.abs(np.einsum("gnp,gp->gn", X, beta_new - beta)) * mask, axis=1)
+        converged = step <= tol * mad
+        # Groups that cannot be fitted (see too_small below) do not hold up the others
+        converged |= ~np.all(np.isfinite(beta_new), axis=1) | (n_obs < n_params)
+        beta = beta_new
+        if np.all(converged):
+            break
+
+    if np.all(converged):
+        print(f"✅ Robust ({loss}) {model_name} fit: {len(keys)} groups, {n_iter} IRLS iterations")
+    else:
+        print(f"***WARNING*** Robust ({loss}) {model_name} fit did not converge in {max_iter} IRLS iterations for:")
+        for subj, g_level, posture in keys[~converged].itertuples(index=False):
+            print(f"   subject {subj}, g-level {g_level}, posture condition {posture}")
+
+    # Huber sandwich covariance (X'WX)^-1 X' diag(w^2 r^2) X (X'WX)^-1 at the final weights, with the
+    # small-sample factor n / (n - p). The residual variance (used as the trial noise variance in
+    # prediction bands, which are therefore approximate) is the robust scale, (normalized MAD)^2.
+    resid = y - np.einsum("gnp,gp->gn", X, beta)
+    bread = np.linalg.pinv(xtwx)
+    Xpsi = X * (w * resid)[..., None]
+    meat = np.einsum("gnp,gnq->gpq", Xpsi, Xpsi)
+    dof = n_obs - n_params
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correction = np.where(dof > 0, n_obs / dof, np.nan)
+        med = _masked_median(resid, mask)
+        resid_var = np.where(dof > 0, (_masked_median(np.abs(resid - med[:, None]), mask) / 0.6745) ** 2, np.nan)
+    cov = bread @ meat @ bread * correction[:, None, None]
+
+    # Groups with fewer trials than parameters cannot be fitted
+    too_small = n_obs < n_params
+    for subj, g_level, posture in keys[too_small].itertuples(index=False):
+        print(
+            f"Curve fitting failed for subject {subj}, g-level {g_level}, posture condition {posture}"
+        )
+    beta[too_small] = np.nan
+    cov[too_small] = np.nan
+
+    # Undo the x scaling: coefficient k multiplies (x / scale)^k
+    unscale = 1 / x_scale ** np.arange(n_params)
+    params = beta * unscale
+    cov = cov * unscale[:, :, None] * unscale[:, None, :]
+
+    fitted_params = keys.copy()
+    fitted_params["model"] = model_name
+    for i in range(n_params):
+        fitted_params[f"param_{i}"] = params[:, i]
+    fitted_params = fitted_params.assign(**uncertainty_columns(cov, n_obs, resid_var))
+
+    weights = keys.iloc[np.nonzero(mask)[0]].reset_index(drop=True)
+    weights.insert(0, "row", rows[mask])
+    weights["model"] = model_name
+    weights[x_col] = x[mask]
+    weights[y_col] = y[mask]
+    weights["weight"] = w[mask]
+
+    return fitted_params, weights
+
+
+def model_jacobian(model_name, x_grid, params, func=None, rel_step=1e-6):
+    """
+    Derivative of the model curve with respect to each parameter, for all groups at once.
+
+    Polynomial models use their design matrix (shared by all groups). Other models
+    use central finite differences, which requires `func` to broadcast over arrays
+    of parameters the way NumPy expressions do.
+
+    Parameters:
+    - model_name (str): Name of the model
+    - x_grid (np.ndarray): Shared x values, shape (n_points,)
+    - params (np.ndarray): Fitted parameters, shape (n_groups, n_params)
+    - func (callable): Model function or compiled kernel (see model_kernels.py);
+      defaults to MODEL_FUNCTIONS[model_name]
+
+    Returns:
+    - np.ndarray: Shape (n_points, n_params) for polynomial models,
+      otherwise (n_groups, n_points, n_params)
+    """
+    if model_name in POLYNOMIAL_DEGREES:
+        return polynomial_design(x_grid, POLYNOMIAL_DEGREES[model_name])
+
+    func = MODEL_FUNCTIONS[model_name] if func is None else func
+    if hasattr(func, "jac"):
+        # Compiled kernel (see model_kernels.py): Jacobian of all groups in one call
+        return func.jac(x_grid[None, :], *params.T[:, :, None])
+    n_params = params.shape[1]
+    jac = np.empty((params.shape[0], len(x_grid), n_params))
+    for k in range(n_params):
+        step = rel_step * np.maximum(np.abs(params[:, k]), 1.0)
+        hi, lo = params.copy(), params.copy()
+        hi[:, k] += step
+        lo[:, k] -= step
+        f_hi = func(x_grid[None, :], *hi.T[:, :, None])
+        f_lo = func(x_grid[None, :], *lo.T[:, :, None])
+        jac[:, :, k] = (f_hi - f_lo) / (2 * step[:, None])
+    return jac
+
+
+def compute_prediction_bands(fitted_params, model_name, x_grid, level=0.95, func=None):
+    """
+    Evaluates fitted curves with confidence and prediction bands for every group on a shared x grid.
+
+    The variance of the fitted mean at each grid point is J C J' for every group,
+    computed in one batched matrix product (J: model Jacobian, C: parameter covariance).
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Parameter store (see param_store.py) or wide output
+      of fit_curve() / fit_curve_robust() (may hold several models)
+    - model_name (str): Name of the model to evaluate
+    - x_grid (np.ndarray): Shared x values, shape (n_points,)
+    - level (float): Coverage of the bands (e.g. 0.95)
+    - func (callable): Model function; defaults to MODEL_FUNCTIONS[model_name] (splines are evaluated
+      over the knot range stored with their fits)
+
+    Returns:
+    - dict: "keys" (pd.DataFrame of groups) and arrays of shape (n_groups, n_points):
+      "fit", "ci_lower", "ci_upper", "pi_lower", "pi_upper"
+    """
+    func = model_function(fitted_params, model_name, func)
+    x_grid = np.asarray(x_grid, dtype=float)
+    fits = model_params(fitted_params, model_name)
+    n_params = model_n_params(func)
+    params = fits[[f"param_{i}" for i in range(n_params)]].to_numpy(float)
+    cov = fit_covariance(fits, n_params)
+
+    jac = model_jacobian(model_name, x_grid, params, func)
+    if jac.ndim == 2:
+        fit = params @ jac.T
+        var_mean = np.einsum("mp,gpq,mq->gm", jac, cov, jac)
+    else:
+        fit = func(x_grid[None, :], *params.T[:, :, None])
+        var_mean = np.einsum("gmp,gpq,gmq->gm", jac, cov, jac)
+
+    resid_var = fits["resid_var"].to_numpy(float)[:, None]
+    dof = fits["n_obs"].to_numpy(float) - n_params
+    with np.errstate(invalid="ignore"):
+        t_crit = stats.t.ppf(0.5 + level / 2, np.where(dof > 0, dof, np.nan))[:, None]
+    ci = t_crit * np.sqrt(var_mean)
+    pi = t_crit * np.sqrt(var_mean + resid_var)
+
+    return {
+        "keys": fits[GROUP_COLS],
+        "fit": fit,
+        "ci_lower": fit - ci,
+        "ci_upper": fit + ci,
+        "pi_lower": fit - pi,
+        "pi_upper": fit + pi,
+    }
@@ -0,0 +1,306 @@
+import numpy as np
+import pandas as pd
+from curve_functions import POLYNOMIAL_DEGREES
+from curve_fitting import uncertainty_columns
+from batched_fitting import polynomial_design
+from mixed_effects import fit_mixed_from_moments
+from param_store import GROUP_COLS
+from streaming_descriptives import accumulate, describe_from_accumulators, merge_accumulators
+
+# Smallest singular value of a group's X'X (in scaled x), relative to its largest, for the group
+# to be fitted; below it the group has (numerically) fewer distinct x values than parameters
+RANK_RTOL = 1e-10
+
+
+def accumulate_moments(df, x_col, y_col, max_degree, x_scale):
+    """
+    Sums the moments needed to fit polynomials up to max_degree, per group, for one chunk of trials.
+
+    Parameters:
+    - df (pd.DataFrame): Chunk of trial-level data
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - max_degree (int): Highest polynomial degree that will be fitted
+    - x_scale (float): x is divided by this before raising to powers (same value for every chunk)
+
+    Returns:
+    - pd.DataFrame: One row per group (MultiIndex of GROUP_COLS) with columns
+      xk_0..xk_{2d} (sums of x^k), xky_0..xky_d (sums of x^k * y) and yy (sum of y^2)
+    """
+    x = df[x_col].to_numpy(float) / x_scale
+    y = df[y_col].to_numpy(float)
+    valid = np.isfinite(x) & np.isfinite(y)
+
+    powers = x[valid, None] ** np.arange(2 * max_degree + 1)
+    sums = np.hstack([powers, powers[:, :max_degree + 1] * y[valid, None], y[valid, None] ** 2])
+    columns = (
+        [f"xk_{k}" for k in range(2 * max_degree + 1)]
+        + [f"xky_{k}" for k in range(max_degree + 1)]
+        + ["yy"]
+    )
+    keys = [np.asarray(df[col])[valid] for col in GROUP_COLS]
+    moments = pd.DataFrame(sums, columns=columns).groupby(keys).sum()
+    moments.index.names = GROUP_COLS
+    return moments
+
+
+def merge_moments(a, b):
+    """
+    Combines moment sums from two chunks (or files, or workers).
+
+    Parameters:
+    - a, b (pd.DataFrame): Outputs of accumulate_moments() with the same max_degree and x_scale
+      (or of accumulate_residuals())
+
+    Returns:
+    - pd.DataFrame: Moment sums covering the trials of both inputs
+    """
+    return a.add(b, fill_value=0.0).sort_index()
+
+
+def _normal_equations(moments, degree):
+    """X'X (in scaled x), X'y and number of trials of every group."""
+    n_params = degree + 1
+    xk = moments[[f"xk_{k}" for k in range(2 * degree + 1)]].to_numpy(float)
+    xty = moments[[f"xky_{k}" for k in range(n_params)]].to_numpy(float)
+    # X'X is a Hankel matrix of the power sums: (X'X)[i, j] = sum x^(i + j)
+    xtx = xk[:, np.add.outer(np.arange(n_params), np.arange(n_params))]
+    return xtx, xty, xk[:, 0]
+
+
+def _solve_moments(moments, degree):
+    """Least squares coefficients (in scaled x), normal matrices, trial counts and fittable groups."""
+    n_params = degree + 1
+    xtx, xty, n_obs = _normal_equations(moments, degree)
+    # A group needs at least as many distinct x values as parameters, i.e. X'X of full rank
+    s = np.linalg.svd(xtx, compute_uv=False)
+    fittable = (n_obs >= n_params) & (s[:, -1] > RANK_RTOL * s[:, 0])
+    beta = np.full((len(moments), n_params), np.nan)
+    if fittable.any():
+        beta[fittable] = np.linalg.solve(xtx[fittable], xty[fittable, :, None])[..., 0]
+    return beta, xtx, n_obs, fittable
+
+
+def accumulate_residuals(df, x_col, y_col, coefs, group_means, x_scale):
+    """
+    Sums the squared residuals of fitted polynomials, and the squared deviations from the
+    group mean, per group, for one chunk of trials (once the coefficients are known).
+    Unlike the same sums expanded from the moments, these do not lose precision to cancellation.
+
+    Parameters:
+    - df (pd.DataFrame): Chunk of trial-level data
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - coefs (dict): Model name -> coefficients in scaled x (pd.DataFrame indexed by GROUP_COLS)
+    - group_means (pd.Series): Mean y of every group (indexed by GROUP_COLS)
+    - x_scale (float): The x_scale used when accumulating the moments
+
+    Returns:
+    - pd.DataFrame: One row per group (MultiIndex of GROUP_COLS) with columns
+      ssr_<model> (sum of squared residuals of each model) and ss_tot
+    """
+    x = df[x_col].to_numpy(float) / x_scale
+    y = df[y_col].to_numpy(float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+
+    keys = [np.asarray(df[col])[valid] for col in GROUP_COLS]
+    index = pd.MultiIndex.from_arrays(keys, names=GROUP_COLS)
+    sums = {"ss_tot": (y - group_means.reindex(index).to_numpy(float)) ** 2}
+    for model_name, coef in coefs.items():
+        beta = coef.reindex(index).to_numpy(float)
+        y_pred = np.einsum("np,np->n", polynomial_design(x, beta.shape[1] - 1), beta)
+        sums[f"ssr_{model_name}"] = (y - y_pred) ** 2
+    residuals = pd.DataFrame(sums).groupby(keys).sum()
+    residuals.index.names = GROUP_COLS
+    return residuals
+
+
+def fit_from_moments(moments, residuals, model_name, x_scale):
+    """
+    Fits a polynomial model to every group from accumulated moment sums.
+
+    Parameters:
+    - moments (pd.DataFrame): Output of accumulate_moments() / merge_moments()
+    - residuals (pd.DataFrame): Output of accumulate_residuals() for this model's coefficients
+    - model_name (str): Name of the polynomial model (see POLYNOMIAL_DEGREES)
+    - x_scale (float): The x_scale used when accumulating
+
+    Returns:
+    - pd.DataFrame: Fitted parameters and their uncertainty, same layout as fit_curve()
+    """
+    degree = POLYNOMIAL_DEGREES[model_name]
+    n_params = degree + 1
+    beta, xtx, n_obs, fittable = _solve_moments(moments, degree)
+    ssr = residuals[f"ssr_{model_name}"].reindex(moments.index, fill_value=0.0).to_numpy(float)
+
+    dof = n_obs - n_params
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resid_var = np.where(fittable & (dof > 0), ssr / dof, np.nan)
+    cov = np.full_like(xtx, np.nan)
+    if fittable.any():
+        cov[fittable] = np.linalg.inv(xtx[fittable]) * resid_var[fittable, None, None]
+
+    for subj, g_level, posture in moments.index[~fittable]:
+        print(
+            f"Curve fitting failed for subject {subj}, g-level {g_level}, posture condition {posture}"
+        )
+
+    # Undo the x scaling: coefficient k multiplies (x / scale)^k
+    unscale = 1 / x_scale ** np.arange(n_params)
+    params = beta * unscale
+    cov = cov * unscale[:, None] * unscale[None, :]
+
+    fitted_params = moments.index.to_frame(index=False)
+    fitted_params["model"] = model_name
+    for i in range(n_params):
+        fitted_params[f"param_{i}"] = params[:, i]
+    return fitted_params.assign(**uncertainty_columns(cov, n_obs.astype(np.int64), resid_var))
+
+
+def gof_from_moments(moments, residuals, model_name):
+    """
+    Computes R^2 and RMSE for every group from accumulated sums (same values as compute_gof()).
+
+    Parameters:
+    - moments (pd.DataFrame): Output of accumulate_moments() / merge_moments()
+    - residuals (pd.DataFrame): Output of accumulate_residuals() for this model's coefficients
+    - model_name (str): Name of the polynomial model (see POLYNOMIAL_DEGREES)
+
+    Returns:
+    - pd.DataFrame: DataFrame with R^2 and RMSE for each model, subject, and condition
+    """
+    _, _, n_obs, fittable = _solve_moments(moments, POLYNOMIAL_DEGREES[model_name])
+    residuals = residuals.reindex(moments.index, fill_value=0.0)
+    ssr = np.where(fittable, residuals[f"ssr_{model_name}"].to_numpy(float), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_squared = 1 - ssr / residuals["ss_tot"].to_numpy(float)
+        rmse = np.sqrt(ssr / n_obs)
+
+    results = moments.index.to_frame(index=False)
+    results["model"] = model_name
+    results["R_squared"] = r_squared
+    results["RMSE"] = rmse
+    return results
+
+
+def mixed_from_moments(moments, model_name, x_scale):
+    """
+    Fits the hierarchical polynomial of mixed_effects.py to all subjects from accumulated moment sums.
+
+    Parameters:
+    - moments (pd.DataFrame): Output of accumulate_moments() / merge_moments()
+    - model_name (str): Name of the polynomial model (see POLYNOMIAL_DEGREES)
+    - x_scale (float): The x_scale used when accumulating
+
+    Returns:
+    - tuple: fitted_params, effects, variance (see fit_mixed_from_moments())
+    """
+    xtx, xty, n_obs = _normal_equations(moments, POLYNOMIAL_DEGREES[model_name])
+    group_moments = {
+        "keys": moments.index.to_frame(index=False), "xtx": xtx, "xty": xty,
+        "yty": moments["yy"].to_numpy(float), "n": n_obs,
+    }
+    return fit_mixed_from_moments(group_moments, model_name, x_scale)
+
+
+def run_chunked_pipeline(data_path, x_col, dep_vars, group_vars, model_names, subj_to_keep,
+                         chunksize=100_000, x_scale=None, mixed_effects=False):
+    """
+    Computes descriptives, polynomial fits and goodness of fit for several DVs in a few passes
+    over a CSV file, holding only one chunk of trials in memory at a time: the x column (for the
+    x range), then all columns (descriptives and moment sums, from which the fits are solved), then
+    the fitted DVs again (residual sums for the residual variance and goodness of fit).
+
+    Parameters:
+    - data_path (Path or str): Cleaned trial data (CSV)
+    - x_col (str): Column name for x values (independent variable)
+    - dep_vars (list): Dependent variables to analyze
+    - group_vars (list): Variables used for grouping the descriptive statistics
+    - model_names (list): Models to fit; only polynomial models (POLYNOMIAL_DEGREES) can be streamed
+    - subj_to_keep (list): Subject IDs included in the fits (descriptives use all subjects)
+    - chunksize (int): Number of CSV rows read at a time
+    - x_scale (float): Scale for x in the moment sums; defaults to max |x| over the file
+    - mixed_effects (bool): Also fit the hierarchical polynomial of every model (see mixed_effects.py)
+
+    Returns:
+    - dict: dep_var -> {"subj_stats", "grand_mean", "fitted_params" (list, one frame per model),
+      "gof" (pd.DataFrame), "x_range" ((min, max) of x over all trials),
+      "mixed" (list of fit_mixed_from_moments() outputs, one per model; empty unless mixed_effects)}
+    """
+    models = [name for name in model_names if name in POLYNOMIAL_DEGREES]
+    for name in model_names:
+        if name not in POLYNOMIAL_DEGREES:
+            print(f"***WARNING*** {name} is not a polynomial model and cannot be fitted in chunks. Skipping.")
+    max_degree = max((POLYNOMIAL_DEGREES[name] for name in models), default=1)
+
+    group_keys = group_vars + ["subj_idx"]
+    columns = list(dict.fromkeys(GROUP_COLS + group_keys + [x_col] + dep_vars))
+
+    # x range first, so that every chunk's moment sums use the same well-conditioned x scale
+    x_min, x_max = np.inf, -np.inf
+    for chunk in pd.read_csv(data_path, usecols=[x_col], chunksize=chunksize):
+        x_min = min(x_min, chunk[x_col].min())
+        x_max = max(x_max, chunk[x_col].max())
+    if x_scale is None:
+        x_scale = float(max(abs(x_min), abs(x_max))) if np.isfinite([x_min, x_max]).all() else 1.0
+        x_scale = x_scale or 1.0
+
+    descriptive_acc = None
+    moment_acc = {dep_var: None for dep_var in dep_vars}
+    for chunk in pd.read_csv(data_path, usecols=columns, chunksize=chunksize):
+        partial = accumulate(chunk, dep_vars, group_keys)
+        descriptive_acc = partial if descriptive_acc is None else merge_accumulators(descriptive_acc, partial)
+
+        if subj_to_keep is not None:
+            chunk = chunk[chunk["subj_idx"].isin(subj_to_keep)]
+        if chunk.empty:
+            continue
+
+        for dep_var in dep_vars:
+            moments = accumulate_moments(chunk, x_col, dep_var, max_degree, x_scale)
+            moment_acc[dep_var] = moments if moment_acc[dep_var] is None else merge_moments(moment_acc[dep_var], moments)
+
+    subj_stats_all, grand_mean_all = describe_from_accumulators(descriptive_acc, dep_vars, group_vars)
+
+    # Residual sums of the fitted coefficients
+    fitted = [dep_var for dep_var in dep_vars if moment_acc[dep_var] is not None and models]
+    coefs, group_means, residual_acc = {}, {}, {dep_var: None for dep_var in fitted}
+    for dep_var in fitted:
+        moments = moment_acc[dep_var]
+        coefs[dep_var] = {
+            name: pd.DataFrame(_solve_moments(moments, POLYNOMIAL_DEGREES[name])[0], index=moments.index)
+            for name in models
+        }
+        group_means[dep_var] = moments["xky_0"] / moments["xk_0"]
+    if fitted:
+        for chunk in pd.read_csv(data_path, usecols=list(dict.fromkeys(GROUP_COLS + [x_col] + fitted)),
+                                 chunksize=chunksize):
+            if subj_to_keep is not None:
+                chunk = chunk[chunk["subj_idx"].isin(subj_to_keep)]
+            if chunk.empty:
+                continue
+            for dep_var in fitted:
+                residuals = accumulate_residuals(chunk, x_col, dep_var, coefs[dep_var], group_means[dep_var], x_scale)
+                residual_acc[dep_var] = residuals if residual_acc[dep_var] is None \
+                    else merge_moments(residual_acc[dep_var], residuals)
+
+    results = {}
+    for dep_var in dep_vars:
+        moments = moment_acc[dep_var]
+        residuals = residual_acc.get(dep_var)
+        fitted_params = [fit_from_moments(moments, residuals, name, x_scale) for name in models] \
+            if residuals is not None else []
+        gof = [gof_from_moments(moments, residuals, name) for name in models] if residuals is not None else []
+        mixed = [mixed_from_moments(moments, name, x_scale) for name in models] \
+            if mixed_effects and moments is not None else []
+        results[dep_var] = {
+            "subj_stats": subj_stats_all[group_keys + [f"{dep_var}_{stat}" for stat in ("count", "mean", "std")]],
+            "grand_mean": grand_mean_all[group_vars + [f"{dep_var}_mean", f"{dep_var}_std"]],
+            "fitted_params": fitted_params,
+            "gof": pd.concat(gof, ignore_index=True) if gof else pd.DataFrame(),
+            "x_range": (x_min, x_max),
+            "mixed": mixed,
+        }
+    print(f"✅ Chunked pass over {data_path}: {', '.join(dep_vars)}")
+    return results
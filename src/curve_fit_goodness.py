@@ -1,90 +1,90 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 from curve_functions import MODEL_FUNCTIONS  # Import models
+from batched_fitting import pad_groups
+from param_store import GROUP_COLS, model_function, param_matrix
+from output_writer import save_figure
+from summary_plots import box_stats, plot_box_grid
 
 def compute_gof(data, x_col, y_col, model_name, func, fitted_params):
     """
     Computes goodness of fit (GOF) statistics R^2 and RMSE for each fitted model.
+    All groups are evaluated at once on padded (groups x trials) arrays.
 
     Parameters:
     - data (Path, str, or pd.DataFrame): Data with original x and y values.
     - x_col (str): Column name for x values (independent variable)
     - y_col (str): Column name for y values (dependent variable)
     - model_name (str): Name of the model being evaluated
-    - func (callable): The function used for fitting
-    - fitted_params (pd.DataFrame): Fitted parameters DataFrame
+    - func (callable): The function used for fitting (splines are evaluated over the knot range stored with their fits)
+    - fitted_params (dict or pd.DataFrame): Parameter store (see param_store.py) or fitted parameters DataFrame
 
     Returns:
     - pd.DataFrame: DataFrame with R^2 and RMSE for each model, subject, and condition
     """
-    results = []
-
-    for _, row in fitted_params.iterrows():
-        subj, g_level, posture, model = row["subj_idx"], row["g_level_corrected"], row["bed_chair"], row["model"]
-        params = row.iloc[4:].values # Extract model parameters; make this adaptive in case of custom functions
-
-        # Get subject-specific  data
-        subj_df = data[(data["subj_idx"] == subj) & 
-                    (data["g_level_corrected"] == g_level) & 
-                    (data["bed_chair"] == posture)]
-        x_data = subj_df[x_col].values
-        y_true = subj_df[y_col].values
-        y_pred = func(x_data, *params[:func.__code__.co_argcount - 1])
-
+    if isinstance(data, (str, Path)):
+        data = pd.read_csv(data)
+
+    # Fits of this model only, with exactly its parameters
+    fit_keys, params = param_matrix(fitted_params, model_name)
+    func = model_function(fitted_params, model_name, func)
+
+    # Match every fit to its trials
+    keys, x, y, mask, _ = pad_groups(data, x_col, y_col)
+    as_str = {"subj_idx": str, "bed_chair": str}
+    matched = fit_keys[GROUP_COLS].astype(as_str).merge(
+        keys.astype(as_str).reset_index(names="data_row"), on=GROUP_COLS, how="left"
+    )["data_row"].to_numpy()
+    has_data = ~np.isnan(matched)
+    rows = np.where(has_data, matched, 0).astype(int)
+    x, y, mask = x[rows], y[rows], mask[rows] & has_data[:, None]
+
+    y_pred = func(x, *params.T[:, :, None])
+    n = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y_mean = np.sum(y * mask, axis=1) / n
         # Compute R^2
-        ss_res = np.sum((y_true - y_pred) ** 2)
-        ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
+        ss_res = np.sum(mask * (y - y_pred) ** 2, axis=1)
+        ss_tot = np.sum(mask * (y - y_mean[:, None]) ** 2, axis=1)
         r_squared = 1 - (ss_res / ss_tot)
-
         # Compute RMSE
-        rmse = np.sqrt(np.mean((y_true - y_pred) ** 2))
-
-        results.append([subj, g_level, posture, model, r_squared, rmse])
+        rmse = np.sqrt(ss_res / n)
 
-    return pd.DataFrame(results, columns=["subj_idx", "g_level_corrected", "bed_chair", "model", "R_squared", "RMSE"])
+    results = fit_keys.copy()
+    results["R_squared"] = r_squared
+    results["RMSE"] = rmse
+    return results
 
-def plot_goodness_of_fit(df, dep_var, output_dir):
+def plot_goodness_of_fit(df, dep_var, output_dir, writer=None):
     """
     Generates comparison plots for goodness-of-fit statistics, considering different conditions.
+    Boxplots are drawn from boxplot statistics aggregated once per model and condition.
 
     Parameters:
     - df (pd.DataFrame): Data containing R^2 and RMSE values for all models.
     - dep_var (str): Name of dependent variable
     - output_dir (Path): Directory to save plots.
+    - writer (OutputWriter): Background writer for the figures (see output_writer.py); None writes them directly
     """
 
     output_dir.mkdir(exist_ok=True)  # Ensure output directory exists
 
+    group_cols = ["bed_chair", "model", "g_level_corrected"]
+
     # Boxplot for R^2 across models, grouped by gravity level and posture
-    plt.figure(figsize=(12, 6))
-    sns.catplot(
-        data=df, x="model", y="R_squared", hue="g_level_corrected", col="bed_chair",
-        kind="box", palette="viridis", height=6, aspect=1.2
-    )
-    plt.xlabel("Model")
-    plt.ylabel("R^2")
-    plt.suptitle("Comparison of R^2 Across Models, Grouped by Condition")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(output_dir / f"r_squared_comparison_by_condition_{dep_var}.png")
-    plt.close()
+    r_squared_stats = box_stats(df, "R_squared", group_cols)
+    fig = plot_box_grid(r_squared_stats, x_col="model", hue_col="g_level_corrected", panel_col="bed_chair",
+                        ylabel="R^2", title="Comparison of R^2 Across Models, Grouped by Condition",
+                        cmap="viridis", xlabel="Model")
+    save_figure(fig, output_dir / f"r_squared_comparison_by_condition_{dep_var}.png", writer)
 
     # Boxplot for RMSE across models, grouped by gravity level and posture
-    plt.figure(figsize=(12, 6))
-    sns.catplot(
-        data=df, x="model", y="RMSE", hue="g_level_corrected", col="bed_chair",
-        kind="box", palette="magma", height=6, aspect=1.2
-    )
-    plt.xlabel("Model")
-    plt.ylabel("RMSE")
-    plt.suptitle("Comparison of RMSE Across Models, Grouped by Condition")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(output_dir / f"rmse_comparison_by_condition_{dep_var}.png")
-    plt.close()
+    rmse_stats = box_stats(df, "RMSE", group_cols)
+    fig = plot_box_grid(rmse_stats, x_col="model", hue_col="g_level_corrected", panel_col="bed_chair",
+                        ylabel="RMSE", title="Comparison of RMSE Across Models, Grouped by Condition",
+                        cmap="magma", xlabel="Model")
+    save_figure(fig, output_dir / f"rmse_comparison_by_condition_{dep_var}.png", writer)
 
     print("Model comparison plots saved to:", {output_dir})
 
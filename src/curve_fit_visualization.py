@@ -1,50 +1,76 @@
+import io
 import os
 from pathlib import Path
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
 from curve_functions import MODEL_FUNCTIONS  # Import models
+from curve_store import build_curve_store, curve_rows
+from param_store import load_param_store, model_names
+from output_writer import save_buffer, save_figure
 
-def plot_curve_fits(raw_df, res_df, x_var, dep_var, output_dir, plot_curves=False):
+# Panel layout of the per-subject figures: (g_level_corrected, bed_chair), row by row
+PANELS = [(0.0, 'V'), (0.0, 'R'), (1.0, 'V'), (1.0, 'R'), (1.8, 'V'), (1.8, 'R')]
+COL_TITLES = ['Bed', 'Chair']
+ROW_TITLES = ['0G', '1G', '1.8G']
+
+def plot_curve_fits(raw_df, res_df, x_var, dep_var, output_dir, plot_curves=False, band_level=0.95,
+                    curve_store=None, writer=None, multipage=False):
     """
     Generate 6-panel plots of fitted curves over raw data points for each subject and model.
+    Curves are read from a precomputed curve store (see curve_store.py); confidence and
+    prediction bands are drawn when the store holds them.
 
     Parameters:
     - raw_df: Trial-level data for all subjects, all conditions, used for fit_curve()
-    - res_df: DataFrame with fitted model paramters (output from fit_curve())
+    - res_df: Parameter store (see param_store.py) or DataFrame with fitted model paramters (output from fit_curve())
     - x_var: Independent variable name
     - dep_var: Dependent variable name
     - output_dir: Directory where figures will be saved
     - plot_curves: Boolean flag to enable plotting
+    - band_level: Coverage of the confidence/prediction bands (only used if curve_store is None)
+    - curve_store: Output of build_curve_store() / load_curve_store(); built from res_df if None
+    - writer: OutputWriter (see output_writer.py) for writing figures in the background; None writes them directly
+    - multipage: If True, write one multi-page PDF per model (one page per subject) instead of one PDF per
+      subject and model, reusing a single figure and only updating its data between pages
     """
     if not plot_curves:
         return
     
-    subjects = res_df['subj_idx'].unique()
+    fits = res_df["params"] if isinstance(res_df, dict) else res_df
+    subjects = fits['subj_idx'].astype(str).unique()
+    fitted_models = [name.lower() for name in model_names(res_df)]
+
+    # Every fitted curve and its bands, evaluated once on a shared x grid
+    if curve_store is None:
+        x_grid = np.linspace(raw_df[x_var].min(), raw_df[x_var].max(), 500)
+        curve_store = build_curve_store(res_df, x_grid, level=band_level)
+    x_grid = curve_store["x_grid"]
+    rows = curve_rows(curve_store)
+    level = curve_store["level"]
+
+    # Models in the order of MODEL_FUNCTIONS, then other fitted models in the store (e.g. mixed-effects fits)
+    plot_models = [name for name in MODEL_FUNCTIONS if name.lower() in fitted_models]
+    plot_models += [name for name in dict.fromkeys(model for *_, model in rows)
+                    if name not in MODEL_FUNCTIONS and name.lower() in fitted_models]
+
+    if multipage:
+        for model_name in plot_models:
+            _plot_curve_fits_multipage(raw_df, subjects, model_name, curve_store, rows, x_var, dep_var,
+                                       output_dir, writer)
+        return
 
-    # Identify parameter columns dynamically
-    param_columns = [col for col in res_df.columns if col.startswith("param_")]
-    if not param_columns:
-        raise KeyError("Could not find any parameter columns (e.g., 'param_0', 'param_1') in res_df")
-    
     for subj_idx in subjects:
-        for model_name, model_func in MODEL_FUNCTIONS.items():
-
-            if not res_df['model'].str.lower().str.contains(model_name.lower()).any():
-                continue
-
-            subj_data = res_df[(res_df['subj_idx'] == subj_idx) & (res_df['model'].str.lower() == model_name.lower())]
+        for model_name in plot_models:
 
             fig, axes = plt.subplots(nrows=3, ncols=2, figsize=(12, 12), sharey=True)
             axes = axes.flatten()
 
-            col_titles = ['Bed', 'Chair']
-            row_titles = ['0G', '1G', '1.8G']
+            col_titles = COL_TITLES
+            row_titles = ROW_TITLES
 
-            for i, (g_level_corrected, bed_chair) in enumerate(
-                [(0.0, 'V'), (0.0, 'R'),
-                (1.0, 'V'), (1.0, 'R'),
-                (1.8, 'V'), (1.8, 'R')]):
+            for i, (g_level_corrected, bed_chair) in enumerate(PANELS):
                 ax = axes[i]
                 group_data = raw_df[(raw_df['g_level_corrected'] == g_level_corrected) &
                                     (raw_df['bed_chair'] == bed_chair) &
@@ -57,15 +83,18 @@ def plot_curve_fits(raw_df, res_df, x_var, dep_var, output_dir, plot_curves=Fals
                 x = group_data[x_var]
                 y = group_data[dep_var]
 
-                curve_data = subj_data[(subj_data['g_level_corrected'] == g_level_corrected) &
-                                        (subj_data['bed_chair'] == bed_chair)]
-                
-                if not curve_data.empty:
-                    params = curve_data[param_columns].dropna(axis=1).values.flatten()
+                row = rows.get((str(subj_idx), float(g_level_corrected), str(bed_chair), model_name))
+                if row is not None:
+                    # Precomputed curve and bands, restricted to this panel's x range
+                    in_range = (x_grid >= x.min()) & (x_grid <= x.max())
+                    x_smooth = x_grid[in_range]
 
+                    ax.fill_between(x_smooth, curve_store["pi_lower"][row, in_range], curve_store["pi_upper"][row, in_range],
+                                    color='C1', alpha=0.15, linewidth=0, label=f'{level:.0%} Prediction Band')
+                    ax.fill_between(x_smooth, curve_store["ci_lower"][row, in_range], curve_store["ci_upper"][row, in_range],
+                                    color='C1', alpha=0.35, linewidth=0, label=f'{level:.0%} Confidence Band')
                     ax.scatter(x, y, label='Data', alpha=0.7)
-                    x_smooth = np.linspace(x.min(), x.max(), 500)
-                    ax.plot(x_smooth, model_func(x_smooth, *params), label=f'{model_name.capitalize()} Fit')
+                    ax.plot(x_smooth, curve_store["fit"][row, in_range], color='C1', label=f'{model_name.capitalize()} Fit')
                     ax.legend()
                 
                 if i % 2 == 1:
@@ -84,8 +113,115 @@ def plot_curve_fits(raw_df, res_df, x_var, dep_var, output_dir, plot_curves=Fals
             plt.subplots_adjust(top=0.9)
             plot_dir = output_dir / "curve_fit_plots"
             plot_dir.mkdir(parents=True, exist_ok=True)
-            plt.savefig(os.path.join(plot_dir, filename))
-            plt.close(fig)
+            save_figure(fig, os.path.join(plot_dir, filename), writer)
+
+
+def _set_band(band, x, lower, upper):
+    """Replaces the polygon of a fill_between() band (points with a missing bound are dropped)."""
+    keep = np.isfinite(lower) & np.isfinite(upper)
+    x, lower, upper = x[keep], lower[keep], upper[keep]
+    band.set_verts([np.column_stack([np.concatenate([x, x[::-1]]), np.concatenate([lower, upper[::-1]])])])
+
+
+def _curve_fit_template(dep_var, model_name, level):
+    """
+    Builds the 6-panel figure once, with empty artists that are filled in for each subject.
+
+    Returns:
+    - fig, suptitle (matplotlib Text), and a list with one dict of artists per panel
+    """
+    fig, axes = plt.subplots(nrows=3, ncols=2, figsize=(12, 12), sharey=True)
+    panels = []
+    for i, ax in enumerate(axes.flatten()):
+        artists = {
+            "pi": ax.fill_between([0, 0], [0, 0], [0, 0], color='C1', alpha=0.15, linewidth=0,
+                                  label=f'{level:.0%} Prediction Band'),
+            "ci": ax.fill_between([0, 0], [0, 0], [0, 0], color='C1', alpha=0.35, linewidth=0,
+                                  label=f'{level:.0%} Confidence Band'),
+            "data": ax.scatter([], [], label='Data', alpha=0.7),
+            "fit": ax.plot([], [], color='C1', label=f'{model_name.capitalize()} Fit')[0],
+        }
+        artists["legend"] = ax.legend()
+        artists["ax"] = ax
+        panels.append(artists)
+
+        if i % 2 == 1:
+            ax_right = ax.twinx()
+            ax_right.set_ylabel(f"{ROW_TITLES[i // 2]}", rotation=270, labelpad=20, fontsize=14, fontweight='bold')
+            ax_right.set_yticks([])
+        ax.set_xlabel('Tilt Amplitude (deg)')
+        ax.set_ylabel(f"{dep_var} (deg)")
+
+    fig.tight_layout()
+    suptitle = fig.suptitle(f"{dep_var}\n{model_name.capitalize()} Fits", fontsize=16, fontweight='bold')
+    fig.subplots_adjust(top=0.9)
+    return fig, suptitle, panels
+
+
+def _plot_curve_fits_multipage(raw_df, subjects, model_name, curve_store, rows, x_var, dep_var, output_dir,
+                               writer=None):
+    """
+    Writes the curve-fit figures of all subjects for one model as pages of a single PDF.
+    """
+    x_grid = curve_store["x_grid"]
+
+    # Row positions of every subject/condition, found in one grouping pass
+    group_rows = {
+        (str(subj), float(g_level), str(bed_chair)): idx
+        for (subj, g_level, bed_chair), idx in raw_df.groupby(
+            ['subj_idx', 'g_level_corrected', 'bed_chair'], observed=True).indices.items()
+    }
+    x_all = raw_df[x_var].to_numpy(float)
+    y_all = raw_df[dep_var].to_numpy(float)
+
+    fig, suptitle, panels = _curve_fit_template(dep_var, model_name, curve_store["level"])
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for subj_idx in subjects:
+            suptitle.set_text(f"{dep_var} - Subject {subj_idx}\n{model_name.capitalize()} Fits")
+            y_limits = []
+            for i, ((g_level_corrected, bed_chair), artists) in enumerate(zip(PANELS, panels)):
+                ax = artists["ax"]
+                idx = group_rows.get((str(subj_idx), g_level_corrected, bed_chair))
+                row = rows.get((str(subj_idx), g_level_corrected, bed_chair, model_name))
+                has_fit = idx is not None and row is not None
+                for name in ["pi", "ci", "data", "fit", "legend"]:
+                    artists[name].set_visible(has_fit)
+
+                if idx is None:
+                    ax.set_title(f"No Data ({g_level_corrected}G, {bed_chair})")
+                else:
+                    ax.set_title(COL_TITLES[i % 2] if i < 2 else "", fontsize=14, fontweight='bold')
+                if not has_fit:
+                    continue
+
+                # Precomputed curve and bands, restricted to this panel's x range
+                x, y = x_all[idx], y_all[idx]
+                in_range = (x_grid >= np.nanmin(x)) & (x_grid <= np.nanmax(x))
+                x_smooth = x_grid[in_range]
+                pi_lower, pi_upper = curve_store["pi_lower"][row, in_range], curve_store["pi_upper"][row, in_range]
+                _set_band(artists["pi"], x_smooth, pi_lower, pi_upper)
+                _set_band(artists["ci"], x_smooth, curve_store["ci_lower"][row, in_range],
+                          curve_store["ci_upper"][row, in_range])
+                artists["data"].set_offsets(np.column_stack([x, y]))
+                artists["fit"].set_data(x_smooth, curve_store["fit"][row, in_range])
+
+                x_pad = 0.05 * (np.nanmax(x) - np.nanmin(x)) or 1.0
+                ax.set_xlim(np.nanmin(x) - x_pad, np.nanmax(x) + x_pad)
+                y_limits.append(np.nanmin([np.nanmin(y), np.nanmin(pi_lower, initial=np.inf)]))
+                y_limits.append(np.nanmax([np.nanmax(y), np.nanmax(pi_upper, initial=-np.inf)]))
+
+            # The panels share their y axis
+            if y_limits:
+                y_min, y_max = min(y_limits), max(y_limits)
+                y_pad = 0.05 * (y_max - y_min) or 1.0
+                panels[0]["ax"].set_ylim(y_min - y_pad, y_max + y_pad)
+            pdf.savefig(fig)
+    plt.close(fig)
+
+    plot_dir = output_dir / "curve_fit_plots"
+    plot_dir.mkdir(parents=True, exist_ok=True)
+    save_buffer(buffer, plot_dir / f"{dep_var}_{model_name}_fits_all_subjects.pdf", writer)
 
 if __name__ == "__main__":
 
@@ -95,7 +231,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--plot-curves", action="store_true", help="Enable curve fitting visualization")
     parser.add_argument("--data-file", type=str, required=True, help="Path to the raw data file")
-    parser.add_argument("--results-file", type=str, required=True, help="Path to the curve fitting results file")
+    parser.add_argument("--results-file", type=str, required=True,
+                        help="Path to the curve fitting results file (fitted_parameters_<DV>.csv)")
+    parser.add_argument("--cov-file", type=str, default=None,
+                        help="Path to the parameter covariance file (parameter_covariance_<DV>.csv), for the bands")
     parser.add_argument("--x-var", type=str, required=True, help="Independent variable name")
     parser.add_argument("--dep-var", type=str, required=True, help="Dependent variable name")
     parser.add_argument("--output-dir", type=str, required=True, help="Directory where figures will be saved")
@@ -108,6 +247,9 @@ if __name__ == "__main__":
     # Load data files
     df = pd.read_csv(args.data_file)
     res_df = pd.read_csv(args.results_file)
+    if "param_idx" in res_df.columns:
+        # Long-format parameter store written by run_analysis.py
+        res_df = load_param_store(res_df, args.cov_file)
     
 
-    plot_curve_fits(df, res_df, args.x_var, args.dep_var, args.output_dir, plot_curves=args.plot_curves)
\ No newline at end of file
+    plot_curve_fits(df, res_df, args.x_var, args.dep_var, output_dir, plot_curves=args.plot_curves)
\ No newline at end of file
@@ -1,7 +1,50 @@
+import numpy as np
 import pandas as pd
 from scipy.optimize import curve_fit
 from pathlib import Path
-from curve_functions import MODEL_FUNCTIONS  # Import all polynomial functions
+from curve_functions import MODEL_FUNCTIONS, model_n_params  # Import all polynomial functions
+
+
+def uncertainty_columns(cov, n_obs, resid_var):
+    """
+    Flattens parameter covariance matrices into the columns stored next to the fitted parameters.
+
+    Parameters:
+    - cov (np.ndarray): Covariance matrices, shape (n_groups, n_params, n_params)
+    - n_obs (np.ndarray): Number of trials used in each fit
+    - resid_var (np.ndarray): Residual variance of each fit (SSR / (n_obs - n_params))
+
+    Returns:
+    - dict: Column name -> values; se_{i} (standard errors), cov_{i}_{j} (i < j), n_obs, resid_var
+    """
+    n_params = cov.shape[-1]
+    columns = {f"se_{i}": np.sqrt(cov[:, i, i]) for i in range(n_params)}
+    for i in range(n_params):
+        for j in range(i + 1, n_params):
+            columns[f"cov_{i}_{j}"] = cov[:, i, j]
+    columns["n_obs"] = n_obs
+    columns["resid_var"] = resid_var
+    return columns
+
+
+def fit_covariance(fitted_params, n_params):
+    """
+    Rebuilds the parameter covariance matrices from the columns written by uncertainty_columns().
+
+    Parameters:
+    - fitted_params (pd.DataFrame): Fitted parameters of a single model
+    - n_params (int): Number of parameters in that model
+
+    Returns:
+    - np.ndarray: Covariance matrices, shape (n_groups, n_params, n_params)
+    """
+    se = fitted_params[[f"se_{i}" for i in range(n_params)]].to_numpy(float)
+    cov = np.zeros((len(fitted_params), n_params, n_params))
+    cov[:, np.arange(n_params), np.arange(n_params)] = se**2
+    for i in range(n_params):
+        for j in range(i + 1, n_params):
+            cov[:, i, j] = cov[:, j, i] = fitted_params[f"cov_{i}_{j}"].to_numpy(float)
+    return cov
 
 
 def fit_curve(data, subj_to_keep, x_col, y_col, model_name, func):
@@ -14,16 +57,22 @@ def fit_curve(data, subj_to_keep, x_col, y_col, model_name, func):
     - x_col (str): Column name for x values (independent variable)
     - y_col (str): Column name for y values (dependent variable)
     - model_name (str): Name of the model (function) to fit
-    - func (callable): The formula of the function
+    - func (callable): The formula of the function, or a compiled kernel (see model_kernels.py),
+      whose analytic Jacobian is then passed to curve_fit
 
     Returns:
-    - pd.DataFrame: Dataframe with fitted parameters.
+    - pd.DataFrame: Dataframe with fitted parameters, their standard errors (se_*),
+      covariances (cov_*_*), number of trials (n_obs) and residual variance (resid_var).
     """
     fitted_params = []
+    covariances = []
+    n_obs = []
+    resid_var = []
+    n_params = model_n_params(func)
 
     # Load relevant pd.DataFrame or CSV file
     if isinstance(data, pd.DataFrame):
-        df = data.copy()
+        df = data  # not modified below; filtering creates a new frame
     elif isinstance(data, (str, Path)):
         df = pd.read_csv(data)
     else:
@@ -43,28 +92,40 @@ def fit_curve(data, subj_to_keep, x_col, y_col, model_name, func):
 
     # Group by subject, posture condition, and g-level
     for (subj, g_level, posture), group in df.groupby(
-        ["subj_idx", "g_level_corrected", "bed_chair"]
+        ["subj_idx", "g_level_corrected", "bed_chair"], observed=True
     ):
-        x_data = group[x_col].values
-        y_data = group[y_col].values
+        x_data = group[x_col].to_numpy(float)
+        y_data = group[y_col].to_numpy(float)
 
         try:
-            params, _ = curve_fit(func, x_data, y_data)
+            params, pcov = curve_fit(func, x_data, y_data, jac=getattr(func, "jac", None))
+            dof = len(y_data) - n_params
+            ssr = np.sum((y_data - func(x_data, *params)) ** 2)
+            sigma2 = ssr / dof if dof > 0 else np.nan
         except RuntimeError:
             print(
                 f"Curve fitting failed for subject {subj}, g-level {g_level}, posture condition {posture}"
             )
-            params = []
+            params = np.full(n_params, np.nan)
+            pcov = np.full((n_params, n_params), np.nan)
+            sigma2 = np.nan
 
         fitted_params.append(
             [subj, g_level, posture, model_name] + list(params)
         )  # add column with function name, and make sure GOF stats are here
+        covariances.append(pcov)
+        n_obs.append(len(y_data))
+        resid_var.append(sigma2)
 
     # Convert to DataFrame
     param_columns = ["subj_idx", "g_level_corrected", "bed_chair", "model"] + [
-        f"param_{i}" for i in range(len(params))
+        f"param_{i}" for i in range(n_params)
     ]
-    return pd.DataFrame(fitted_params, columns=param_columns)
+    fitted_params = pd.DataFrame(fitted_params, columns=param_columns)
+    if covariances:
+        uncertainty = uncertainty_columns(np.stack(covariances), np.array(n_obs), np.array(resid_var))
+        fitted_params = fitted_params.assign(**uncertainty)
+    return fitted_params
 
 
 if __name__ == "__main__":
@@ -1,3 +1,5 @@
+import numpy as np
+
 # Define list of curve functions
 
 # Linear:
@@ -20,6 +22,54 @@ def quartic(x, a, b, c, d, e):
     """Quartic function: y = a + bx + cx^2 + dx^3 + ex^4"""
     return a + b * x + c * x**2 + d * x**3 + e * x**4
 
+# Penalized B-spline (P-spline):
+def pspline_model(x_min, x_max, n_segments=6):
+    """
+    Builds a cubic B-spline model with equally spaced knots: y = sum_k c_k * B_k(x).
+    The parameters are the coefficients of the n_segments + 3 basis functions (roughly,
+    the curve's height near each knot). Splines are fitted by pspline.py with a smoothness
+    penalty, for all groups at once, rather than by curve_fit.
+
+    Parameters:
+    - x_min, x_max (float): Range covered by the knots (beyond it, the end segments are extended)
+    - n_segments (int): Number of intervals between knots
+
+    Returns:
+    - callable: pspline(x, c_0, ..., c_{n_segments+2}), broadcasting over x and the coefficients,
+      with attributes basis(x) (shape x.shape + (n_params,)), jac, n_params, n_segments and knot_range
+    """
+    x_min, x_max = float(x_min), float(x_max)  # also for compact integer dtypes
+    n_params = n_segments + 3
+    step = (x_max - x_min) / n_segments
+
+    def basis(x):
+        t = (np.asarray(x, dtype=float) - x_min) / step
+        segment = np.clip(np.floor(t), 0, n_segments - 1).astype(int)
+        u = (t - segment)[..., None]
+        # The four cubic B-splines that are nonzero on a segment, as functions of the position u in it
+        local = np.concatenate([(1 - u) ** 3, 3 * u**3 - 6 * u**2 + 4, -3 * u**3 + 3 * u**2 + 3 * u + 1, u**3],
+                               axis=-1) / 6
+        out = np.zeros(t.shape + (n_params,))
+        np.put_along_axis(out, segment[..., None] + np.arange(4), local, axis=-1)
+        return out
+
+    def pspline(x, *coefs):
+        """Penalized cubic B-spline: y = sum_k c_k * B_k(x)"""
+        B = basis(x)
+        return sum(B[..., k] * c for k, c in enumerate(coefs))
+
+    def jac(x, *coefs):
+        B = basis(x)
+        shape = np.broadcast_shapes(B.shape[:-1], *[np.shape(c) for c in coefs])
+        return np.broadcast_to(B, shape + (n_params,))
+
+    pspline.basis = basis
+    pspline.jac = jac
+    pspline.n_params = n_params
+    pspline.n_segments = n_segments
+    pspline.knot_range = (x_min, x_max)
+    return pspline
+
 # Placeholder for custom user-defined functions:
 # def custom_fxn(x, a): # Add additional parameters (b, c, d, etc.) for however many terms used in your function.
 #    """
@@ -35,5 +85,24 @@ MODEL_FUNCTIONS = {
     "quadratic": quadratic,
     "cubic": cubic,
     "quartic": quartic,
+    "pspline": pspline_model(-90.0, 90.0),  # knots over the turn amplitudes; fits store their own knot range
     #"custom": custom_fxn,
-}
\ No newline at end of file
+}
+
+def model_n_params(func):
+    """Number of parameters of a model function (or of a compiled kernel, see model_kernels.py)."""
+    return getattr(func, "n_params", None) or func.__code__.co_argcount - 1
+
+# Polynomial degree of each built-in model. Models listed here are linear in
+# their parameters and can be fitted with the batched solvers in
+# `batched_fitting.py` (e.g. robust IRLS) instead of `curve_fit`.
+POLYNOMIAL_DEGREES = {
+    "linear": 1,
+    "quadratic": 2,
+    "cubic": 3,
+    "quartic": 4,
+}
+
+# Spline models, built by pspline_model(). They are linear in their coefficients too,
+# and are fitted with the penalized batched solver in `pspline.py`.
+SPLINE_MODELS = ["pspline"]
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from curve_functions import MODEL_FUNCTIONS, model_n_params
+from batched_fitting import compute_prediction_bands
+from param_store import GROUP_COLS, model_function, model_names, model_params
+
+# Arrays of shape (n_curves, n_points) kept in the store
+CURVE_ARRAYS = ["fit", "ci_lower", "ci_upper", "pi_lower", "pi_upper"]
+
+
+def build_curve_store(fitted_params, x_grid, level=0.95, model_functions=None):
+    """
+    Evaluates every fitted curve (all groups, all models) and its bands on a shared x grid.
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Parameter store (see param_store.py) or wide output
+      of fit_curve() / fit_curve_robust(), one or more models
+    - x_grid (np.ndarray): Shared x values
+    - level (float): Coverage of the confidence/prediction bands
+    - model_functions (dict): Model name -> function or compiled kernel; defaults to MODEL_FUNCTIONS
+
+    Returns:
+    - dict: "keys" (pd.DataFrame with group columns and model, one row per curve),
+      "x_grid", "level" and float32 arrays of shape (n_curves, n_points) named in CURVE_ARRAYS.
+      Bands are NaN when fitted_params holds no parameter uncertainty (se_* columns).
+    """
+    model_functions = MODEL_FUNCTIONS if model_functions is None else model_functions
+    x_grid = np.asarray(x_grid, dtype=float)
+    keys, arrays = [], {name: [] for name in CURVE_ARRAYS}
+
+    for model_name in model_names(fitted_params):
+        if model_name not in model_functions:
+            print(f"***WARNING*** {model_name} not found in src/curve_functions.py. Skipping.")
+            continue
+
+        func = model_function(fitted_params, model_name, model_functions[model_name])
+        fits = model_params(fitted_params, model_name)
+        if "se_0" in fits.columns and fits["se_0"].notna().any():
+            bands = compute_prediction_bands(fitted_params, model_name, x_grid, level=level, func=func)
+        else:
+            # No uncertainty available: evaluate the curves only
+            n_params = model_n_params(func)
+            params = fits[[f"param_{i}" for i in range(n_params)]].to_numpy(float)
+            fit = func(x_grid[None, :], *params.T[:, :, None]) * np.ones((len(params), 1))
+            bands = {"keys": fits[GROUP_COLS], "fit": fit}
+            bands.update({name: np.full_like(fit, np.nan) for name in CURVE_ARRAYS[1:]})
+
+        keys.append(bands["keys"].assign(model=model_name))
+        for name in CURVE_ARRAYS:
+            arrays[name].append(bands[name].astype(np.float32))
+
+    store = {
+        "keys": pd.concat(keys, ignore_index=True) if keys else pd.DataFrame(columns=GROUP_COLS + ["model"]),
+        "x_grid": x_grid,
+        "level": level,
+    }
+    for name in CURVE_ARRAYS:
+        store[name] = np.concatenate(arrays[name]) if arrays[name] else np.empty((0, len(x_grid)), np.float32)
+    return store
+
+
+def save_curve_store(store, path):
+    """
+    Saves a curve store as a compressed NumPy archive (.npz), readable without this package.
+
+    Parameters:
+    - store (dict): Output of build_curve_store()
+    - path (Path, str or file object): Output file
+    """
+    keys = store["keys"]
+    np.savez_compressed(
+        path,
+        x_grid=store["x_grid"],
+        level=np.array(store["level"]),
+        subj_idx=keys["subj_idx"].astype(str).to_numpy(dtype="U"),
+        g_level_corrected=keys["g_level_corrected"].to_numpy(dtype=float),
+        bed_chair=keys["bed_chair"].astype(str).to_numpy(dtype="U"),
+        model=keys["model"].astype(str).to_numpy(dtype="U"),
+        **{name: store[name] for name in CURVE_ARRAYS},
+    )
+
+
+def load_curve_store(path):
+    """
+    Loads a curve store saved by save_curve_store().
+
+    Parameters:
+    - path (Path or str): .npz file
+
+    Returns:
+    - dict: Same layout as build_curve_store()
+    """
+    with np.load(path) as npz:
+        store = {
+            "keys": pd.DataFrame({col: npz[col] for col in GROUP_COLS + ["model"]}),
+            "x_grid": npz["x_grid"],
+            "level": float(npz["level"]),
+        }
+        for name in CURVE_ARRAYS:
+            store[name] = npz[name]
+    return store
+
+
+def curve_rows(store):
+    """
+    Maps (subj_idx, g_level_corrected, bed_chair, model) to the row of each curve in the store.
+
+    Parameters:
+    - store (dict): Output of build_curve_store() or load_curve_store()
+
+    Returns:
+    - dict: Group key tuple -> row index
+    """
+    return {
+        (str(subj), float(g_level), str(posture), str(model)): i
+        for i, (subj, g_level, posture, model) in enumerate(store["keys"].itertuples(index=False, name=None))
+    }
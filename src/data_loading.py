@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from param_store import GROUP_COLS
+
+# Declared dtypes of the cleaned trial files (`*_trials_cleaned_allsubj.csv`).
+# Grouping keys are categorical; g_level_corrected keeps its float values as categories
+# so comparisons such as `== 1.8` still work. Columns not listed here are numeric and
+# are loaded as float64; whole-number grouping columns are downcast by downcast_numeric().
+TRIAL_SCHEMA = {
+    "subj_idx": "category",
+    "bed_chair": "category",
+    "g_level_corrected": "category",
+    "flight": "category",
+    "source_folder": "category",
+    "use_for_2025": "category",
+}
+
+
+def downcast_numeric(df, exclude=()):
+    """
+    Downcasts numeric columns in place without losing information: columns holding only whole
+    numbers (and no missing values), such as trial counters and integer codes, become the smallest
+    integer type. Other float columns are left as float64.
+
+    Parameters:
+    - df (pd.DataFrame): Trial-level data
+    - exclude (iterable): Columns to leave untouched
+
+    Returns:
+    - pd.DataFrame: The same DataFrame
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if (col in exclude or isinstance(dtype, pd.CategoricalDtype)
+                or not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)):
+            continue
+        values = df[col].to_numpy()
+        if pd.api.types.is_integer_dtype(values) or (
+            not np.isnan(values).any() and np.array_equal(values, np.round(values))
+        ):
+            df[col] = pd.to_numeric(df[col].astype(np.int64), downcast="integer")
+    return df
+
+
+def load_trials(data_path, x_var, dep_vars, group_vars=(), schema=TRIAL_SCHEMA):
+    """
+    Loads only the columns needed for an analysis from a cleaned trial file, with compact dtypes.
+
+    Parameters:
+    - data_path (Path or str): Cleaned CSV file
+    - x_var (str): Independent variable (curve fitting x values)
+    - dep_vars (list): Dependent variables to load
+    - group_vars (list): Extra grouping variables (subj_idx, g_level_corrected and bed_chair are always loaded)
+    - schema (dict): Column -> dtype for non-numeric / grouping columns
+
+    Returns:
+    - pd.DataFrame: Trial-level data with categorical grouping keys, the x and dependent variables
+      as float64 (exactly as read), and other whole-number columns downcast to integers
+    """
+    data_path = Path(data_path)
+    columns = list(dict.fromkeys(GROUP_COLS + list(group_vars) + [x_var] + list(dep_vars)))
+
+    available = pd.read_csv(data_path, nrows=0).columns
+    missing = [col for col in columns if col not in available]
+    if missing:
+        raise ValueError(f"Missing columns in {data_path}: {missing}")
+
+    df = pd.read_csv(
+        data_path,
+        usecols=columns,
+        dtype={col: dtype for col, dtype in schema.items() if col in columns and col != "g_level_corrected"},
+    )[columns]
+
+    # Categorical with float categories (read as float first so 1.8 == 1.8)
+    if "g_level_corrected" in columns and schema.get("g_level_corrected") == "category":
+        df["g_level_corrected"] = df["g_level_corrected"].astype("category")
+
+    # The fitted values keep full precision; only the extra grouping columns are downcast
+    df[[x_var] + list(dep_vars)] = df[[x_var] + list(dep_vars)].astype(np.float64)
+    return downcast_numeric(df, exclude=list(schema) + [x_var] + list(dep_vars))
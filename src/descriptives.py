@@ -21,7 +21,7 @@ def compute_descriptive_stats(data_path, variables, group_vars, output_dir):
 
     # Load relevant DataFrame or CSV files
     if isinstance(data_path, pd.DataFrame):
-        df = data_path.copy()
+        df = data_path  # only read below, no copy needed
     elif isinstance(data_path, (str, Path)):
         df = pd.read_csv(data_path)
     else:
@@ -32,12 +32,12 @@ def compute_descriptive_stats(data_path, variables, group_vars, output_dir):
         raise ValueError(f"Missing columns in {data_path}: {missing_vars}")
     
     # Compute per-subject stats
-    subj_stats = df.groupby(group_vars + ["subj_idx"])[variables].agg(['count','mean','std']).reset_index()
+    subj_stats = df.groupby(group_vars + ["subj_idx"], observed=True)[variables].agg(['count','mean','std']).reset_index()
     subj_stats.columns = ['_'.join(col).strip('_') for col in subj_stats.columns]
 
     # Compute grand mean across subjects
-    subj_means = df.groupby(group_vars + ["subj_idx"])[variables].mean().reset_index()
-    grand_mean = subj_means.groupby(group_vars)[variables].agg(['mean','std']).reset_index()
+    subj_means = df.groupby(group_vars + ["subj_idx"], observed=True)[variables].mean().reset_index()
+    grand_mean = subj_means.groupby(group_vars, observed=True)[variables].agg(['mean','std']).reset_index()
     # Flatten MultiIndex for grand_mean
     grand_mean.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in grand_mean.columns]
 
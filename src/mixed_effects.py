@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+from curve_functions import POLYNOMIAL_DEGREES
+from curve_fitting import uncertainty_columns
+from batched_fitting import pad_groups, polynomial_design
+
+# Columns that define one experimental condition (population-level effects)
+CONDITION_COLS = ["g_level_corrected", "bed_chair"]
+
+
+def mixed_model_name(model_name):
+    """Name under which the shrunken per-subject fits of a mixed-effects model are stored."""
+    return f"{model_name}_mixed"
+
+
+def group_moments(keys, X, y, mask):
+    """
+    Sufficient statistics of every group's least squares problem, in one batched pass.
+
+    Parameters:
+    - keys (pd.DataFrame): Group keys (output of pad_groups())
+    - X (np.ndarray): Design matrices, shape (n_groups, n_trials, n_params), zero in padding
+    - y (np.ndarray): Responses, shape (n_groups, n_trials)
+    - mask (np.ndarray): True where a real trial is stored
+
+    Returns:
+    - dict: "keys", "xtx" (n_groups, p, p), "xty" (n_groups, p), "yty" (n_groups,), "n" (n_groups,)
+    """
+    X = X * mask[..., None]
+    y = np.where(mask, y, 0.0)
+    return {
+        "keys": keys,
+        "xtx": np.einsum("gnp,gnq->gpq", X, X),
+        "xty": np.einsum("gnp,gn->gp", X, y),
+        "yty": np.einsum("gn,gn->g", y, y),
+        "n": mask.sum(axis=1).astype(float),
+    }
+
+
+def _subject_condition_arrays(moments):
+    """Rearranges group moments into dense (subjects x conditions) arrays (zeros for missing cells)."""
+    keys = moments["keys"]
+    subjects, subj_idx = np.unique(keys["subj_idx"].astype(str), return_inverse=True)
+    conditions = keys[CONDITION_COLS].drop_duplicates().sort_values(CONDITION_COLS).reset_index(drop=True)
+    cond_idx = keys[CONDITION_COLS].merge(conditions.reset_index(), on=CONDITION_COLS, how="left")["index"].to_numpy()
+
+    m, C, p = len(subjects), len(conditions), moments["xty"].shape[1]
+    arrays = {
+        "xtx": np.zeros((m, C, p, p)), "xty": np.zeros((m, C, p)), "yty": np.zeros((m, C)), "n": np.zeros((m, C)),
+    }
+    for name in arrays:
+        arrays[name][subj_idx, cond_idx] = moments[name]
+    return subjects, conditions, subj_idx, cond_idx, arrays
+
+
+def _em_step(arrays, psi, sigma2):
+    """
+    One EM iteration of the random-coefficient model, using only sufficient statistics.
+
+    Given the variance components, the fixed effects are the exact GLS solution and the
+    subject effects their BLUPs; the variance components are then updated from the
+    conditional moments of the subject effects. Also returns the log-likelihood at the
+    input variance components.
+    """
+    xtx, xty, yty, n = arrays["xtx"], arrays["xty"], arrays["yty"], arrays["n"]
+    m, C, p = xty.shape
+    A = xtx.sum(axis=1)                                          # Z'Z per subject, (m, p, p)
+    K = np.linalg.inv(sigma2 * np.linalg.inv(psi) + A)           # (A + s2 Psi^-1)^-1, (m, p, p)
+
+    # GLS for the fixed effects: F'V^-1F and F'V^-1y for all subjects, via Woodbury on the block structure
+    cross = np.einsum("icpq,iqr,idrs->cpds", xtx, K, xtx)       # sum_i XtX_ic K_i XtX_id
+    info = -cross
+    idx = np.arange(C)
+    info[idx, :, idx, :] += xtx.sum(axis=0)
+    info = info.reshape(C * p, C * p) / sigma2
+    zty = xty.sum(axis=1)                                        # Z'y per subject, (m, p)
+    rhs = (xty.sum(axis=0) - np.einsum("icpq,iqr,ir->cp", xtx, K, zty)).reshape(C * p) / sigma2
+    beta = np.linalg.solve(info, rhs).reshape(C, p)
+
+    # BLUPs of the subject effects and their conditional covariance
+    ztr = zty - np.einsum("icpq,cq->ip", xtx, beta)              # Z'(y - F beta) per subject
+    b = np.einsum("ipq,iq->ip", K, ztr)
+    V = sigma2 * K
+
+    # Marginal log-likelihood at the current variance components
+    rtr = (yty - 2 * np.einsum("cp,icp->ic", beta, xty) + np.einsum("cp,icpq,cq->ic", beta, xtx, beta)).sum(axis=1)
+    n_subj = n.sum(axis=1)
+    _, logdet_psi = np.linalg.slogdet(psi)
+    _, logdet_k = np.linalg.slogdet(K)
+    log_det_v = (n_subj - p) * np.log(sigma2) + logdet_psi - logdet_k
+    quad = (rtr - np.einsum("ip,ip->i", ztr, b)) / sigma2
+    loglik = -0.5 * np.sum(n_subj * np.log(2 * np.pi) + log_det_v + quad)
+
+    # Variance components from the conditional moments of the subject effects
+    theta = beta[None] + b[:, None]                              # (m, C, p)
+    ssr = yty - 2 * np.einsum("icp,icp->ic", theta, xty) + np.einsum("icp,icpq,icq->ic", theta, xtx, theta)
+    sigma2 = (ssr.sum() + np.einsum("ipq,iqp->", A, V)) / n.sum()
+    psi = (np.einsum("ip,iq->pq", b, b) + V.sum(axis=0)) / m
+
+    return beta, b, V, psi, sigma2, loglik, np.linalg.inv(info)
+
+
+def fit_mixed_from_moments(moments, model_name, x_scale=1.0, max_iter=2000, tol=1e-8):
+    """
+    Fits a hierarchical (random-coefficient) polynomial to all subjects at once:
+    y = x'(beta_condition + b_subject) + e, with b_subject ~ N(0, Psi) and e ~ N(0, sigma^2).
+
+    Every condition (g-level x posture) has its own population curve, and each subject's
+    deviation from it (a full set of polynomial coefficients) is shared across conditions.
+    Estimated by maximum likelihood (EM) from per-subject/condition sufficient statistics,
+    so the cost per iteration grows linearly with the number of subjects.
+
+    Parameters:
+    - moments (dict): Sufficient statistics of every subject/condition (output of group_moments()),
+      with the design built from x / x_scale
+    - model_name (str): Name of a polynomial model (see POLYNOMIAL_DEGREES)
+    - x_scale (float): The scale x was divided by in the design
+    - max_iter (int): Maximum number of EM iterations
+    - tol (float): Convergence tolerance on the relative change in log-likelihood
+
+    Returns:
+    - fitted_params (pd.DataFrame): Shrunken estimates (population curve + subject effect) for every
+      subject and condition, in the layout of fit_curve(), stored as model "<model_name>_mixed"
+    - effects (pd.DataFrame): Population-level coefficients of every condition with standard errors
+    - variance (pd.DataFrame): Variance components (subject covariance, residual variance) and fit info
+    """
+    if model_name not in POLYNOMIAL_DEGREES:
+        raise ValueError(f"Mixed-effects fits need a polynomial model, got {model_name}.")
+    n_params = POLYNOMIAL_DEGREES[model_name] + 1
+    keys = moments["keys"]
+    subjects, conditions, subj_idx, cond_idx, arrays = _subject_condition_arrays(moments)
+
+    # Start the variance components from separate least squares fits of every group
+    ols = np.linalg.lstsq(arrays["xtx"].sum(axis=(0, 1)), arrays["xty"].sum(axis=(0, 1)), rcond=None)[0]
+    group_beta = (np.linalg.pinv(moments["xtx"]) @ moments["xty"][..., None])[..., 0]
+    group_ssr = moments["yty"] - 2 * np.einsum("gp,gp->g", group_beta, moments["xty"]) \
+        + np.einsum("gp,gpq,gq->g", group_beta, moments["xtx"], group_beta)
+    sigma2 = max(group_ssr.sum() / max(moments["n"].sum() - len(keys) * n_params, 1.0), 1e-12)
+    psi = np.diag(np.var(group_beta, axis=0) + 1e-6 * (np.abs(ols) + 1.0) ** 2)
+
+    loglik_prev = -np.inf
+    converged = False
+    for n_iter in range(1, max_iter + 1):
+        beta, b, V, psi, sigma2, loglik, cov_beta = _em_step(arrays, psi, sigma2)
+        if abs(loglik - loglik_prev) <= tol * abs(loglik):
+            converged = True
+            break
+        loglik_prev = loglik
+    if not converged:
+        print(f"***WARNING*** Mixed-effects {model_name} fit did not converge in {max_iter} iterations.")
+
+    # Undo the x scaling: coefficient k multiplies (x / scale)^k
+    unscale = 1 / x_scale ** np.arange(n_params)
+    outer = unscale[:, None] * unscale[None, :]
+    beta, b, V, psi = beta * unscale, b * unscale, V * outer, psi * outer
+    cov_beta = cov_beta.reshape(len(conditions), n_params, len(conditions), n_params)
+    cov_cond = cov_beta[np.arange(len(conditions)), :, np.arange(len(conditions)), :] * outer
+
+    # Shrunken subject x condition estimates; their covariance adds the uncertainty of the
+    # population curve to that of the subject effect (cross-covariance ignored)
+    params = beta[cond_idx] + b[subj_idx]
+    cov = V[subj_idx] + cov_cond[cond_idx]
+    fitted_params = keys.assign(model=mixed_model_name(model_name))
+    for i in range(n_params):
+        fitted_params[f"param_{i}"] = params[:, i]
+    fitted_params = fitted_params.assign(
+        **uncertainty_columns(cov, moments["n"].astype(np.int64), np.full(len(keys), sigma2))
+    )
+
+    effects = conditions.loc[np.repeat(np.arange(len(conditions)), n_params)].reset_index(drop=True)
+    effects["model"] = model_name
+    effects["param_name"] = [f"param_{i}" for i in np.tile(np.arange(n_params), len(conditions))]
+    effects["value"] = beta.ravel()
+    effects["se"] = np.sqrt(np.diagonal(cov_cond, axis1=1, axis2=2)).ravel()
+
+    components = {"resid_var": sigma2}
+    components.update({f"subj_var_{i}": psi[i, i] for i in range(n_params)})
+    components.update({f"subj_cov_{i}_{j}": psi[i, j] for i in range(n_params) for j in range(i + 1, n_params)})
+    components.update({"loglik": loglik, "n_subjects": len(subjects), "n_obs": moments["n"].sum(),
+                       "n_iter": n_iter, "converged": float(converged)})
+    variance = pd.DataFrame({"model": model_name, "component": list(components), "value": list(components.values())})
+
+    print(f"✅ Mixed-effects {model_name} fit: {len(subjects)} subjects, {len(conditions)} conditions, "
+          f"{n_iter} EM iterations")
+    return fitted_params, effects, variance
+
+
+def fit_mixed_polynomial(data, subj_to_keep, x_col, y_col, model_name, max_iter=2000, tol=1e-8):
+    """
+    Fits a hierarchical polynomial to all subjects at once (see fit_mixed_from_moments()),
+    from trial-level data.
+
+    Parameters:
+    - data (pd.DataFrame): Trial-level data
+    - subj_to_keep (list): List of subject IDs to include in the analysis
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - model_name (str): Name of a polynomial model (see POLYNOMIAL_DEGREES)
+    - max_iter (int): Maximum number of EM iterations
+    - tol (float): Convergence tolerance on the relative change in log-likelihood
+
+    Returns:
+    - tuple: fitted_params, effects, variance (see fit_mixed_from_moments())
+    """
+    if model_name not in POLYNOMIAL_DEGREES:
+        raise ValueError(f"Mixed-effects fits need a polynomial model, got {model_name}.")
+    df = data[data["subj_idx"].isin(subj_to_keep)] if subj_to_keep is not None else data
+    keys, x, y, mask, _ = pad_groups(df, x_col, y_col)
+
+    # Scaled x keeps the normal equations well conditioned
+    x_scale = float(np.abs(x[mask]).max()) if mask.any() else 1.0
+    x_scale = x_scale or 1.0
+    moments = group_moments(keys, polynomial_design(x, POLYNOMIAL_DEGREES[model_name], x_scale), y, mask)
+    return fit_mixed_from_moments(moments, model_name, x_scale, max_iter, tol)
@@ -0,0 +1,270 @@
+import inspect
+import types
+import numpy as np
+
+# Opt-in compilation of model functions (see analysis_config.env, COMPILE_MODELS).
+# A compiled model is a drop-in replacement for the Python function in
+# curve_functions.py: it is called as func(x, *params), broadcasts over arrays of
+# parameters (so one call evaluates many groups), and has two extra attributes:
+#   .jac(x, *params) -> derivatives with respect to each parameter, shape (..., n_params)
+#   .n_params        -> number of parameters
+# Both backends differentiate the model symbolically with SymPy. Numba kernels of models
+# that SymPy cannot translate (or without SymPy installed) fall back to a numerical
+# (central-difference) Jacobian; .jac_method tells which one a kernel uses.
+# SymPy and Numba are optional dependencies, imported only when compiling.
+KERNEL_BACKENDS = ["sympy", "numba"]
+
+# NumPy functions that custom models may use, and their SymPy equivalents
+_SYMPY_NUMPY_NAMES = {
+    "exp": "exp", "log": "log", "sqrt": "sqrt", "sin": "sin", "cos": "cos", "tan": "tan",
+    "arctan": "atan", "arcsin": "asin", "arccos": "acos", "sinh": "sinh", "cosh": "cosh",
+    "tanh": "tanh", "abs": "Abs", "power": "Pow", "pi": "pi", "e": "E",
+}
+
+
+def _import_backend(backend):
+    """Imports the optional package behind a backend, with an actionable error if it is missing."""
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Invalid kernel backend: {backend}. Expected one of {KERNEL_BACKENDS}.")
+    try:
+        return __import__(backend)
+    except ImportError as e:
+        raise ImportError(
+            f"COMPILE_MODELS={backend} requires the optional package '{backend}' (pip install {backend}), "
+            f"or set COMPILE_MODELS=none."
+        ) from e
+
+
+def _parameter_names(func):
+    """Names of the x argument and of the parameters of a model function."""
+    names = list(inspect.signature(func).parameters)
+    return names[0], names[1:]
+
+
+def _sympy_expression(func):
+    """Traces a model function with SymPy symbols; returns the sympy module, x, the parameters and the expression."""
+    sympy = _import_backend("sympy")
+    x_name, param_names = _parameter_names(func)
+    x = sympy.Symbol(x_name)
+    params = [sympy.Symbol(name) for name in param_names]
+
+    # Trace the model with symbols; np.<function> calls are redirected to SymPy
+    sympy_numpy = types.SimpleNamespace(**{
+        name: getattr(sympy, sympy_name) for name, sympy_name in _SYMPY_NUMPY_NAMES.items()
+    })
+    symbolic_globals = dict(func.__globals__, np=sympy_numpy, numpy=sympy_numpy)
+    symbolic_func = types.FunctionType(func.__code__, symbolic_globals, func.__name__,
+                                       func.__defaults__, func.__closure__)
+    try:
+        expr = sympy.sympify(symbolic_func(x, *params))
+    except Exception as e:
+        raise ValueError(
+            f"Model {func.__name__} could not be translated to SymPy ({e}). "
+            f"Use arithmetic and np.{', np.'.join(list(_SYMPY_NUMPY_NAMES)[:6])}, ... or COMPILE_MODELS=numba."
+        ) from e
+    return sympy, x, params, expr
+
+
+def _sympy_kernel(func):
+    sympy, x, params, expr = _sympy_expression(func)
+    evaluate = sympy.lambdify([x, *params], expr, "numpy")
+    jacobian = sympy.lambdify([x, *params], [sympy.diff(expr, p) for p in params], "numpy", cse=True)
+
+    def kernel(x, *params):
+        out = evaluate(x, *params)
+        shape = np.broadcast_shapes(np.shape(x), *[np.shape(p) for p in params])
+        # Constant expressions evaluate to scalars
+        return out if np.shape(out) == shape else np.broadcast_to(out, shape).astype(float)
+
+    def jac(x, *params):
+        shape = np.broadcast_shapes(np.shape(x), *[np.shape(p) for p in params])
+        out = np.empty(shape + (len(params),))
+        for k, derivative in enumerate(jacobian(x, *params)):
+            out[..., k] = derivative
+        return out
+
+    kernel.expression = expr
+    return kernel, jac
+
+
+def _numba_derivatives(func, numba):
+    """
+    Exact derivatives of a model with respect to each parameter, as scalar numba functions
+    generated from its SymPy expression; None if the model cannot be differentiated this way.
+    """
+    try:
+        sympy, x, params, expr = _sympy_expression(func)
+        derivatives = [numba.njit(sympy.lambdify([x, *params], sympy.diff(expr, p), "math")) for p in params]
+        for derivative in derivatives:
+            derivative(1.0, *[1.0] * len(params))  # compile now, so unsupported functions fall back here
+    except Exception:
+        return None
+    return derivatives
+
+
+def _numba_kernel(func, rel_step=1e-6):
+    numba = _import_backend("numba")
+    _, param_names = _parameter_names(func)
+    n_params = len(param_names)
+    scalar = numba.njit(func)
+    derivatives = _numba_derivatives(func, numba)
+
+    # Loops over all points with a fixed number of parameters, generated per model: one variant with
+    # one parameter set (curve_fit calls) and one with a parameter set per point (many groups at once)
+    args = ", ".join(f"p{k}" for k in range(n_params))
+    source = []
+    for variant, index in [("one", ""), ("many", "[i]")]:
+        row = [f"p{k}{index}" for k in range(n_params)]
+        source += [
+            f"def evaluate_{variant}(x, {args}, out):",
+            "    for i in range(x.shape[0]):",
+            f"        out[i] = scalar(x[i], {', '.join(row)})",
+            f"def jacobian_{variant}(x, {args}, out):",
+            "    for i in range(x.shape[0]):",
+        ]
+        for k in range(n_params):
+            if derivatives is not None:
+                source.append(f"        out[i, {k}] = derivative_{k}(x[i], {', '.join(row)})")
+                continue
+            hi = ", ".join(row[:k] + [f"{row[k]} + h"] + row[k + 1:])
+            lo = ", ".join(row[:k] + [f"{row[k]} - h"] + row[k + 1:])
+            source += [
+                f"        h = rel_step * max(abs({row[k]}), 1.0)",
+                f"        out[i, {k}] = (scalar(x[i], {hi}) - scalar(x[i], {lo})) / (2 * h)",
+            ]
+    namespace = {"scalar": scalar, "rel_step": rel_step}
+    namespace.update({f"derivative_{k}": derivative for k, derivative in enumerate(derivatives or [])})
+    exec("\n".join(source), namespace)
+    compiled = {name: numba.njit(namespace[name]) for name in
+                ["evaluate_one", "jacobian_one", "evaluate_many", "jacobian_many"]}
+
+    def run(loop, x, params, trailing_shape):
+        if all(np.ndim(p) == 0 for p in params):
+            x = np.asarray(x, dtype=float)
+            out = np.empty(x.shape + trailing_shape)
+            compiled[f"{loop}_one"](x.reshape(-1), *[float(p) for p in params], out.reshape((-1,) + trailing_shape))
+            return out
+        arrays = np.broadcast_arrays(np.asarray(x, dtype=float), *[np.asarray(p, dtype=float) for p in params])
+        flat = [np.ascontiguousarray(a).reshape(-1) for a in arrays]
+        out = np.empty((flat[0].size,) + trailing_shape)
+        compiled[f"{loop}_many"](*flat, out)
+        return out.reshape(arrays[0].shape + trailing_shape)
+
+    def kernel(x, *params):
+        return run("evaluate", x, params, ())
+
+    def jac(x, *params):
+        return run("jacobian", x, params, (n_params,))
+
+    jac.method = "analytic" if derivatives is not None else "central differences"
+    return kernel, jac
+
+
+def compile_model(func, backend="sympy"):
+    """
+    Compiles a model function (and its Jacobian) into a vectorized kernel.
+
+    The "sympy" backend translates the model to a symbolic expression, differentiates it
+    exactly and generates NumPy code for both. The "numba" backend JIT-compiles the model
+    as written, and its Jacobian from the SymPy derivatives; if SymPy is not installed or cannot
+    translate the model (e.g. np.maximum or branches), the numba Jacobian is numerical (central
+    differences, relative step 1e-6).
+
+    Parameters:
+    - func (callable): Model function, f(x, a, b, ...), as in curve_functions.py
+    - backend (str): One of KERNEL_BACKENDS
+
+    Returns:
+    - callable: kernel(x, *params), broadcasting over x and the parameters,
+      with attributes jac, jac_method ("analytic" or "central differences"), n_params, backend and python_func
+    """
+    if backend == "sympy":
+        kernel, jac = _sympy_kernel(func)
+    elif backend == "numba":
+        kernel, jac = _numba_kernel(func)
+    else:
+        raise ValueError(f"Invalid kernel backend: {backend}. Expected one of {KERNEL_BACKENDS}.")
+    kernel.__name__ = func.__name__
+    kernel.__doc__ = func.__doc__
+    # Same signature as the model, so curve_fit can count its parameters
+    kernel.__signature__ = inspect.signature(func)
+    kernel.jac = jac
+    kernel.jac_method = getattr(jac, "method", "analytic")
+    kernel.n_params = len(_parameter_names(func)[1])
+    kernel.backend = backend
+    kernel.python_func = func
+    return kernel
+
+
+def verify_kernel(kernel, x, n_checks=5, rtol=1e-6, seed=0):
+    """
+    Checks that a compiled kernel reproduces its pure-Python model (values and Jacobian)
+    for several parameter sets, evaluated for all of them in one batched call.
+
+    Parameters:
+    - kernel (callable): Output of compile_model()
+    - x (np.ndarray): x values to check (e.g. the observed x values)
+    - n_checks (int): Number of parameter sets (curve_fit's starting point, all ones, plus random sets)
+    - rtol (float): Relative tolerance for the values; the Jacobian is checked against
+      finite differences with a looser tolerance
+    - seed (int): Seed for the random parameter sets
+
+    Raises:
+    - ValueError: If the kernel does not match the Python definition
+    """
+    func = kernel.python_func
+    x = np.asarray(x, dtype=float)[None, :]
+    rng = np.random.default_rng(seed)
+    params = np.vstack([np.ones(kernel.n_params), 1 + 0.5 * rng.standard_normal((n_checks - 1, kernel.n_params))])
+    param_args = params.T[:, :, None]
+
+    with np.errstate(all="ignore"):  # e.g. log of a negative random parameter, NaN in both
+        expected = func(x, *param_args) * np.ones((len(params), 1))
+        actual = kernel(x, *param_args)
+    if not np.allclose(actual, expected, rtol=rtol, atol=rtol * np.nanmax(np.abs(expected), initial=1.0),
+                       equal_nan=True):
+        raise ValueError(f"Compiled {kernel.backend} kernel for {func.__name__} does not match the Python model.")
+
+    # Jacobian vs central differences of the Python model (allowing for their rounding error)
+    with np.errstate(all="ignore"):
+        jac = kernel.jac(x, *param_args)
+    for k in range(kernel.n_params):
+        step = 1e-6 * np.maximum(np.abs(params[:, k]), 1.0)
+        hi, lo = params.copy(), params.copy()
+        hi[:, k] += step
+        lo[:, k] -= step
+        with np.errstate(all="ignore"):
+            numeric = (func(x, *hi.T[:, :, None]) - func(x, *lo.T[:, :, None])) / (2 * step[:, None])
+        rounding = 100 * np.finfo(float).eps * np.abs(expected) / step[:, None]
+        tolerance = 1e-4 * (np.abs(numeric) + np.nanmax(np.abs(numeric), initial=1.0)) + rounding
+        matches = np.abs(jac[..., k] - numeric) <= tolerance
+        if not np.all(matches | np.isnan(numeric)):
+            raise ValueError(
+                f"Compiled {kernel.backend} Jacobian for {func.__name__} does not match the Python model "
+                f"(parameter {k})."
+            )
+
+
+def compile_models(model_functions, model_names, backend, x_check):
+    """
+    Compiles and verifies the given models.
+
+    Parameters:
+    - model_functions (dict): Model name -> Python function (e.g. MODEL_FUNCTIONS)
+    - model_names (list): Models to compile
+    - backend (str): One of KERNEL_BACKENDS
+    - x_check (np.ndarray): x values used to verify each kernel against its Python model
+
+    Returns:
+    - dict: Model name -> compiled kernel (models that are not found, or already have a Jacobian, are left out)
+    """
+    kernels = {}
+    for model_name in model_names:
+        if model_name not in model_functions or hasattr(model_functions[model_name], "jac"):
+            continue  # Not found, or already vectorized with an exact Jacobian (e.g. splines)
+        kernel = compile_model(model_functions[model_name], backend)
+        verify_kernel(kernel, x_check)
+        kernels[model_name] = kernel
+        print(f"✅ Compiled {model_name} model with {backend}, {kernel.jac_method} Jacobian "
+              f"(matches the Python definition)")
+    return kernels
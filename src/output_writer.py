@@ -0,0 +1,187 @@
+import atexit
+import io
+import os
+import queue
+import threading
+import uuid
+import weakref
+from pathlib import Path
+import matplotlib.pyplot as plt
+
+
+def atomic_write(path, write_func, mode="wb", **open_kwargs):
+    """
+    Writes a file via a temporary file in the same directory, renamed into place when complete,
+    so readers never see a partially written output.
+
+    Parameters:
+    - path (Path or str): Output file
+    - write_func (callable): Called with the open temporary file object
+    - mode (str): File mode ("wb" for binary, "w" for text)
+    - **open_kwargs: Passed to open() (e.g. newline="" for CSVs)
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, mode, **open_kwargs) as f:
+            write_func(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+# Writers that have not been closed yet; their pending writes are flushed at exit
+_open_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+class OutputWriter:
+    """
+    Writes result tables and figures in background threads, so the analysis can move on to the
+    next DV/model while earlier outputs are still being written (e.g. to a network drive).
+
+    Tasks wait in a bounded queue (submitting blocks while it is full, which caps the memory
+    held by pending outputs). Files are written atomically. Figures are rendered on the calling
+    thread (matplotlib is not thread-safe); only the rendered bytes are written in the background.
+    Call close() to wait for all pending writes; it re-raises the first write error.
+
+    Parameters:
+    - n_threads (int): Number of writer threads; 0 writes synchronously on the calling thread
+    - max_pending (int): Maximum number of queued outputs before submitting blocks
+    """
+
+    def __init__(self, n_threads=2, max_pending=16):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._serial_lock = threading.Lock()
+        self._errors = []
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"output-writer-{i}", daemon=True)
+            for i in range(n_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+        # Flush pending writes even if the script exits early (see _close_open_writers())
+        _open_writers.add(self)
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._run(*task)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, func, args, kwargs, serial):
+        try:
+            if serial:
+                with self._serial_lock:
+                    func(*args, **kwargs)
+            else:
+                func(*args, **kwargs)
+        except Exception as e:
+            print(f"***ERROR*** Failed to write output ({func.__name__}): {e}")
+            self._errors.append(e)
+
+    def submit(self, func, *args, serial=False, **kwargs):
+        """
+        Queues func(*args, **kwargs). The arguments must not be modified afterwards.
+
+        Parameters:
+        - func (callable): Task to run in the background
+        - serial (bool): Never run at the same time as other serial tasks (e.g. writes to one SQLite file)
+        """
+        if self._closed:
+            raise RuntimeError("OutputWriter is closed")
+        task = (func, args, kwargs, serial)
+        if self._threads:
+            self._queue.put(task)
+        else:
+            self._run(*task)
+
+    def write_table(self, df, path, **to_csv_kwargs):
+        """
+        Queues a DataFrame to be saved as CSV (same arguments as DataFrame.to_csv()).
+        """
+        self.submit(atomic_write, path, lambda f: df.to_csv(f, **to_csv_kwargs), mode="w", newline="")
+
+    def write_buffer(self, buffer, path):
+        """
+        Queues the contents of an in-memory file (e.g. a multi-page PDF) to be written.
+
+        Parameters:
+        - buffer (io.BytesIO): Complete file contents; must not be modified afterwards
+        - path (Path or str): Output file
+        """
+        self.submit(atomic_write, path, lambda f: f.write(buffer.getbuffer()))
+
+    def write_figure(self, fig, path, **savefig_kwargs):
+        """
+        Renders a figure to memory, closes it, and queues the rendered file to be written.
+
+        Parameters:
+        - fig (matplotlib.figure.Figure): Figure to save
+        - path (Path or str): Output file; the format is taken from its extension
+        - **savefig_kwargs: Passed to fig.savefig()
+        """
+        buffer = io.BytesIO()
+        savefig_kwargs.setdefault("format", Path(path).suffix.lstrip(".") or None)
+        fig.savefig(buffer, **savefig_kwargs)
+        plt.close(fig)
+        self.write_buffer(buffer, path)
+
+    def close(self):
+        """
+        Waits until every queued output has been written and stops the writer threads.
+        Raises the first error encountered while writing, if any.
+        """
+        if not self._closed:
+            self._closed = True
+            _open_writers.discard(self)
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise errors[0]
+
+
+def save_figure(fig, path, writer=None, **savefig_kwargs):
+    """
+    Saves and closes a figure, through an OutputWriter when one is given.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): Figure to save
+    - path (Path or str): Output file
+    - writer (OutputWriter): Background writer; the figure is written immediately if None
+    - **savefig_kwargs: Passed to fig.savefig()
+    """
+    if writer is not None:
+        writer.write_figure(fig, path, **savefig_kwargs)
+    else:
+        fig.savefig(path, **savefig_kwargs)
+        plt.close(fig)
+
+
+def save_buffer(buffer, path, writer=None):
+    """
+    Saves an in-memory file (e.g. a multi-page PDF), through an OutputWriter when one is given.
+
+    Parameters:
+    - buffer (io.BytesIO): Complete file contents
+    - path (Path or str): Output file
+    - writer (OutputWriter): Background writer; the file is written immediately if None
+    """
+    if writer is not None:
+        writer.write_buffer(buffer, path)
+    else:
+        atomic_write(path, lambda f: f.write(buffer.getbuffer()))
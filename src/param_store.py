@@ -0,0 +1,248 @@
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from curve_functions import MODEL_FUNCTIONS, model_n_params, pspline_model
+
+# Trial-level columns that define one fitted curve (one subject in one condition)
+GROUP_COLS = ["subj_idx", "g_level_corrected", "bed_chair"]
+
+# Columns that identify one fit in the parameter store
+FIT_KEYS = GROUP_COLS + ["model"]
+
+# String keys stored as categoricals
+CATEGORICAL_KEYS = ["subj_idx", "bed_chair", "model"]
+
+# Per-fit columns stored with every parameter; splines also store the range their knots span
+FIT_INFO_COLS = ["n_obs", "resid_var"]
+KNOT_COLS = ["knot_min", "knot_max"]
+
+# Per-parameter columns of the wide layout of fit_curve(): param_<i>, se_<i> and cov_<i>_<j>
+PARAM_COLUMN = re.compile(r"^param_\d+$")
+WIDE_COLUMN = re.compile(r"^(param|se)_\d+$|^cov_\d+_\d+$")
+
+
+def _n_params(model_name, frame):
+    """
+    Number of parameters of a model whose fits are stored in a wide frame. Taken from the model
+    definition (mixed-effects fits "<model>_mixed" use their base model), else from the frame's
+    param_* columns when it holds only this model, so fits that failed (all NaN) keep their parameters.
+    Only unknown models in multi-model frames fall back to the columns that are not entirely empty.
+    """
+    base_name = model_name.removesuffix("_mixed")
+    if base_name in MODEL_FUNCTIONS:
+        return model_n_params(MODEL_FUNCTIONS[base_name])
+    param_cols = [col for col in frame.columns if PARAM_COLUMN.match(col)]
+    in_model = frame["model"] == model_name
+    if in_model.all():
+        return len(param_cols)
+    return sum(1 for col in param_cols if frame.loc[in_model, col].notna().any())
+
+
+def _model_frames(fitted_params):
+    """Splits a list of fit_curve() outputs or one (NaN-padded) wide frame into one frame per model."""
+    frames = fitted_params if isinstance(fitted_params, (list, tuple)) else [fitted_params]
+    for frame in frames:
+        for model_name, model_df in frame.groupby("model", sort=False):
+            yield model_name, model_df.reset_index(drop=True), _n_params(model_name, frame)
+
+
+def build_param_store(fitted_params):
+    """
+    Converts wide fitted-parameter frames into the long-format parameter store.
+
+    Parameters:
+    - fitted_params (list or pd.DataFrame): Outputs of fit_curve() / fit_curve_robust(),
+      either as a list (one frame per model) or concatenated into one wide frame
+
+    Returns:
+    - dict with two long DataFrames:
+      "params": one row per fit and parameter; FIT_KEYS, param_name, param_idx, value, se,
+                n_obs and resid_var of the fit (and knot_min / knot_max for splines)
+      "cov":    one row per fit and parameter pair (i < j); FIT_KEYS, param_i, param_j, value
+    """
+    params, cov = [], []
+    for model_name, model_df, n_params in _model_frames(fitted_params):
+        n_fits = len(model_df)
+        keys = model_df[FIT_KEYS]
+
+        idx = np.tile(np.arange(n_params), n_fits)
+        long = keys.iloc[np.repeat(np.arange(n_fits), n_params)].reset_index(drop=True)
+        long["param_name"] = [f"param_{i}" for i in idx]
+        long["param_idx"] = idx.astype(np.int16)
+        long["value"] = model_df[[f"param_{i}" for i in range(n_params)]].to_numpy(float).ravel()
+        se_cols = [f"se_{i}" for i in range(n_params)]
+        long["se"] = model_df[se_cols].to_numpy(float).ravel() if set(se_cols) <= set(model_df.columns) else np.nan
+        for col in FIT_INFO_COLS:
+            long[col] = np.repeat(model_df[col].to_numpy(), n_params) if col in model_df.columns else np.nan
+        for col in KNOT_COLS:
+            if col in model_df.columns:
+                long[col] = np.repeat(model_df[col].to_numpy(float), n_params)
+        params.append(long)
+
+        pairs = [(i, j) for i in range(n_params) for j in range(i + 1, n_params)]
+        cov_cols = [f"cov_{i}_{j}" for i, j in pairs]
+        if pairs and set(cov_cols) <= set(model_df.columns):
+            long_cov = keys.iloc[np.repeat(np.arange(n_fits), len(pairs))].reset_index(drop=True)
+            long_cov["param_i"] = np.tile([i for i, _ in pairs], n_fits).astype(np.int16)
+            long_cov["param_j"] = np.tile([j for _, j in pairs], n_fits).astype(np.int16)
+            long_cov["value"] = model_df[cov_cols].to_numpy(float).ravel()
+            cov.append(long_cov)
+
+    store = {
+        "params": pd.concat(params, ignore_index=True) if params else pd.DataFrame(
+            columns=FIT_KEYS + ["param_name", "param_idx", "value", "se"] + FIT_INFO_COLS),
+        "cov": pd.concat(cov, ignore_index=True) if cov else pd.DataFrame(
+            columns=FIT_KEYS + ["param_i", "param_j", "value"]),
+    }
+    for table in store.values():
+        for col in CATEGORICAL_KEYS + ["param_name"]:
+            if col in table.columns:
+                table[col] = table[col].astype(str).astype("category")
+    return store
+
+
+def load_param_store(params, cov=None):
+    """
+    Rebuilds the parameter store from its long tables, as saved by run_analysis.py
+    (fitted_parameters_<DV>.csv / parameter_covariance_<DV>.csv, or the same tables
+    read back with results_store.query_results()).
+
+    Parameters:
+    - params (pd.DataFrame, Path or str): Long "params" table of one DV, or its CSV file
+    - cov (pd.DataFrame, Path or str): Long "cov" table of the same DV, or its CSV file; without it,
+      model_params() returns no cov_*_* columns
+
+    Returns:
+    - dict: "params" and "cov", as returned by build_param_store()
+    """
+    tables = {}
+    for name, table in [("params", params), ("cov", cov)]:
+        if isinstance(table, (str, Path)):
+            table = pd.read_csv(table)
+        if table is None:
+            table = pd.DataFrame(columns=FIT_KEYS + ["param_i", "param_j", "value"])
+        if "dep_var" in table.columns:
+            if table["dep_var"].nunique() > 1:
+                raise ValueError("The parameter store holds a single DV; select one dep_var first.")
+            table = table.drop(columns="dep_var")
+        table = table.copy()
+        table["g_level_corrected"] = table["g_level_corrected"].astype(float)
+        for col in ["param_idx", "param_i", "param_j"]:
+            if col in table.columns:
+                table[col] = table[col].astype(np.int16)
+        for col in CATEGORICAL_KEYS + ["param_name"]:
+            if col in table.columns:
+                table[col] = table[col].astype(str).astype("category")
+        tables[name] = table.reset_index(drop=True)
+    return tables
+
+
+def model_names(fitted_params):
+    """
+    Lists the models contained in a parameter store or wide fitted-parameter frame.
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Output of build_param_store() or a wide frame
+
+    Returns:
+    - list: Model names, in order of appearance
+    """
+    table = fitted_params["params"] if isinstance(fitted_params, dict) else fitted_params
+    return list(pd.unique(table["model"].astype(str)))
+
+
+def model_params(fitted_params, model_name):
+    """
+    Returns the fits of one model as a wide frame with exactly that model's parameter columns.
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Output of build_param_store() / load_param_store(), its
+      long "params" table, or a wide (possibly NaN-padded, multi-model) frame as written by fit_curve()
+    - model_name (str): Model to select
+
+    Returns:
+    - pd.DataFrame: One row per fit, sorted by group; FIT_KEYS, param_*, and (when available)
+      se_*, cov_*_*, n_obs, resid_var and the knot range, in the layout of fit_curve() / fit_pspline()
+    """
+    if not isinstance(fitted_params, dict) and "param_idx" in fitted_params.columns:
+        # Long "params" table as saved by run_analysis.py (CSV or results store)
+        fitted_params = load_param_store(fitted_params)
+    if not isinstance(fitted_params, dict):
+        df = fitted_params[fitted_params["model"] == model_name]
+        n_params = _n_params(model_name, fitted_params)
+        padding = [
+            col for col in df.columns
+            if (WIDE_COLUMN.match(col) and max(int(i) for i in col.split("_")[1:]) >= n_params)
+            or (col in KNOT_COLS and df[col].isna().all())
+        ]
+        return df.drop(columns=padding).reset_index(drop=True)
+
+    params = fitted_params["params"]
+    params = params[params["model"] == model_name].sort_values(GROUP_COLS + ["param_idx"], kind="stable")
+    n_params = int(params["param_idx"].max()) + 1 if len(params) else 0
+    n_fits = len(params) // max(n_params, 1)
+
+    info_cols = FIT_INFO_COLS + [col for col in KNOT_COLS if col in params.columns and params[col].notna().any()]
+    wide = params.iloc[::max(n_params, 1)][FIT_KEYS + info_cols].reset_index(drop=True)
+    for col in CATEGORICAL_KEYS:
+        wide[col] = wide[col].astype(str)
+    values = params["value"].to_numpy(float).reshape(n_fits, n_params)
+    se = params["se"].to_numpy(float).reshape(n_fits, n_params)
+    columns = {f"param_{i}": values[:, i] for i in range(n_params)}
+    columns.update({f"se_{i}": se[:, i] for i in range(n_params)})
+
+    cov = fitted_params["cov"]
+    cov = cov[cov["model"] == model_name].sort_values(GROUP_COLS + ["param_i", "param_j"], kind="stable")
+    n_pairs = n_params * (n_params - 1) // 2
+    if n_pairs and len(cov) == n_fits * n_pairs:
+        cov_values = cov["value"].to_numpy(float).reshape(n_fits, n_pairs)
+        pairs = [(i, j) for i in range(n_params) for j in range(i + 1, n_params)]
+        columns.update({f"cov_{i}_{j}": cov_values[:, k] for k, (i, j) in enumerate(pairs)})
+
+    wide = wide.assign(**columns)
+    return wide[FIT_KEYS + list(columns) + info_cols]
+
+
+def param_matrix(fitted_params, model_name):
+    """
+    Returns the parameters of one model as an array, for vectorized evaluation.
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Output of build_param_store() or a wide frame
+    - model_name (str): Model to select
+
+    Returns:
+    - keys (pd.DataFrame): FIT_KEYS of each fit
+    - values (np.ndarray): Parameters, shape (n_fits, n_params)
+    """
+    df = model_params(fitted_params, model_name)
+    param_cols = [col for col in df.columns if PARAM_COLUMN.match(col)]
+    return df[FIT_KEYS], df[param_cols].to_numpy(float)
+
+
+def model_function(fitted_params, model_name, func=None):
+    """
+    Returns the function that evaluates the fits of one model. Spline coefficients only have a meaning
+    together with their knots, so splines are rebuilt over the knot range stored with their fits.
+
+    Parameters:
+    - fitted_params (dict or pd.DataFrame): Parameter store or wide fitted-parameter frame
+    - model_name (str): Model to evaluate
+    - func (callable): Model function or compiled kernel; defaults to MODEL_FUNCTIONS[model_name]
+
+    Returns:
+    - callable: func, or a spline over the stored knot range
+    """
+    func = MODEL_FUNCTIONS[model_name] if func is None else func
+    table = fitted_params["params"] if isinstance(fitted_params, dict) else fitted_params
+    if not hasattr(func, "knot_range") or not set(KNOT_COLS) <= set(table.columns):
+        return func
+
+    knot_ranges = table.loc[table["model"] == model_name, KNOT_COLS].dropna().drop_duplicates()
+    if len(knot_ranges) > 1:
+        raise ValueError(f"The {model_name} fits span different knot ranges; evaluate them separately.")
+    if len(knot_ranges) == 0 or tuple(knot_ranges.iloc[0]) == func.knot_range:
+        return func
+    knot_min, knot_max = knot_ranges.iloc[0]
+    return pspline_model(knot_min, knot_max, func.n_segments)
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from curve_functions import MODEL_FUNCTIONS
+from curve_fitting import uncertainty_columns
+from batched_fitting import pad_groups
+
+# Smoothing parameters tried by GCV, relative to the size of the normal equations
+# (lambda * trace(P) / trace(B'B)); small values interpolate, large ones approach a straight line
+PSPLINE_LAMBDAS = np.logspace(-4, 4, 33)
+
+
+def difference_penalty(n_params, order=2):
+    """
+    Roughness penalty of a P-spline: sum of squared order-th differences of neighboring coefficients.
+
+    Parameters:
+    - n_params (int): Number of spline coefficients
+    - order (int): Difference order (2 penalizes curvature; its null space is a straight line)
+
+    Returns:
+    - np.ndarray: Penalty matrix D'D, shape (n_params, n_params)
+    """
+    D = np.diff(np.eye(n_params), n=order, axis=0)
+    return D.T @ D
+
+
+def demmler_reinsch(btb, bty, penalty, lambda_ref):
+    """
+    Diagonalizes every group's penalized normal equations (B'B + lambda P) c = B'y at once,
+    so that fits, effective degrees of freedom and residuals are closed-form functions of lambda.
+
+    With M = B'B + lambda_ref P = L L' (Cholesky) and L^-1 P L^-T = U diag(s) U', the coefficients
+    for any lambda are c = L^-T U (z / d) with z = U' L^-1 B'y and d = 1 + (lambda - lambda_ref) s.
+    Factoring the penalized rather than the plain normal matrix keeps this well conditioned when
+    a group has fewer distinct x values than coefficients (the penalty then fills the gaps).
+
+    B'B and P are banded (bandwidth 3), but the matrices are deliberately handled as dense: the
+    eigendecomposition that makes GCV closed-form is dense anyway, q = n_segments + 3 is small (9 by
+    default), and one batched LAPACK call for all groups is much faster than per-group banded
+    solves (scipy's cholesky_banded / solveh_banded are not batched, and each lambda would need its
+    own solve plus the trace for the effective degrees of freedom). Cost grows as q^3 per group, so
+    this stays cheap for up to a few dozen segments.
+
+    Parameters:
+    - btb (np.ndarray): Normal matrices B'B, shape (n_groups, q, q)
+    - bty (np.ndarray): B'y, shape (n_groups, q)
+    - penalty (np.ndarray): Penalty matrix, shape (q, q)
+    - lambda_ref (np.ndarray): Reference smoothing parameter of every group, shape (n_groups,)
+
+    Returns:
+    - transform (np.ndarray): L^-T U, shape (n_groups, q, q)
+    - s (np.ndarray): Penalty eigenvalues, shape (n_groups, q)
+    - z (np.ndarray): Rotated B'y, shape (n_groups, q)
+    """
+    # A tiny ridge keeps groups whose x values do not even determine a straight line factorizable
+    q = btb.shape[-1]
+    L = np.linalg.cholesky(btb + lambda_ref[:, None, None] * (penalty + 1e-10 * np.eye(q)))
+    L_inv_t = np.swapaxes(np.linalg.inv(L), 1, 2)
+    s, U = np.linalg.eigh(np.swapaxes(L_inv_t, 1, 2) @ penalty @ L_inv_t)
+    transform = L_inv_t @ U
+    z = np.einsum("gqp,gq->gp", transform, bty)
+    return transform, np.maximum(s, 0.0), z
+
+
+def gcv_scores(s, z, yty, n_obs, lambdas, lambda_ref):
+    """
+    Residual sum of squares, effective degrees of freedom and GCV score of every group for every
+    lambda, from the Demmler-Reinsch quantities (no refitting).
+
+    Parameters:
+    - s, z (np.ndarray): Output of demmler_reinsch(), shape (n_groups, q)
+    - yty (np.ndarray): Sum of squared responses per group
+    - n_obs (np.ndarray): Number of trials per group
+    - lambdas (np.ndarray): Smoothing parameters, shape (n_groups, n_lambdas)
+    - lambda_ref (np.ndarray): Reference smoothing parameters passed to demmler_reinsch()
+
+    Returns:
+    - rss, edf, gcv (np.ndarray): Each of shape (n_groups, n_lambdas)
+    """
+    lam = lambdas[:, :, None]
+    d = 1 + (lam - lambda_ref[:, None, None]) * s[:, None, :]   # (n_groups, n_lambdas, q)
+    z2 = (z**2)[:, None, :]
+    # RSS = y'y - 2 c'B'y + c'B'Bc, with c'B'Bc = c'(B'B + lambda P)c - lambda c'Pc
+    rss = np.maximum(yty[:, None] - np.sum(z2 / d, axis=-1) - lambdas * np.sum(s[:, None, :] * z2 / d**2, axis=-1), 0.0)
+    # edf = trace((B'B + lambda P)^-1 B'B) = q - lambda trace((B'B + lambda P)^-1 P)
+    edf = s.shape[-1] - lambdas * np.sum(s[:, None, :] / d, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gcv = np.where(n_obs[:, None] > edf, n_obs[:, None] * rss / (n_obs[:, None] - edf) ** 2, np.inf)
+    return rss, edf, gcv
+
+
+def fit_pspline(data, subj_to_keep, x_col, y_col, model_name="pspline", func=None, lambdas=PSPLINE_LAMBDAS,
+                shared_lambda=True):
+    """
+    Fits a penalized B-spline (see pspline_model() in curve_functions.py) to every
+    subject x condition group at once, choosing the smoothing parameter by GCV.
+
+    The basis is evaluated once at the distinct x values and shared by all groups. Every group's
+    normal equations are built in one batched pass and diagonalized together with the penalty
+    (Demmler-Reinsch), so the GCV score of every lambda on the grid is computed in closed form.
+
+    Parameters:
+    - data (Path, str, or pd.DataFrame): Path to the CSV file with x and y values, or the DataFrame itself
+    - subj_to_keep (list): List of subject IDs to include in the analysis
+    - x_col (str): Column name for x values (independent variable)
+    - y_col (str): Column name for y values (dependent variable)
+    - model_name (str): Name the fits are stored under
+    - func (callable): Spline model built by pspline_model(); defaults to MODEL_FUNCTIONS[model_name]
+    - lambdas (np.ndarray): Relative smoothing parameters tried (see PSPLINE_LAMBDAS)
+    - shared_lambda (bool): If True, use the lambda minimizing the pooled GCV score of all groups, so
+      coefficients are equally smoothed in every condition (e.g. for ANOVA); if False, choose per group
+
+    Returns:
+    - pd.DataFrame: Fitted coefficients and their uncertainty, same layout as fit_curve(), plus the
+      knot range of the spline (knot_min, knot_max), which is needed to evaluate the coefficients
+    """
+    func = MODEL_FUNCTIONS[model_name] if func is None else func
+
+    # Load relevant pd.DataFrame or CSV file
+    if isinstance(data, pd.DataFrame):
+        df = data
+    elif isinstance(data, (str, Path)):
+        df = pd.read_csv(data)
+    else:
+        raise ValueError(
+            f"Invalid data input type: {type(data)}. Expected a DataFrame or file path."
+        )
+
+    if subj_to_keep is not None:
+        df = df[df["subj_idx"].isin(subj_to_keep)]
+    else:
+        print("⚠️ Warning: subj_to_keep is None. No filtering will be applied.")
+
+    keys, x, y, mask, _ = pad_groups(df, x_col, y_col)
+    n_params = func.n_params
+
+    # Shared basis: evaluated once per distinct x value, then gathered for every trial
+    x_values, x_index = np.unique(np.where(mask, x, x[mask][0] if mask.any() else 0.0), return_inverse=True)
+    B = func.basis(x_values)[x_index.reshape(x.shape)] * mask[..., None]
+    y = np.where(mask, y, 0.0)
+    btb = np.einsum("gnp,gnq->gpq", B, B)
+    bty = np.einsum("gnp,gn->gp", B, y)
+    yty = np.einsum("gn,gn->g", y, y)
+    n_obs = mask.sum(axis=1)
+
+    # GCV over the lambda grid, in closed form
+    penalty = difference_penalty(n_params)
+    lambda_scale = np.trace(btb, axis1=1, axis2=2) / np.trace(penalty)
+    lambda_scale = np.where(lambda_scale > 0, lambda_scale, 1.0)
+    if shared_lambda:
+        lambda_scale = np.full(len(keys), np.median(lambda_scale[n_obs > 0]) if (n_obs > 0).any() else 1.0)
+    transform, s, z = demmler_reinsch(btb, bty, penalty, lambda_scale)
+    grid = lambda_scale[:, None] * np.asarray(lambdas)[None, :]
+    rss, edf, gcv = gcv_scores(s, z, yty, n_obs, grid, lambda_scale)
+    if shared_lambda:
+        total_rss, total_edf, total_n = rss.sum(axis=0), edf.sum(axis=0), n_obs.sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pooled = np.where(total_n > total_edf, total_n * total_rss / (total_n - total_edf) ** 2, np.inf)
+        best = np.full(len(keys), np.argmin(pooled))
+    else:
+        best = np.argmin(gcv, axis=1)
+    rows = np.arange(len(keys))
+    lam, rss, edf = grid[rows, best], rss[rows, best], edf[rows, best]
+
+    # Coefficients and their (Bayesian) covariance s^2 (B'B + lambda P)^-1 at the chosen lambda
+    shrink = 1 / (1 + (lam - lambda_scale)[:, None] * s)
+    beta = np.einsum("gpq,gq->gp", transform, shrink * z)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resid_var = np.where(n_obs > edf, rss / (n_obs - edf), np.nan)
+    cov = np.einsum("gpk,gk,gqk->gpq", transform, shrink, transform) * resid_var[:, None, None]
+
+    # Groups too small to determine even the penalty's null space (a straight line)
+    x_spread = np.where(mask, x, -np.inf).max(axis=1) - np.where(mask, x, np.inf).min(axis=1)
+    too_small = (n_obs < 3) | ~(x_spread > 0)
+    for subj, g_level, posture in keys[too_small].itertuples(index=False):
+        print(
+            f"Curve fitting failed for subject {subj}, g-level {g_level}, posture condition {posture}"
+        )
+    beta[too_small] = np.nan
+    cov[too_small] = np.nan
+
+    fitted_params = keys.copy()
+    fitted_params["model"] = model_name
+    for i in range(n_params):
+        fitted_params[f"param_{i}"] = beta[:, i]
+    fitted_params = fitted_params.assign(**uncertainty_columns(cov, n_obs, resid_var))
+    fitted_params["knot_min"], fitted_params["knot_max"] = func.knot_range
+
+    valid = ~too_small
+    lambda_note = f"lambda={lam[valid][0]:.3g}" if shared_lambda and valid.any() else "lambda per group"
+    print(f"✅ P-spline fit: {len(keys)} groups, {n_params} coefficients, {lambda_note}, "
+          f"median effective df {np.median(edf[valid]) if valid.any() else np.nan:.2f}")
+    return fitted_params
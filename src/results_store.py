@@ -0,0 +1,175 @@
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Tables written by run_analysis.py (one row set per dependent variable)
+RESULT_TABLES = [
+    "subj_stats", "grand_means", "fitted_parameters", "parameter_covariance", "robust_weights",
+    "goodness_of_fit", "anova_results", "mixed_effects", "mixed_variance",
+]
+
+# Columns that get an index whenever a table contains them
+INDEXED_COLUMNS = ["dep_var", "model", "subj_idx", "g_level_corrected", "bed_chair"]
+
+
+def anova_results_frame(anova_results, model_name):
+    """
+    Converts the dictionary returned by run_anova() into one flat table.
+
+    Parameters:
+    - anova_results (dict): Parameter name -> AnovaRM table
+    - model_name (str): Model the parameters belong to
+
+    Returns:
+    - pd.DataFrame: Columns model, param, effect, f_value, num_df, den_df, p_value
+    """
+    frames = [
+        table.rename_axis("effect").reset_index().assign(param=param)
+        for param, table in anova_results.items()
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["model", "param", "effect", "f_value", "num_df", "den_df", "p_value"])
+    df = pd.concat(frames, ignore_index=True).rename(
+        columns={"F Value": "f_value", "Num DF": "num_df", "Den DF": "den_df", "Pr > F": "p_value"}
+    )
+    df.insert(0, "model", model_name)
+    return df[["model", "param", "effect", "f_value", "num_df", "den_df", "p_value"]]
+
+
+def _sql_columns(df):
+    """SQLite type and Python values (missing values as NULL) of every column of a DataFrame."""
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)
+        if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+            sql_type = "INTEGER"
+        elif pd.api.types.is_float_dtype(values):
+            sql_type = "REAL"
+        else:
+            sql_type = "TEXT"
+        columns[col] = (sql_type, [
+            None if pd.isna(value) else value.item() if isinstance(value, np.generic) else value
+            for value in values.astype(object)
+        ])
+    return columns
+
+
+def write_results(db_path, table, df, dep_var):
+    """
+    Writes one results table for one dependent variable into the SQLite results store.
+
+    Rows already stored for the same DV (and the same models, if the table has a model
+    column) are replaced, so re-running an analysis does not duplicate results. New
+    columns (e.g. parameters of a higher-order model) are added to the table as needed.
+    Safe to call from several processes at once.
+
+    Parameters:
+    - db_path (Path or str): SQLite database file (created if missing)
+    - table (str): Table name, one of RESULT_TABLES
+    - df (pd.DataFrame): Results to store
+    - dep_var (str): Dependent variable the results belong to
+    """
+    if table not in RESULT_TABLES:
+        raise ValueError(f"Invalid results table: {table}. Expected one of {RESULT_TABLES}.")
+
+    # Columns named after the DV (e.g. descriptives) are stored under generic names
+    df = df.rename(columns=lambda col: col[len(dep_var) + 1:] if col.startswith(f"{dep_var}_") else col)
+    df.insert(0, "dep_var", dep_var)
+
+    columns = _sql_columns(df)
+    col_list = ", ".join(f'"{col}"' for col in columns)
+    col_defs = ", ".join(f'"{col}" {sql_type}' for col, (sql_type, _) in columns.items())
+
+    # Several processes may write at once (see N_WORKERS): the schema change, delete, insert and
+    # indexes run in one transaction that holds the write lock from the start
+    with closing(sqlite3.connect(db_path, timeout=120, isolation_level=None)) as con, con:
+        con.execute("BEGIN IMMEDIATE")
+        existing = [row[1] for row in con.execute(f'PRAGMA table_info("{table}")')]
+        if not existing:
+            con.execute(f'CREATE TABLE "{table}" ({col_defs})')
+        else:
+            for col, (sql_type, _) in columns.items():
+                if col not in existing:
+                    con.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" {sql_type}')
+            if "model" in df.columns and "model" in existing:
+                models = df["model"].astype(str).unique().tolist()
+                con.execute(
+                    f'DELETE FROM "{table}" WHERE dep_var = ? AND model IN ({",".join("?" * len(models))})',
+                    [dep_var] + models,
+                )
+            else:
+                con.execute(f'DELETE FROM "{table}" WHERE dep_var = ?', (dep_var,))
+
+        con.executemany(
+            f'INSERT INTO "{table}" ({col_list}) VALUES ({", ".join("?" * len(columns))})',
+            zip(*(values for _, values in columns.values())),
+        )
+
+        for col in INDEXED_COLUMNS:
+            if col in df.columns:
+                con.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{col}" ON "{table}" ("{col}")')
+
+
+def query_results(db_path, table, dep_var=None, model=None, **filters):
+    """
+    Reads results from the SQLite results store.
+
+    Parameters:
+    - db_path (Path or str): SQLite database file
+    - table (str): Table name, one of RESULT_TABLES
+    - dep_var (str or list): Dependent variable(s) to return; all if None
+    - model (str or list): Model(s) to return; all if None
+    - **filters: Other column filters, e.g. subj_idx="S1" or bed_chair=["V", "R"]
+
+    Returns:
+    - pd.DataFrame: Matching rows, with all columns of the table (the same for any filter).
+      fitted_parameters and parameter_covariance hold the long-format parameter store (one row
+      per fit and parameter, or parameter pair); param_store.load_param_store() rebuilds the
+      store of one DV from them, and param_store.model_params() gives one model's fits in wide form.
+    """
+    if table not in RESULT_TABLES:
+        raise ValueError(f"Invalid results table: {table}. Expected one of {RESULT_TABLES}.")
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"Results store not found: {db_path}")
+
+    filters = {"dep_var": dep_var, "model": model, **filters}
+    clauses, values = [], []
+    for col, value in filters.items():
+        if value is None:
+            continue
+        value = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        clauses.append(f'"{col}" IN ({",".join("?" * len(value))})')
+        values.extend(value)
+
+    query = f'SELECT * FROM "{table}"'
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+
+    with sqlite3.connect(db_path) as con:
+        df = pd.read_sql_query(query, con, params=values)
+    return df
+
+
+def list_results(db_path):
+    """
+    Summarizes what the results store contains.
+
+    Parameters:
+    - db_path (Path or str): SQLite database file
+
+    Returns:
+    - pd.DataFrame: Number of rows per table and dependent variable
+    """
+    with sqlite3.connect(db_path) as con:
+        tables = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        counts = [
+            pd.read_sql_query(
+                f'SELECT ? AS "table", dep_var, COUNT(*) AS n_rows FROM "{table}" GROUP BY dep_var', con, params=[table]
+            )
+            for table in tables
+        ]
+    return pd.concat(counts, ignore_index=True) if counts else pd.DataFrame(columns=["table", "dep_var", "n_rows"])
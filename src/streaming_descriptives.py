@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from functools import reduce
+from pathlib import Path
+
+# Per-variable statistics kept in an accumulator (Welford / Chan et al. running moments)
+ACC_STATS = ["count", "mean", "m2"]
+
+
+def accumulate(df, variables, group_keys):
+    """
+    Builds mergeable accumulators (count, mean, sum of squared deviations) for one chunk of trials.
+
+    Parameters:
+    - df (pd.DataFrame): Chunk of trial-level data
+    - variables (list): Variables to summarize
+    - group_keys (list): Columns defining one group (e.g. conditions + subj_idx)
+
+    Returns:
+    - pd.DataFrame: One row per group (MultiIndex of group_keys), columns (variable, stat)
+    """
+    grouped = df.groupby(group_keys, observed=True)[variables]
+    count = grouped.count()
+    mean = grouped.mean()
+    m2 = grouped.var(ddof=0) * count
+
+    acc = pd.concat({"count": count, "mean": mean, "m2": m2.fillna(0.0)}, axis=1)
+    acc = acc.swaplevel(axis=1)[pd.MultiIndex.from_product([variables, ACC_STATS])]
+
+    # Plain index values, so accumulators from chunks with different categories align
+    acc.index = pd.MultiIndex.from_arrays(
+        [np.asarray(acc.index.get_level_values(i)) for i in range(acc.index.nlevels)], names=acc.index.names
+    )
+    return acc
+
+
+def merge_accumulators(a, b):
+    """
+    Combines two accumulators (e.g. from different chunks, files or workers) into one.
+
+    Parameters:
+    - a, b (pd.DataFrame): Outputs of accumulate() or merge_accumulators() for the same variables
+
+    Returns:
+    - pd.DataFrame: Accumulator covering the trials of both inputs
+    """
+    a, b = a.align(b, join="outer")
+    variables = a.columns.get_level_values(0).unique()
+    shape = (len(a), len(variables), len(ACC_STATS))
+    a_vals = np.nan_to_num(a.to_numpy(float).reshape(shape))
+    b_vals = np.nan_to_num(b.to_numpy(float).reshape(shape))
+
+    n_a, mean_a, m2_a = a_vals[..., 0], a_vals[..., 1], a_vals[..., 2]
+    n_b, mean_b, m2_b = b_vals[..., 0], b_vals[..., 1], b_vals[..., 2]
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(n > 0, mean_a + delta * n_b / n, np.nan)
+        m2 = np.where(n > 0, m2_a + m2_b + delta**2 * n_a * n_b / n, 0.0)
+
+    merged = np.stack([n, mean, m2], axis=-1).reshape(len(a), -1)
+    return pd.DataFrame(merged, index=a.index, columns=a.columns).sort_index()
+
+
+def describe_from_accumulators(acc, variables, group_vars):
+    """
+    Derives the subject-level and grand-mean tables of compute_descriptive_stats() from accumulators.
+
+    Parameters:
+    - acc (pd.DataFrame): Accumulator grouped by group_vars + ["subj_idx"]
+    - variables (list): Variables to report
+    - group_vars (list): Condition variables (grand means are computed across subjects within these)
+
+    Returns:
+    - subj_stats (pd.DataFrame): Per-subject count, mean and standard deviation, in each experimental condition.
+    - grand_mean (pd.DataFrame): Grand mean statistics across all subjects.
+    """
+    subj_stats = pd.DataFrame(index=acc.index)
+    for var in variables:
+        count = acc[(var, "count")]
+        subj_stats[f"{var}_count"] = count.astype(np.int64)
+        subj_stats[f"{var}_mean"] = acc[(var, "mean")].where(count > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            subj_stats[f"{var}_std"] = np.sqrt(acc[(var, "m2")] / (count - 1)).where(count > 1)
+
+    # Grand mean: mean and SD of the subject means within each condition
+    subj_means = subj_stats[[f"{var}_mean" for var in variables]]
+    subj_means.columns = variables
+    grand_mean = subj_means.groupby(level=group_vars).agg(["mean", "std"]).reset_index()
+    grand_mean.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in grand_mean.columns]
+
+    return subj_stats.reset_index(), grand_mean
+
+
+def compute_descriptive_stats_streaming(data, variables, group_vars, chunksize=100_000):
+    """
+    Computes the same tables as compute_descriptive_stats() for several variables in a single
+    chunked pass, so memory use does not depend on the size of the data.
+
+    Parameters:
+    - data (Path, str, pd.DataFrame or list of these): Cleaned trial data; a list is
+      combined into one result (e.g. several files)
+    - variables (list): List of variables to compute stats for
+    - group_vars (list): Variables used for grouping (e.g. expected turn amplitude, posture condition, g-level)
+    - chunksize (int): Number of CSV rows read at a time
+
+    Returns:
+    - subj_stats (pd.DataFrame): Per-subject mean and standard deviation, in each experimental condition.
+    - grand_mean (pd.DataFrame): Grand mean statistics across all subjects.
+    """
+    group_keys = group_vars + ["subj_idx"]
+    sources = data if isinstance(data, list) else [data]
+
+    partials = []
+    for source in sources:
+        if isinstance(source, pd.DataFrame):
+            chunks = [source]
+        elif isinstance(source, (str, Path)):
+            chunks = pd.read_csv(source, usecols=list(dict.fromkeys(group_keys + variables)), chunksize=chunksize)
+        else:
+            raise ValueError(f"Invalid data input type: {type(source)}. Expected a DataFrame or file path.")
+
+        for chunk in chunks:
+            missing_vars = [var for var in variables + group_keys if var not in chunk.columns]
+            if missing_vars:
+                raise ValueError(f"Missing columns in {source if not isinstance(source, pd.DataFrame) else 'DataFrame'}: {missing_vars}")
+            partials.append(accumulate(chunk, variables, group_keys))
+
+    acc = reduce(merge_accumulators, partials)
+    return describe_from_accumulators(acc, variables, group_vars)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+
+# Columns of a box_stats() table (besides the grouping columns)
+BOX_STATS = ["n", "q1", "med", "q3", "whislo", "whishi", "fliers"]
+
+
+def box_stats(df, value_col, group_cols, whis=1.5):
+    """
+    Computes boxplot statistics (quartiles, Tukey whiskers, outliers) of one variable for every group,
+    in a single grouped pass, so summary plots can be drawn from the aggregate table alone.
+
+    Parameters:
+    - df (pd.DataFrame): Data to summarize (e.g. goodness-of-fit results)
+    - value_col (str): Variable to summarize
+    - group_cols (list): Columns defining one box
+    - whis (float): Whiskers reach the most extreme values within whis * IQR of the quartiles
+
+    Returns:
+    - pd.DataFrame: One row per group; group_cols + BOX_STATS ("fliers" holds a list of outlying values)
+    """
+    values = df[group_cols + [value_col]].dropna(subset=[value_col])
+    grouped = values.groupby(group_cols, observed=True, sort=False)[value_col]
+
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats = pd.DataFrame({
+        "n": grouped.count(),
+        "q1": quartiles[0.25],
+        "med": quartiles[0.5],
+        "q3": quartiles[0.75],
+    })
+    iqr = stats["q3"] - stats["q1"]
+    limits = pd.DataFrame({"lower": stats["q1"] - whis * iqr, "upper": stats["q3"] + whis * iqr})
+
+    # Whiskers and outliers, from each value's distance to its own group's quartiles
+    joined = values.join(limits, on=group_cols)
+    inside = joined[value_col].between(joined["lower"], joined["upper"])
+    inside_values = joined[inside].groupby(group_cols, observed=True)[value_col]
+    stats["whislo"] = inside_values.min()
+    stats["whishi"] = inside_values.max()
+    fliers = joined[~inside].groupby(group_cols, observed=True)[value_col].agg(list)
+    stats["fliers"] = fliers.reindex(stats.index)
+    stats["fliers"] = [flier if isinstance(flier, list) else [] for flier in stats["fliers"]]
+
+    return stats.reset_index()
+
+
+def plot_box_grid(stats, x_col, hue_col, panel_col, ylabel, title, cmap="viridis", xlabel=None):
+    """
+    Draws grouped boxplots from a box_stats() table: one panel per value of panel_col,
+    boxes along x_col, colored by hue_col. Only the aggregate table is needed, so the
+    drawing cost does not depend on the number of subjects.
+
+    Parameters:
+    - stats (pd.DataFrame): Output of box_stats() grouped by (at least) x_col, hue_col and panel_col
+    - x_col (str): Column whose values are placed along the x axis (in order of appearance)
+    - hue_col (str): Column whose values get one box color each (sorted)
+    - panel_col (str): Column whose values get one panel each
+    - ylabel (str): y-axis label
+    - title (str): Figure title
+    - cmap (str): Matplotlib colormap for the hue levels
+    - xlabel (str): x-axis label (default: x_col)
+
+    Returns:
+    - matplotlib.figure.Figure: The figure (not saved or closed)
+    """
+    x_levels = list(pd.unique(stats[x_col]))
+    hue_levels = sorted(pd.unique(stats[hue_col]))
+    panel_levels = list(pd.unique(stats[panel_col]))
+    colors = plt.get_cmap(cmap)(np.linspace(0.15, 0.85, len(hue_levels)))
+
+    fig, axes = plt.subplots(1, len(panel_levels), figsize=(7.2 * len(panel_levels), 6), sharey=True, squeeze=False)
+    box_width = 0.8 / len(hue_levels)
+
+    for ax, panel in zip(axes[0], panel_levels):
+        panel_stats = stats[stats[panel_col] == panel]
+        for j, (hue, color) in enumerate(zip(hue_levels, colors)):
+            boxes = panel_stats[panel_stats[hue_col] == hue]
+            if boxes.empty:
+                continue
+            positions = [x_levels.index(x) - 0.4 + box_width * (j + 0.5) for x in boxes[x_col]]
+            ax.bxp(
+                boxes[["med", "q1", "q3", "whislo", "whishi", "fliers"]].to_dict("records"),
+                positions=positions, widths=box_width * 0.9, patch_artist=True, manage_ticks=False,
+                boxprops=dict(facecolor=color), medianprops=dict(color="black"),
+                flierprops=dict(marker="d", markerfacecolor="gray", markeredgecolor="gray", markersize=5),
+            )
+        ax.set_xticks(range(len(x_levels)), labels=x_levels, rotation=45)
+        ax.set_xlim(-0.5, len(x_levels) - 0.5)
+        ax.set_xlabel(xlabel or x_col)
+        ax.set_title(f"{panel_col} = {panel}")
+    axes[0][0].set_ylabel(ylabel)
+
+    handles = [Patch(facecolor=color, edgecolor="black", label=str(hue)) for hue, color in zip(hue_levels, colors)]
+    fig.legend(handles=handles, title=hue_col, loc="center right")
+    fig.suptitle(title)
+    fig.tight_layout(rect=(0, 0, 0.9, 1))
+    return fig
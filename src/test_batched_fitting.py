@@ -0,0 +1,128 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+from batched_fitting import compute_prediction_bands, fit_curve_robust
+from curve_fitting import fit_curve
+from curve_functions import POLYNOMIAL_DEGREES, cubic
+
+# Mock trial data: 2 subjects x 2 conditions, cubic relationship plus noise
+rng = np.random.default_rng(42)
+mock_rows = []
+for subj in ["S1", "S2"]:
+    for g_level in [0.0, 1.0]:
+        for x in np.repeat([-90, -60, -30, 30, 60, 90], 4):
+            y = 2 + 0.9 * x + 1e-3 * x**2 + 1e-5 * x**3 + rng.normal(0, 2)
+            mock_rows.append([subj, g_level, "V", x, y])
+mock_data = pd.DataFrame(
+    mock_rows,
+    columns=["subj_idx", "g_level_corrected", "bed_chair", "turn_displacement", "indicated_displacement"],
+)
+
+
+# Larger clean data set (20 subjects x 4 g-levels) for the IRLS convergence check
+clean_rows = []
+for subj in range(20):
+    for g_level in [0.0, 0.5, 1.0, 1.8]:
+        for x in np.repeat([-90, -60, -30, 30, 60, 90], 4):
+            y = 2 + 0.9 * x + 1e-3 * x**2 + 1e-5 * x**3 + rng.normal(0, 2)
+            clean_rows.append([f"S{subj}", g_level, "V", x, y])
+clean_data = pd.DataFrame(clean_rows, columns=mock_data.columns)
+
+
+def test_fit_curve_robust_matches_ols_without_outliers():
+    """Test that robust IRLS fits agree with curve_fit when the data are clean."""
+    robust, _ = fit_curve_robust(
+        mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "cubic", loss="huber"
+    )
+    ols = fit_curve(
+        mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "cubic", cubic
+    )
+    param_cols = [f"param_{i}" for i in range(4)]
+
+    assert list(robust.columns[:4]) == ["subj_idx", "g_level_corrected", "bed_chair", "model"], (
+        "Robust fit should use the same layout as fit_curve"
+    )
+    assert np.allclose(robust[param_cols].values, ols[param_cols].values, rtol=0.05, atol=0.5), (
+        "Robust and OLS estimates should be close on clean data"
+    )
+    se_cols = [f"se_{i}" for i in range(4)]
+    assert np.allclose(robust[se_cols].values, ols[se_cols].values, rtol=0.5), (
+        "Robust (sandwich) and OLS standard errors should be similar on clean data"
+    )
+
+
+def test_fit_curve_robust_converges_with_default_settings():
+    """Test that IRLS converges on clean data with the default settings, at the fully converged estimates."""
+    subjects = list(clean_data["subj_idx"].unique())
+    for model_name in ["linear", "quadratic", "cubic", "quartic"]:
+        for loss in ["huber", "bisquare"]:
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                fitted, _ = fit_curve_robust(
+                    clean_data, subjects, "turn_displacement", "indicated_displacement", model_name, loss=loss
+                )
+            assert "***WARNING***" not in log.getvalue(), (
+                f"Robust ({loss}) {model_name} fit should converge with the default settings"
+            )
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                reference, _ = fit_curve_robust(
+                    clean_data, subjects, "turn_displacement", "indicated_displacement", model_name, loss=loss,
+                    max_iter=5000, tol=1e-13,
+                )
+            n_params = POLYNOMIAL_DEGREES[model_name] + 1
+            param_cols = [f"param_{i}" for i in range(n_params)]
+            se_cols = [f"se_{i}" for i in range(n_params)]
+            error = np.abs(fitted[param_cols].to_numpy() - reference[param_cols].to_numpy())
+            assert np.all(error < 1e-4 * reference[se_cols].to_numpy()), (
+                f"Robust ({loss}) {model_name} estimates should match the fully converged fit"
+            )
+
+    print("✅ test_fit_curve_robust_converges_with_default_settings PASSED")
+
+
+def test_fit_curve_robust_downweights_outlier():
+    """Test that a gross outlier gets (near) zero weight under bisquare loss."""
+    data = mock_data.copy()
+    data.loc[0, "indicated_displacement"] += 500
+
+    fitted, weights = fit_curve_robust(
+        data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "cubic", loss="bisquare"
+    )
+
+    assert len(weights) == len(data), "Every trial should have a reported weight"
+    assert weights.loc[weights["row"] == 0, "weight"].iloc[0] < 1e-3, "Outlier should be down-weighted"
+    assert abs(fitted.loc[0, "param_1"] - 0.9) < 0.1, "Slope should be unaffected by the outlier"
+
+    print("✅ test_fit_curve_robust PASSED")
+
+
+def test_compute_prediction_bands():
+    """Test that batched bands are ordered and that analytic and finite-difference Jacobians agree."""
+    fitted = fit_curve(
+        mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "cubic", cubic
+    )
+    x_grid = np.linspace(-90, 90, 50)
+    bands = compute_prediction_bands(fitted, "cubic", x_grid)
+
+    assert bands["fit"].shape == (len(fitted), len(x_grid)), "Bands should be (groups x grid points)"
+    assert np.all(bands["pi_lower"] < bands["ci_lower"]), "Prediction band should contain confidence band"
+    assert np.all(bands["ci_upper"] < bands["pi_upper"]), "Prediction band should contain confidence band"
+
+    # Same model registered under a non-polynomial name uses the finite-difference Jacobian
+    custom = fitted.assign(model="custom")
+    custom_bands = compute_prediction_bands(custom, "custom", x_grid, func=cubic)
+    assert np.allclose(bands["ci_upper"], custom_bands["ci_upper"], rtol=1e-4), (
+        "Finite-difference bands should match analytic bands"
+    )
+
+    print("✅ test_compute_prediction_bands PASSED")
+
+
+if __name__ == "__main__":
+    test_fit_curve_robust_matches_ols_without_outliers()
+    test_fit_curve_robust_converges_with_default_settings()
+    test_fit_curve_robust_downweights_outlier()
+    test_compute_prediction_bands()
+    print("✅ All tests passed successfully!")
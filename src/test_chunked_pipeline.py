@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from chunked_pipeline import run_chunked_pipeline
+from curve_fit_goodness import compute_gof
+from curve_fitting import fit_curve
+from curve_functions import MODEL_FUNCTIONS
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock trial data: 3 subjects x 2 postures x 2 g-levels, cubic response to turn displacement
+rng = np.random.default_rng(11)
+mock_rows = []
+for subj in ["S1", "S2", "S3"]:
+    for bed_chair in ["V", "R"]:
+        for g_level in [1.0, 1.8]:
+            for turn in np.repeat([-60, -30, 30, 60], 4):
+                y = 0.9 * turn + 1e-5 * turn**3 + rng.normal(0, 4)
+                mock_rows.append([subj, bed_chair, g_level, turn, y])
+mock_data = pd.DataFrame(
+    mock_rows, columns=["subj_idx", "bed_chair", "g_level_corrected", "turn_displacement", "indicated_displacement"]
+)
+
+test_models = ["linear", "cubic"]
+test_subjects = ["S1", "S2"]
+
+
+def test_chunked_pipeline_matches_in_memory_fits():
+    """Test that fits and goodness of fit from chunked moment sums match fit_curve / compute_gof."""
+    mock_file = test_output_dir / "test_chunked_trials.csv"
+    mock_data.to_csv(mock_file, index=False)
+
+    results = run_chunked_pipeline(
+        mock_file, "turn_displacement", ["indicated_displacement"], ["bed_chair", "g_level_corrected"],
+        test_models, test_subjects, chunksize=10,
+    )["indicated_displacement"]
+
+    for model_name, chunked_params in zip(test_models, results["fitted_params"]):
+        expected = fit_curve(mock_data, test_subjects, "turn_displacement", "indicated_displacement",
+                             model_name, MODEL_FUNCTIONS[model_name])
+        param_cols = [col for col in expected.columns if col.startswith(("param_", "se_"))]
+        assert len(chunked_params) == len(expected) == 8, "Expected one fit per subject and condition"
+        assert np.allclose(chunked_params[param_cols], expected[param_cols], rtol=1e-4, atol=1e-8), \
+            f"Chunked {model_name} fit should match fit_curve"
+
+        expected_gof = compute_gof(mock_data, "turn_displacement", "indicated_displacement",
+                                   model_name, MODEL_FUNCTIONS[model_name], expected)
+        gof = results["gof"][results["gof"]["model"] == model_name]
+        assert np.allclose(gof[["R_squared", "RMSE"]], expected_gof[["R_squared", "RMSE"]], rtol=1e-6), \
+            f"Chunked {model_name} goodness of fit should match compute_gof"
+
+    assert results["x_range"] == (-60, 60), "x range should cover all trials"
+    assert set(results["subj_stats"]["subj_idx"]) == {"S1", "S2", "S3"}, "Descriptives should use all subjects"
+
+    print("✅ test_chunked_pipeline_matches_in_memory_fits PASSED")
+
+
+def test_chunked_pipeline_rank_deficient_and_offset_data():
+    """Test that groups with too few distinct x values fail, and that a large y offset keeps precision."""
+    mock_file = test_output_dir / "test_chunked_trials.csv"
+    offset_data = mock_data.assign(indicated_displacement=mock_data["indicated_displacement"] + 1e6)
+    offset_data.to_csv(mock_file, index=False)
+
+    # Quartic on 4 distinct turn displacements: X'X is singular in every group
+    results = run_chunked_pipeline(
+        mock_file, "turn_displacement", ["indicated_displacement"], ["bed_chair", "g_level_corrected"],
+        ["quartic", "cubic"], test_subjects, chunksize=10,
+    )["indicated_displacement"]
+    quartic, cubic = results["fitted_params"]
+    assert quartic.filter(like="param_").isna().all().all(), "Rank-deficient fits should be NaN"
+    assert results["gof"].loc[results["gof"]["model"] == "quartic", "R_squared"].isna().all(), (
+        "Rank-deficient fits should have no goodness of fit"
+    )
+
+    expected = fit_curve(offset_data, test_subjects, "turn_displacement", "indicated_displacement",
+                         "cubic", MODEL_FUNCTIONS["cubic"])
+    assert np.allclose(cubic["resid_var"], expected["resid_var"], rtol=1e-6), (
+        "Residual variance should not lose precision to a large y offset"
+    )
+
+    print("✅ test_chunked_pipeline_rank_deficient_and_offset_data PASSED")
+
+
+if __name__ == "__main__":
+    test_chunked_pipeline_matches_in_memory_fits()
+    test_chunked_pipeline_rank_deficient_and_offset_data()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from data_loading import load_trials
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+test_file = test_output_dir / "test_trials_cleaned_allsubj.csv"
+
+# Mock cleaned trials with full-precision responses and a whole-number trial counter
+rng = np.random.default_rng(11)
+n_trials = 24
+mock_data = pd.DataFrame(
+    {
+        "subj_idx": np.repeat(["S1", "S2"], n_trials // 2),
+        "g_level_corrected": np.tile([0.0, 1.8], n_trials // 2),
+        "bed_chair": "V",
+        "turn_displacement": np.tile([-90.0, -60.0, -30.0, 30.0, 60.0, 90.0], n_trials // 6),
+        "indicated_displacement": rng.normal(0, 50, n_trials) + 1e6 + 1 / 3,
+        "trial_number": np.arange(n_trials, dtype=float),
+    }
+)
+
+
+def test_load_trials_keeps_fitted_values_exact():
+    """Test that the x and dependent variables load as exact float64 and counters are downcast."""
+    mock_data.to_csv(test_file, index=False)
+
+    df = load_trials(test_file, "turn_displacement", ["indicated_displacement"], group_vars=["trial_number"])
+
+    for col in ["turn_displacement", "indicated_displacement"]:
+        assert df[col].dtype == np.float64, f"{col} should stay float64"
+    expected = pd.read_csv(test_file)["indicated_displacement"].to_numpy()
+    assert np.array_equal(df["indicated_displacement"].to_numpy(), expected), "DV values should load exactly"
+    assert df["trial_number"].dtype == np.int8, "Whole-number counters should be downcast"
+    assert isinstance(df["subj_idx"].dtype, pd.CategoricalDtype), "Grouping keys should be categorical"
+
+    print("✅ test_load_trials_keeps_fitted_values_exact PASSED")
+
+
+if __name__ == "__main__":
+    test_load_trials_keeps_fitted_values_exact()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from chunked_pipeline import accumulate_moments, mixed_from_moments
+from mixed_effects import fit_mixed_polynomial
+
+# Mock trial data: 12 subjects x 2 postures x 3 g-levels, quadratic population curve per condition
+# plus a random quadratic deviation per subject (shared across conditions)
+rng = np.random.default_rng(1)
+true_psi = np.diag([0.5, 0.2, 0.05])
+mock_rows = []
+for subj in [f"S{i}" for i in range(12)]:
+    subj_effect = rng.multivariate_normal(np.zeros(3), true_psi)
+    for g_level in [0.5, 1.0, 1.5]:
+        for bed_chair in ["R", "V"]:
+            coefs = np.array([1 + g_level, 0.5 * (bed_chair == "V"), -0.3 * g_level]) + subj_effect
+            x = rng.uniform(-2, 2, 30)
+            y = coefs[0] + coefs[1] * x + coefs[2] * x**2 + rng.normal(0, 0.3, 30)
+            mock_rows += [[subj, bed_chair, g_level, xi, yi] for xi, yi in zip(x, y)]
+mock_data = pd.DataFrame(mock_rows, columns=["subj_idx", "bed_chair", "g_level_corrected", "x", "y"])
+test_subjects = [f"S{i}" for i in range(12)]
+
+# Reference values from statsmodels MixedLM (ML, random intercept + slopes, condition-specific fixed effects):
+# smf.mixedlm("y ~ 0 + C(cond) + C(cond):x + C(cond):x2", groups="subj_idx", re_formula="~x+x2").fit(reml=False)
+expected_loglik = -520.389655
+expected_resid_var = 0.085902
+expected_effects_05R = [1.462948, -0.097795, -0.171080]  # g-level 0.5, posture R
+expected_se_05R = [0.181504, 0.143708, 0.060780]
+
+
+def test_mixed_polynomial_matches_mixedlm():
+    """Test that the EM fit reproduces the maximum likelihood estimates of statsmodels MixedLM."""
+    fits, effects, variance = fit_mixed_polynomial(mock_data, test_subjects, "x", "y", "quadratic")
+    components = variance.set_index("component")["value"]
+
+    assert components["converged"] == 1, "EM should converge"
+    assert np.isclose(components["loglik"], expected_loglik, atol=1e-3), "Log-likelihood should match MixedLM"
+    assert np.isclose(components["resid_var"], expected_resid_var, rtol=1e-4), "Residual variance should match"
+
+    cell = effects[(effects["g_level_corrected"] == 0.5) & (effects["bed_chair"] == "R")]
+    assert np.allclose(cell["value"], expected_effects_05R, atol=1e-5), "Population effects should match MixedLM"
+    assert np.allclose(cell["se"], expected_se_05R, rtol=2e-3), "Standard errors should match MixedLM"
+
+    assert len(fits) == 72 and set(fits["model"]) == {"quadratic_mixed"}, "Expected one fit per subject and condition"
+    assert (fits["n_obs"] == 30).all(), "Each fit should report its number of trials"
+
+    print("✅ test_mixed_polynomial_matches_mixedlm PASSED")
+
+
+def test_mixed_polynomial_shrinks_towards_population():
+    """Test that subject estimates lie between the separate fits and the population curve."""
+    fits, effects, _ = fit_mixed_polynomial(mock_data, test_subjects, "x", "y", "quadratic")
+
+    # Separate fits of every subject and condition, and their mean per condition
+    separate = mock_data.groupby(["subj_idx", "g_level_corrected", "bed_chair"]).apply(
+        lambda group: pd.Series(np.polyfit(group["x"], group["y"], 2)[::-1], index=["p0", "p1", "p2"])
+    ).reset_index()
+    merged = fits.merge(separate, on=["subj_idx", "g_level_corrected", "bed_chair"])
+    population = effects[effects["param_name"] == "param_2"].set_index(["g_level_corrected", "bed_chair"])["value"]
+    merged["pop_2"] = population.loc[list(zip(merged["g_level_corrected"], merged["bed_chair"]))].to_numpy()
+
+    spread_mixed = np.var(merged["param_2"] - merged["pop_2"])
+    spread_separate = np.var(merged["p2"] - merged["pop_2"])
+    assert spread_mixed < spread_separate, "Shrunken estimates should vary less than separate fits"
+
+    print("✅ test_mixed_polynomial_shrinks_towards_population PASSED")
+
+
+def test_mixed_from_chunked_moments():
+    """Test that the fit from chunked moment sums matches the fit from trial data."""
+    fits, effects, _ = fit_mixed_polynomial(mock_data, test_subjects, "x", "y", "quadratic")
+    moments = accumulate_moments(mock_data, "x", "y", 2, 2.0)
+    chunked_fits, chunked_effects, _ = mixed_from_moments(moments, "quadratic", 2.0)
+
+    assert np.allclose(chunked_effects["value"], effects["value"], rtol=1e-6), "Population effects should match"
+    param_cols = ["param_0", "param_1", "param_2", "se_0"]
+    assert np.allclose(chunked_fits[param_cols], fits[param_cols], rtol=1e-6), "Subject estimates should match"
+
+    print("✅ test_mixed_from_chunked_moments PASSED")
+
+
+if __name__ == "__main__":
+    test_mixed_polynomial_matches_mixedlm()
+    test_mixed_polynomial_shrinks_towards_population()
+    test_mixed_from_chunked_moments()
+    print("✅ All tests passed successfully!")
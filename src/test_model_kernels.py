@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from curve_fitting import fit_curve
+from model_kernels import compile_model, verify_kernel
+
+# Mock custom model (sigmoid) and trial data: 2 subjects x 2 postures, one g-level
+def sigmoid(x, a, b, c, d):
+    """Sigmoid function: y = a + b / (1 + exp(-(x - c) / d))"""
+    return a + b / (1 + np.exp(-(x - c) / d))
+
+# Model that SymPy cannot translate (np.maximum), but numba can compile
+def ramp(x, a, b):
+    """Ramp function: y = a + b * max(x, 0)"""
+    return a + b * np.maximum(x, 0.0)
+
+rng = np.random.default_rng(5)
+mock_x = np.repeat(np.linspace(-90, 90, 13), 3)
+mock_data = pd.DataFrame([
+    [subj, 1.0, bed_chair, x, sigmoid(x, 0, 100, 5, 20) - 50 + rng.normal(0, 2)]
+    for subj in ["S1", "S2"] for bed_chair in ["V", "R"] for x in mock_x
+], columns=["subj_idx", "g_level_corrected", "bed_chair", "turn_displacement", "indicated_displacement"])
+
+
+@pytest.mark.parametrize("backend", ["sympy", "numba"])
+def test_compiled_kernel_matches_python_model(backend):
+    """Test that a compiled custom model and its Jacobian match the Python model, for many groups per call."""
+    pytest.importorskip(backend)
+    kernel = compile_model(sigmoid, backend)
+    verify_kernel(kernel, mock_x)
+
+    params = np.array([[0.0, 100.0, 5.0, 20.0], [1.0, 80.0, -3.0, 15.0], [2.0, 60.0, 0.0, 25.0]])
+    x_grid = np.linspace(-90, 90, 50)
+    batched = kernel(x_grid[None, :], *params.T[:, :, None])
+    assert batched.shape == (3, 50), "Expected one curve per parameter set"
+    assert np.allclose(batched, sigmoid(x_grid[None, :], *params.T[:, :, None])), "Kernel should match the model"
+    assert kernel.jac(x_grid[None, :], *params.T[:, :, None]).shape == (3, 50, 4), "Expected one derivative per parameter"
+
+    # curve_fit with the kernel and its Jacobian finds the same fits as the Python model
+    expected = fit_curve(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "sigmoid", sigmoid)
+    compiled = fit_curve(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", "sigmoid", kernel)
+    param_cols = [f"param_{i}" for i in range(4)]
+    assert np.allclose(compiled[param_cols], expected[param_cols], rtol=1e-4), "Fits should match"
+
+    print(f"✅ test_compiled_kernel_matches_python_model[{backend}] PASSED")
+
+
+def test_numba_jacobian_is_analytic_when_sympy_can_differentiate():
+    """Test that numba kernels use the SymPy derivatives, and fall back to central differences otherwise."""
+    pytest.importorskip("numba")
+    pytest.importorskip("sympy")
+    kernel = compile_model(sigmoid, "numba")
+    assert kernel.jac_method == "analytic", "Numba Jacobian should be generated from the SymPy derivatives"
+    params = np.array([[0.0, 100.0, 5.0, 20.0], [1.0, 80.0, -3.0, 15.0]])
+    x_grid = np.linspace(-90, 90, 50)[None, :]
+    exact = compile_model(sigmoid, "sympy").jac(x_grid, *params.T[:, :, None])
+    assert np.allclose(kernel.jac(x_grid, *params.T[:, :, None]), exact, rtol=1e-12, atol=1e-12), (
+        "Numba and SymPy Jacobians should agree to rounding"
+    )
+
+    fallback = compile_model(ramp, "numba")
+    assert fallback.jac_method == "central differences", "Untranslatable models should use central differences"
+    verify_kernel(fallback, mock_x)
+
+    print("✅ test_numba_jacobian_is_analytic_when_sympy_can_differentiate PASSED")
+
+
+def test_verify_kernel_rejects_mismatch():
+    """Test that verification fails when a kernel does not reproduce its Python model."""
+    pytest.importorskip("sympy")
+    kernel = compile_model(sigmoid, "sympy")
+    kernel.python_func = lambda x, a, b, c, d: sigmoid(x, a, b, c, d) + 1e-3 * x
+
+    with pytest.raises(ValueError):
+        verify_kernel(kernel, mock_x)
+
+    print("✅ test_verify_kernel_rejects_mismatch PASSED")
+
+
+if __name__ == "__main__":
+    test_compiled_kernel_matches_python_model("sympy")
+    test_compiled_kernel_matches_python_model("numba")
+    test_numba_jacobian_is_analytic_when_sympy_can_differentiate()
+    test_verify_kernel_rejects_mismatch()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,60 @@
+import re
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from anova_fitted_params import plot_anova_results, run_anova
+from curve_fit_visualization import plot_curve_fits
+from curve_fitting import fit_curve
+from curve_functions import cubic
+from param_store import build_param_store
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output" / "multipage"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock trial data: 3 subjects x 3 g-levels x 2 postures, cubic response to turn displacement
+rng = np.random.default_rng(5)
+mock_rows = []
+for subj in ["S1", "S2", "S3"]:
+    for g_level in [0.0, 1.0, 1.8]:
+        for bed_chair in ["V", "R"]:
+            for x in np.repeat([-90, -60, -30, 30, 60, 90], 2):
+                y = (0.8 + 0.1 * g_level) * x + 1e-5 * x**3 + rng.normal(0, 3)
+                mock_rows.append([subj, g_level, bed_chair, x, y])
+mock_data = pd.DataFrame(
+    mock_rows,
+    columns=["subj_idx", "g_level_corrected", "bed_chair", "turn_displacement", "indicated_displacement"],
+)
+
+
+def count_pdf_pages(path):
+    """Number of pages of a PDF written by matplotlib (its page objects are not compressed)."""
+    return len(re.findall(rb"/Type\s*/Page\b", Path(path).read_bytes()))
+
+
+def test_multipage_figures_have_one_page_per_subject_and_parameter():
+    """Test that multi-page curve-fit and ANOVA PDFs hold one page per subject and per parameter."""
+    fits = fit_curve(mock_data, ["S1", "S2", "S3"], "turn_displacement", "indicated_displacement", "cubic", cubic)
+    store = build_param_store([fits])
+
+    plot_curve_fits(mock_data, store, "turn_displacement", "indicated_displacement", test_output_dir,
+                    plot_curves=True, multipage=True)
+    curve_pdf = test_output_dir / "curve_fit_plots" / "indicated_displacement_cubic_fits_all_subjects.pdf"
+    assert count_pdf_pages(curve_pdf) == 3, "Expected one curve-fit page per subject"
+
+    anova_res = run_anova(store, "cubic")
+    plot_anova_results(store, "cubic", anova_res, test_output_dir, multipage=True)
+    anova_pdf = test_output_dir / "anova_plots_cubic_model" / "cubic_anova_plots.pdf"
+    assert count_pdf_pages(anova_pdf) == 4, "Expected one ANOVA page per cubic parameter"
+    assert not plt.get_fignums(), "The reused figure templates should be closed"
+
+    print("✅ test_multipage_figures_have_one_page_per_subject_and_parameter PASSED")
+
+
+if __name__ == "__main__":
+    test_multipage_figures_have_one_page_per_subject_and_parameter()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,60 @@
+import gc
+import weakref
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+from pathlib import Path
+from output_writer import OutputWriter
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output" / "output_writer"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock result table
+mock_table = pd.DataFrame({"subj_idx": ["S1", "S2", "S3"], "R_squared": [0.91, 0.85, 0.78]})
+
+
+def test_background_writes_are_complete_after_close():
+    """Test that queued tables and figures are fully written, with no temporary files left, after close()."""
+    writer = OutputWriter(n_threads=2, max_pending=2)
+    for i in range(5):
+        writer.write_table(mock_table, test_output_dir / f"table_{i}.csv", index=False)
+        fig, ax = plt.subplots()
+        ax.plot([0, 1], [0, i])
+        writer.write_figure(fig, test_output_dir / f"figure_{i}.pdf")
+    writer.close()
+
+    for i in range(5):
+        pd.testing.assert_frame_equal(pd.read_csv(test_output_dir / f"table_{i}.csv"), mock_table)
+        assert (test_output_dir / f"figure_{i}.pdf").read_bytes().startswith(b"%PDF"), "Figure should be a PDF"
+    assert not list(test_output_dir.glob(".*.tmp")), "Temporary files should be renamed or removed"
+    assert not plt.get_fignums(), "Figures should be closed once rendered"
+
+    # A closed writer is not kept alive until the interpreter exits
+    writer_ref = weakref.ref(writer)
+    del writer
+    gc.collect()
+    assert writer_ref() is None, "Closed writers should be released"
+
+    print("✅ test_background_writes_are_complete_after_close PASSED")
+
+
+def test_write_errors_are_raised_on_close():
+    """Test that a failed background write is reported when the writer is closed."""
+    writer = OutputWriter(n_threads=1)
+    writer.write_table(mock_table, test_output_dir / "missing_dir" / "table.csv")
+
+    try:
+        writer.close()
+    except FileNotFoundError:
+        print("✅ test_write_errors_are_raised_on_close PASSED")
+    else:
+        raise AssertionError("close() should re-raise the write error")
+
+
+if __name__ == "__main__":
+    test_background_writes_are_complete_after_close()
+    test_write_errors_are_raised_on_close()
+    print("✅ All tests passed successfully!")
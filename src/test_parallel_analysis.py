@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Define test data path
+repo_dir = Path(__file__).resolve().parent.parent
+test_data_dir = repo_dir / "test_data"
+test_output_dir = test_data_dir / "output" / "parallel"
+mock_data_dir = test_output_dir / "for_analysis"
+mock_data_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock cleaned trial data: 3 subjects x 3 g-levels x 2 postures, two DVs of the pointback dataset
+rng = np.random.default_rng(8)
+mock_rows = []
+for subj in ["S1", "S2", "S3"]:
+    for g_level in [0.0, 1.0, 1.8]:
+        for bed_chair in ["V", "R"]:
+            for x in np.repeat([-90, -60, -30, 30, 60, 90], 2):
+                indicated = (0.8 + 0.1 * g_level) * x + 1e-5 * x**3 + rng.normal(0, 3)
+                midline = 0.05 * x + rng.normal(0, 2)
+                mock_rows.append([subj, g_level, bed_chair, x, indicated, midline])
+mock_data = pd.DataFrame(
+    mock_rows,
+    columns=["subj_idx", "g_level_corrected", "bed_chair", "turn_displacement",
+             "indicated_displacement", "midline_indicated_angle"],
+)
+test_dep_vars = ["indicated_displacement", "midline_indicated_angle"]
+
+
+def run_analysis(results_dir, n_workers):
+    """Runs run_analysis.py on the mock data and returns the completed process."""
+    env = dict(
+        os.environ,
+        DATA_DIR_CLEANED=str(mock_data_dir), RESULTS_DIR=str(results_dir), N_WORKERS=str(n_workers),
+        DEP_VARS=",".join(test_dep_vars), CURVE_FUNCTIONS="linear,cubic", SUBJ_TO_KEEP="S1,S2,S3",
+        RESULTS_FORMAT="both", FIGURE_OUTPUT="multipage", RUN_DATA_CLEANING="False", MPLBACKEND="Agg",
+    )
+    return subprocess.run([sys.executable, "run_analysis.py"], cwd=repo_dir, env=env,
+                          capture_output=True, text=True, timeout=600)
+
+
+def test_parallel_analysis_matches_serial():
+    """Test that analyzing two DVs in the worker pool gives the same tables as the serial run."""
+    mock_data.to_csv(mock_data_dir / "d_ml_trials_cleaned_allsubj.csv", index=False)
+    mock_data.to_csv(mock_data_dir / "v_r_trials_cleaned_allsubj.csv", index=False)
+
+    outputs = {}
+    for n_workers in [1, 2]:
+        results_dir = test_output_dir / f"workers_{n_workers}"
+        (results_dir / "results.sqlite").unlink(missing_ok=True)
+        run = run_analysis(results_dir, n_workers)
+        assert run.returncode == 0, f"run_analysis.py failed with N_WORKERS={n_workers}:\n{run.stdout}\n{run.stderr}"
+        outputs[n_workers] = (results_dir, run.stdout)
+
+    serial_dir, _ = outputs[1]
+    parallel_dir, parallel_log = outputs[2]
+    assert "Analyzing 2 DVs in 2 worker processes" in parallel_log, "DVs should run in the worker pool"
+    for dep_var in test_dep_vars:
+        for serial_csv in sorted((serial_dir / dep_var).glob("*.csv")):
+            pd.testing.assert_frame_equal(pd.read_csv(parallel_dir / dep_var / serial_csv.name),
+                                          pd.read_csv(serial_csv), obj=serial_csv.name)
+
+        # Each DV's output is printed in one piece and saved with its results
+        log = (parallel_dir / dep_var / f"analysis_log_{dep_var}.txt").read_text(encoding="utf-8")
+        assert f"Performing curve fitting for {dep_var}" in log, "Log should hold the DV's output"
+        assert log in parallel_log, "Each DV's log should be printed without interleaving"
+
+    with sqlite3.connect(serial_dir / "results.sqlite") as serial_db, \
+            sqlite3.connect(parallel_dir / "results.sqlite") as parallel_db:
+        tables = [row[0] for row in serial_db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            query = f'SELECT * FROM "{table}" ORDER BY dep_var'
+            expected = pd.read_sql_query(query, serial_db)
+            stored = pd.read_sql_query(query, parallel_db)
+            sort_cols = list(expected.columns)
+            pd.testing.assert_frame_equal(stored.sort_values(sort_cols, ignore_index=True),
+                                          expected.sort_values(sort_cols, ignore_index=True), obj=table)
+
+    print("✅ test_parallel_analysis_matches_serial PASSED")
+
+
+if __name__ == "__main__":
+    test_parallel_analysis_matches_serial()
+    print("✅ All tests passed successfully!")
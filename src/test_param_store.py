@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from curve_fitting import fit_curve
+from curve_functions import cubic, linear
+from param_store import build_param_store, load_param_store, model_names, model_params, param_matrix
+from results_store import query_results, write_results
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock trial data: 2 subjects x 2 conditions, linear relationship plus noise
+rng = np.random.default_rng(0)
+mock_rows = []
+for subj in ["S1", "S2"]:
+    for bed_chair in ["V", "R"]:
+        for x in np.repeat([-90, -60, -30, 30, 60, 90], 3):
+            mock_rows.append([subj, 1.0, bed_chair, x, 1 + 0.8 * x + rng.normal(0, 2)])
+mock_data = pd.DataFrame(
+    mock_rows,
+    columns=["subj_idx", "g_level_corrected", "bed_chair", "turn_displacement", "indicated_displacement"],
+)
+
+
+def test_param_store_round_trip():
+    """Test that the long-format store returns each model exactly as fit_curve produced it."""
+    fits = {
+        name: fit_curve(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", name, func)
+        for name, func in [("linear", linear), ("cubic", cubic)]
+    }
+    store = build_param_store(list(fits.values()))
+
+    assert len(store["params"]) == 4 * 2 + 4 * 4, "Store should hold one row per fit and parameter"
+    assert store["params"]["subj_idx"].dtype == "category", "Grouping keys should be categorical"
+    assert model_names(store) == ["linear", "cubic"], "Models should be listed in order"
+
+    for name, expected in fits.items():
+        restored = model_params(store, name)
+        assert list(restored.columns) == list(expected.columns), f"{name}: columns should match fit_curve()"
+        assert np.allclose(restored.iloc[:, 4:].to_numpy(float), expected.iloc[:, 4:].to_numpy(float)), (
+            f"{name}: values should round-trip"
+        )
+
+    # A NaN-padded wide frame gives the same parameters as the store
+    wide = pd.concat(fits.values(), ignore_index=True)
+    _, from_wide = param_matrix(wide, "linear")
+    _, from_store = param_matrix(store, "linear")
+    assert from_wide.shape == (4, 2), "Padding columns should be dropped"
+    assert np.allclose(from_wide, from_store), "Wide and long accessors should agree"
+
+    # Parameters that are empty for every fit (e.g. all fits failed) are kept
+    failed = fits["cubic"].assign(param_3=np.nan, se_3=np.nan)
+    assert len(build_param_store([failed])["params"]) == 4 * 4, "Empty parameters should stay in the store"
+    assert "param_3" in model_params(pd.concat([fits["linear"], failed]), "cubic").columns, (
+        "Number of parameters should come from the model, not from the values"
+    )
+
+    print("✅ test_param_store_round_trip PASSED")
+
+
+def test_saved_param_store_round_trip():
+    """Test that the long tables saved by run_analysis.py (CSV and SQLite) load back into the store."""
+    fits = {
+        name: fit_curve(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", name, func)
+        for name, func in [("linear", linear), ("cubic", cubic)]
+    }
+    store = build_param_store(list(fits.values()))
+
+    params_csv = test_output_dir / "test_fitted_parameters.csv"
+    cov_csv = test_output_dir / "test_parameter_covariance.csv"
+    store["params"].to_csv(params_csv, index=False)
+    store["cov"].to_csv(cov_csv, index=False)
+
+    test_db = test_output_dir / "test_param_store.sqlite"
+    test_db.unlink(missing_ok=True)
+    write_results(test_db, "fitted_parameters", store["params"], "indicated_displacement")
+    write_results(test_db, "parameter_covariance", store["cov"], "indicated_displacement")
+
+    loaded = {
+        "csv": load_param_store(params_csv, cov_csv),
+        "sqlite": load_param_store(query_results(test_db, "fitted_parameters"),
+                                   query_results(test_db, "parameter_covariance")),
+    }
+    for source, saved in loaded.items():
+        assert model_names(saved) == ["linear", "cubic"], f"{source}: models should be listed in order"
+        for name, expected in fits.items():
+            restored = model_params(saved, name)
+            assert list(restored.columns) == list(expected.columns), f"{source}: {name} columns should match"
+            assert np.allclose(restored.iloc[:, 4:].to_numpy(float), expected.iloc[:, 4:].to_numpy(float)), (
+                f"{source}: {name} values should round-trip"
+            )
+
+    # The long "params" table alone can be passed to model_params() (no covariance columns then)
+    restored = model_params(pd.read_csv(params_csv), "cubic")
+    assert [col for col in restored.columns if col.startswith("cov_")] == [], "No covariance without its table"
+    assert np.allclose(restored["param_3"], fits["cubic"]["param_3"]), "Long table should round-trip"
+
+    print("✅ test_saved_param_store_round_trip PASSED")
+
+
+if __name__ == "__main__":
+    test_param_store_round_trip()
+    test_saved_param_store_round_trip()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from curve_functions import MODEL_FUNCTIONS, pspline_model
+from curve_fit_goodness import compute_gof
+from curve_store import build_curve_store
+from param_store import build_param_store, load_param_store
+from pspline import PSPLINE_LAMBDAS, difference_penalty, fit_pspline
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock trial data: 2 subjects x 2 postures x 2 g-levels, smooth S-shaped response at 7 turn amplitudes
+rng = np.random.default_rng(5)
+mock_rows = []
+for subj in ["S1", "S2"]:
+    for bed_chair in ["V", "R"]:
+        for g_level in [1.0, 1.8]:
+            for turn in np.repeat([-90, -60, -30, 0, 30, 60, 90], 3):
+                y = 40 * np.tanh(turn / (30 * g_level)) + rng.normal(0, 2)
+                mock_rows.append([subj, bed_chair, g_level, turn, y])
+mock_data = pd.DataFrame(
+    mock_rows, columns=["subj_idx", "bed_chair", "g_level_corrected", "turn_displacement", "indicated_displacement"]
+)
+spline = pspline_model(-90, 90)
+
+
+def test_pspline_basis():
+    """Test that the B-spline basis sums to one and that the model broadcasts over parameter sets."""
+    x = np.linspace(-90, 90, 37)
+    assert np.allclose(spline.basis(x).sum(axis=-1), 1.0), "B-splines should sum to one"
+    assert np.allclose(spline(x, *np.full(spline.n_params, 2.5)), 2.5), "Equal coefficients give a constant"
+
+    coefs = rng.normal(size=(4, spline.n_params))
+    batched = spline(x[None, :], *coefs.T[:, :, None])
+    assert batched.shape == (4, len(x)), "Expected one curve per parameter set"
+    assert np.allclose(batched[2], spline(x, *coefs[2])), "Batched evaluation should match single evaluation"
+
+    print("✅ test_pspline_basis PASSED")
+
+
+def test_pspline_matches_direct_gcv():
+    """Test that the closed-form GCV fit matches refitting every lambda with a direct solve."""
+    fits = fit_pspline(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement",
+                       func=spline, shared_lambda=False)
+    assert len(fits) == 8, "Expected one fit per subject and condition"
+
+    group = mock_data[(mock_data["subj_idx"] == "S2") & (mock_data["bed_chair"] == "R")
+                      & (mock_data["g_level_corrected"] == 1.8)]
+    x, y = group["turn_displacement"].to_numpy(float), group["indicated_displacement"].to_numpy(float)
+    B, P = spline.basis(x), difference_penalty(spline.n_params)
+    best = None
+    for relative_lambda in PSPLINE_LAMBDAS:
+        A = B.T @ B + relative_lambda * np.trace(B.T @ B) / np.trace(P) * P
+        hat = B @ np.linalg.solve(A, B.T)
+        resid = y - hat @ y
+        gcv = len(y) * resid @ resid / (len(y) - np.trace(hat)) ** 2
+        if best is None or gcv < best[0]:
+            best = (gcv, np.linalg.solve(A, B.T @ y))
+
+    fit = fits[(fits["subj_idx"] == "S2") & (fits["bed_chair"] == "R") & (fits["g_level_corrected"] == 1.8)]
+    coefs = fit[[f"param_{i}" for i in range(spline.n_params)]].to_numpy()[0]
+    assert np.allclose(coefs, best[1], rtol=1e-6, atol=1e-6), "Coefficients should match the direct GCV solution"
+
+    print("✅ test_pspline_matches_direct_gcv PASSED")
+
+
+def test_pspline_goodness_of_fit():
+    """Test that spline fits work with compute_gof and fit the S-shaped response well."""
+    fits = fit_pspline(mock_data, ["S1", "S2"], "turn_displacement", "indicated_displacement", func=spline)
+    gof = compute_gof(mock_data, "turn_displacement", "indicated_displacement", "pspline", spline, fits)
+
+    assert (gof["R_squared"] > 0.95).all(), "P-spline should fit the smooth response well"
+    assert fits["se_0"].notna().all() and (fits["n_obs"] == 21).all(), "Expected uncertainty columns for every fit"
+
+    print("✅ test_pspline_goodness_of_fit PASSED")
+
+
+def test_pspline_knot_range_is_stored_with_the_fits():
+    """Test that saved spline fits are evaluated over their own knots, not the default model's."""
+    narrow = mock_data[mock_data["turn_displacement"].abs() <= 60]
+    narrow_spline = pspline_model(-60, 60)
+    fits = fit_pspline(narrow, ["S1", "S2"], "turn_displacement", "indicated_displacement", func=narrow_spline)
+    assert (fits["knot_min"] == -60).all() and (fits["knot_max"] == 60).all(), "Fits should store their knot range"
+
+    # Round trip through the saved parameter table
+    saved = build_param_store([fits])
+    params_file = test_output_dir / "test_pspline_parameters.csv"
+    cov_file = test_output_dir / "test_pspline_covariance.csv"
+    saved["params"].to_csv(params_file, index=False)
+    saved["cov"].to_csv(cov_file, index=False)
+    store = load_param_store(params_file, cov_file)
+
+    # Evaluated with the default (-90, 90) model, as the CLI and the curve store do
+    default = MODEL_FUNCTIONS["pspline"]
+    gof = compute_gof(narrow, "turn_displacement", "indicated_displacement", "pspline", default, store)
+    expected = compute_gof(narrow, "turn_displacement", "indicated_displacement", "pspline", narrow_spline, fits)
+    assert np.allclose(gof["RMSE"], expected["RMSE"]), "GOF should use the stored knot range"
+
+    x_grid = np.linspace(-60, 60, 25)
+    curves = build_curve_store(store, x_grid)
+    coefs = fits[[f"param_{i}" for i in range(narrow_spline.n_params)]].to_numpy()
+    assert np.allclose(curves["fit"], narrow_spline(x_grid[None, :], *coefs.T[:, :, None])), (
+        "Curves should be evaluated over the stored knot range"
+    )
+
+    print("✅ test_pspline_knot_range_is_stored_with_the_fits PASSED")
+
+
+if __name__ == "__main__":
+    test_pspline_basis()
+    test_pspline_matches_direct_gcv()
+    test_pspline_goodness_of_fit()
+    test_pspline_knot_range_is_stored_with_the_fits()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from param_store import build_param_store, load_param_store, model_params
+from results_store import list_results, query_results, write_results
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+test_db = test_output_dir / "test_results.sqlite"
+
+# Mock wide fits of two models with different parameter counts, in the layout of fit_curve()
+mock_cubic_fits = pd.DataFrame(
+    {
+        "subj_idx": ["S1", "S2"],
+        "g_level_corrected": [1.0, 1.0],
+        "bed_chair": ["V", "V"],
+        "model": ["cubic", "cubic"],
+        "param_0": [0.1, 0.2],
+        "param_1": [1.0, 0.9],
+        "param_2": [0.0, 0.01],
+        "param_3": [1e-5, 2e-5],
+        "se_0": [0.5, 0.6],
+        "se_1": [0.05, 0.04],
+        "se_2": [0.001, 0.002],
+        "se_3": [1e-6, 2e-6],
+        "cov_0_1": [1e-3, 2e-3],
+        "cov_0_2": [0.0, 0.0],
+        "cov_0_3": [0.0, 0.0],
+        "cov_1_2": [-1e-5, -2e-5],
+        "cov_1_3": [-1e-8, -2e-8],
+        "cov_2_3": [0.0, 0.0],
+        "n_obs": [24, 24],
+        "resid_var": [4.0, 5.0],
+    }
+)
+mock_quartic_fits = mock_cubic_fits.assign(
+    model="quartic", param_4=[1e-7, 2e-7], se_4=[1e-8, 2e-8],
+    cov_0_4=[0.0, 0.0], cov_1_4=[0.0, 0.0], cov_2_4=[0.0, 0.0], cov_3_4=[-1e-12, -2e-12],
+)
+
+# Long-format parameter store tables, as written by run_analysis.py
+mock_cubic = build_param_store([mock_cubic_fits])
+mock_quartic = build_param_store([mock_quartic_fits])
+
+
+def test_write_and_query_results():
+    """Test that results round-trip through the SQLite store and that re-writes replace rows."""
+    test_db.unlink(missing_ok=True)
+
+    for store in [mock_cubic, mock_quartic, mock_cubic]:  # the second cubic write is a re-run
+        write_results(test_db, "fitted_parameters", store["params"], "indicated_displacement")
+        write_results(test_db, "parameter_covariance", store["cov"], "indicated_displacement")
+
+    all_fits = query_results(test_db, "fitted_parameters", dep_var="indicated_displacement")
+    assert len(all_fits) == 2 * 4 + 2 * 5, "Re-writing a model should replace its rows, not duplicate them"
+    assert {"param_name", "param_idx", "value", "se", "n_obs", "resid_var"} <= set(all_fits.columns), \
+        "fitted_parameters should hold the long parameter store"
+
+    cubic = query_results(test_db, "fitted_parameters", model="cubic", subj_idx="S2")
+    assert len(cubic) == 4, "Filters should select the four parameters of one fit"
+    assert list(cubic.columns) == list(all_fits.columns), "Columns should not depend on the filter"
+    slope = cubic.loc[cubic["param_name"] == "param_1", "value"]
+    assert np.isclose(slope.iloc[0], 0.9), "Stored values should round-trip"
+
+    # Queried tables rebuild each model's wide fits, with only that model's parameter columns
+    store = load_param_store(all_fits, query_results(test_db, "parameter_covariance", dep_var="indicated_displacement"))
+    for fits in [mock_cubic_fits, mock_quartic_fits]:
+        model_name = fits["model"].iloc[0]
+        queried = model_params(store, model_name)
+        assert set(queried.columns) == set(fits.columns), f"{model_name} columns should match the fit"
+        value_cols = list(fits.columns[4:])
+        np.testing.assert_allclose(queried[value_cols].to_numpy(float), fits[value_cols].to_numpy(float),
+                                   err_msg=f"{model_name} fits should round-trip through the store")
+    assert "param_4" not in model_params(cubic, "cubic").columns, "model_params should trim to the model"
+
+    # Descriptive columns named after the DV are stored under generic names
+    stats = pd.DataFrame({"subj_idx": ["S1"], "indicated_displacement_mean": [3.0]})
+    write_results(test_db, "subj_stats", stats, "indicated_displacement")
+    assert "mean" in query_results(test_db, "subj_stats").columns, "DV prefix should be stripped"
+
+    summary = list_results(test_db)
+    assert set(summary["table"]) == {"fitted_parameters", "parameter_covariance", "subj_stats"}, "Summary should list all tables"
+
+    print("✅ test_write_and_query_results PASSED")
+
+
+if __name__ == "__main__":
+    test_write_and_query_results()
+    print("✅ All tests passed successfully!")
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from descriptives import compute_descriptive_stats
+from streaming_descriptives import accumulate, compute_descriptive_stats_streaming, merge_accumulators
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock trial data: 3 subjects x 2 postures x 2 turn amplitudes, with some missing values
+rng = np.random.default_rng(7)
+mock_rows = []
+for subj in ["S1", "S2", "S3"]:
+    for bed_chair in ["V", "R"]:
+        for turn in [30, -30]:
+            for _ in range(5):
+                mock_rows.append([subj, bed_chair, 1.0, turn, turn + rng.normal(0, 3), rng.normal(0, 2)])
+mock_data = pd.DataFrame(
+    mock_rows,
+    columns=["subj_idx", "bed_chair", "g_level_corrected", "turn_displacement",
+             "indicated_displacement", "midline_indicated_angle"],
+)
+mock_data.loc[::4, "indicated_displacement"] = np.nan
+
+test_vars = ["indicated_displacement", "midline_indicated_angle"]
+test_group_vars = ["turn_displacement", "bed_chair", "g_level_corrected"]
+
+
+def test_streaming_matches_compute_descriptive_stats():
+    """Test that chunked streaming descriptives reproduce compute_descriptive_stats exactly."""
+    mock_file = test_output_dir / "test_streaming_trials.csv"
+    mock_data.to_csv(mock_file, index=False)
+
+    expected_subj, expected_grand = compute_descriptive_stats(mock_data, test_vars, test_group_vars, test_output_dir)
+    subj_stats, grand_mean = compute_descriptive_stats_streaming(mock_file, test_vars, test_group_vars, chunksize=7)
+
+    pd.testing.assert_frame_equal(subj_stats, expected_subj, check_dtype=False)
+    pd.testing.assert_frame_equal(grand_mean, expected_grand, check_dtype=False)
+
+    print("✅ test_streaming_matches_compute_descriptive_stats PASSED")
+
+
+def test_merge_accumulators_is_order_independent():
+    """Test that partial results from different workers combine to the same accumulator."""
+    group_keys = test_group_vars + ["subj_idx"]
+    first, second = mock_data.iloc[:23], mock_data.iloc[23:]
+
+    merged = merge_accumulators(accumulate(first, test_vars, group_keys), accumulate(second, test_vars, group_keys))
+    reversed_merge = merge_accumulators(accumulate(second, test_vars, group_keys), accumulate(first, test_vars, group_keys))
+    full = accumulate(mock_data, test_vars, group_keys)
+
+    assert np.allclose(merged.to_numpy(), full.to_numpy()), "Merged accumulators should equal a single pass"
+    assert np.allclose(reversed_merge.to_numpy(), full.to_numpy()), "Merge order should not matter"
+
+    print("✅ test_merge_accumulators_is_order_independent PASSED")
+
+
+if __name__ == "__main__":
+    test_streaming_matches_compute_descriptive_stats()
+    test_merge_accumulators_is_order_independent()
+    print("✅ All tests passed successfully!")
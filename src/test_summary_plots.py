@@ -0,0 +1,60 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from matplotlib.cbook import boxplot_stats
+from anova_fitted_params import summarize_parameters
+from curve_fit_goodness import plot_goodness_of_fit
+from summary_plots import box_stats
+
+# Define test data path
+test_data_dir = Path(__file__).resolve().parent.parent / "test_data"
+test_output_dir = test_data_dir / "output"
+test_output_dir.mkdir(parents=True, exist_ok=True)
+
+# Mock goodness-of-fit results: 12 subjects x 2 postures x 3 g-levels x 2 models, heavy-tailed RMSE
+rng = np.random.default_rng(3)
+mock_gof = pd.DataFrame(
+    [[f"S{s}", g_level, bed_chair, model, rng.uniform(0.5, 1.0), abs(rng.standard_t(2))]
+     for s in range(12) for g_level in [0.0, 1.0, 1.8] for bed_chair in ["V", "R"] for model in ["linear", "cubic"]],
+    columns=["subj_idx", "g_level_corrected", "bed_chair", "model", "R_squared", "RMSE"],
+)
+test_group_cols = ["bed_chair", "model", "g_level_corrected"]
+
+
+def test_box_stats_match_matplotlib():
+    """Test that aggregated boxplot statistics match matplotlib's per-group computation."""
+    stats = box_stats(mock_gof, "RMSE", test_group_cols)
+    assert len(stats) == 12, "Expected one row per posture, model and g-level"
+
+    for _, row in stats.iterrows():
+        group = mock_gof[(mock_gof[test_group_cols] == row[test_group_cols]).all(axis=1)]
+        expected = boxplot_stats(group["RMSE"].to_numpy())[0]
+        for stat in ["med", "q1", "q3", "whislo", "whishi"]:
+            assert np.isclose(row[stat], expected[stat]), f"{stat} differs for {row[test_group_cols].tolist()}"
+        assert sorted(row["fliers"]) == sorted(expected["fliers"]), "Outliers should match"
+
+    print("✅ test_box_stats_match_matplotlib PASSED")
+
+
+def test_summary_plots_use_aggregates_without_leaking_figures():
+    """Test the parameter summary table and that goodness-of-fit plots close every figure they open."""
+    fits = mock_gof.rename(columns={"R_squared": "param_0", "RMSE": "param_1"})
+    summary = summarize_parameters(fits, ["param_0", "param_1"])
+    expected = fits.groupby(["g_level_corrected", "bed_chair"])["param_1"].agg(["mean", "std"])
+    assert np.allclose(summary.loc["param_1"].to_numpy(), expected.sort_index().to_numpy()), \
+        "Summary should match a per-parameter groupby"
+
+    plot_goodness_of_fit(mock_gof, "test_dv", test_output_dir)
+    assert (test_output_dir / "rmse_comparison_by_condition_test_dv.png").exists(), "RMSE plot should be saved"
+    assert not plt.get_fignums(), "No figures should be left open"
+
+    print("✅ test_summary_plots_use_aggregates_without_leaking_figures PASSED")
+
+
+if __name__ == "__main__":
+    test_box_stats_match_matplotlib()
+    test_summary_plots_use_aggregates_without_leaking_figures()
+    print("✅ All tests passed successfully!")